@@ -13,9 +13,9 @@ More info in README.md file
 #define __copyright__   "Copyright 2023, Juan Remirez de Esparza"
 #define __credits__     "Juan Remirez de Esparza"
 #define __license__     "MIT"
-#define __version__     "1.0.8"
-#define  __date__       "2024-02-07"
-#define  __version_highlight__  "Add Parameter to enable/disable auto-stop"
+#define __version__     "1.0.11"
+#define  __date__       "2025-11-30"
+#define  __version_highlight__  "Attention line: Aux2 raised while responses are waiting to be read by UI."
 #define __maintainer__  "Juan Remirez de Esparza"
 #define __email__       "jremirez@hotmail.com"
 #define __status__      "Development"
@@ -56,6 +56,9 @@ int UI_Command; // Stores I2C command from Raspberry PI --- ScanFilm=10 / Unlock
 #define CMD_VERSION_ID 1
 #define CMD_GET_CNT_STATUS 2
 #define CMD_RESET_CONTROLLER 3
+#define CMD_GET_CNT_STATUS_MULTI 5  // Like CMD_GET_CNT_STATUS, but returns all queued responses (up to RSP_MULTI_MAX)
+#define CMD_GET_CNT_STATUS_CHECKED 6  // Checked protocol: Queued responses with sequence number and CRC (up to RSP_CHECKED_MAX)
+#define CMD_RESEND_RESPONSES 7  // Checked protocol: Send again responses, starting from sequence number in param
 #define CMD_START_SCAN 10
 #define CMD_TERMINATE 11
 #define CMD_GET_NEXT_FRAME 12
@@ -95,6 +98,19 @@ int UI_Command; // Stores I2C command from Raspberry PI --- ScanFilm=10 / Unlock
 #define RSP_REPORT_PLOTTER_INFO 87
 #define RSP_SCAN_ENDED 88
 #define RSP_FILM_FORWARD_ENDED 89
+#define RSP_CMD_RESEND 91  // Checked protocol: Command(s) lost, send again starting from sequence number in param1
+
+// Capabilities, negotiated with CMD_VERSION_ID/RSP_VERSION_ID: UI sends the ones it supports as parameter of
+// CMD_VERSION_ID, controller returns the ones both support ORed with the controller id in RSP_VERSION_ID
+#define CAP_MULTI_RESPONSE 0x80     // CMD_GET_CNT_STATUS_MULTI supported
+#define CAP_CHECKED_PROTOCOL 0x40   // Checked protocol supported (see receiveEvent)
+// Wire buffer is 32 bytes: Count byte followed by up to 6 responses of 5 bytes each (7 with checked protocol)
+#define RSP_MULTI_MAX 6
+#define RSP_CHECKED_MAX 4
+// Checked protocol: 7 bit sequence numbers, flag set when sender (re)starts sequence, so that receiver resyncs
+#define SEQ_MASK 0x7F
+#define SEQ_SYNC 0x80
+#define RSP_HISTORY_SIZE 16
 
 // Immutable values
 #define S8_HEIGHT  4.01
@@ -114,6 +130,7 @@ int UI_Command; // Stores I2C command from Raspberry PI --- ScanFilm=10 / Unlock
 #define PIN_AUX3             9
 #define PIN_AUX4            10
 #define PIN_AUX5            11
+#define PIN_ATTENTION       PIN_AUX2    // Raised while responses are waiting to be read by RPi (optional, wired to a RPi GPIO)
 #define PIN_MOTOR_A_STEP    22
 #define PIN_MOTOR_A_NEUTRAL 26
 #define PIN_MOTOR_A_DIR     21
@@ -202,7 +219,20 @@ unsigned long FilmDetectedTime = 0;         // Updated when film is present (rel
 bool NoFilmDetected = false;
 int MaxFilmStallTime = 6000;                // Maximum time film can be undetected to report end of reel
 
-byte BufferForRPi[9];   // 9 byte array to send data to Raspberry Pi over I2C bus
+byte BufferForRPi[1 + RSP_MULTI_MAX * 5];   // Byte array to send data to Raspberry Pi over I2C bus
+volatile int ReadMode = CMD_GET_CNT_STATUS;   // Data to return in next read request from RPi
+// Checked protocol support variables
+volatile int ExpectedCmdSeq = -1;   // -1: No command received yet, accept any
+volatile boolean CmdResendRequested = false;
+volatile byte NextRspSeq = 0;
+volatile byte ResendSeq = 0;   // Different from NextRspSeq while responses are being sent again
+volatile boolean RspSeqSync = true;
+volatile boolean ResendSync = false;
+volatile int RspHistoryData[RSP_HISTORY_SIZE];
+volatile int RspHistoryParam[RSP_HISTORY_SIZE];
+volatile int RspHistoryParam2[RSP_HISTORY_SIZE];
+volatile byte RspHistorySeq[RSP_HISTORY_SIZE];
+volatile int RspHistoryCount = 0;
 
 int PT_SignalLevelRead;   // Raw signal level from phototransistor
 boolean PT_Level_Auto = true;   // Automatic calculation of PT level threshold
@@ -234,7 +264,10 @@ volatile Queue ResponseQueue;
 
 void SendToRPi(byte rsp, int param1, int param2)
 {
+    noInterrupts();     // Not interleaved with sendEvent, so that attention line matches the queue
     push_rsp(rsp, param1, param2);
+    UpdateAttentionLine();
+    interrupts();
 }
 
 // Find how to reset Pico
@@ -341,6 +374,7 @@ void setup() {
     pinMode(PIN_AUX3, INPUT_PULLUP);
     pinMode(PIN_AUX4, INPUT_PULLUP);
     pinMode(PIN_AUX5, INPUT_PULLUP);
+    digitalWrite(PIN_ATTENTION, LOW);
     pinMode(PIN_MOTOR_A_STEP, OUTPUT);
     pinMode(PIN_MOTOR_A_NEUTRAL, OUTPUT);
     pinMode(PIN_MOTOR_A_DIR, OUTPUT);
@@ -385,6 +419,10 @@ void loop() {
     SendToRPi(RSP_FORCE_INIT, 0, 0);  // Request UI to resend init sequence, in case controller reloaded while UI active
 
     while (1) {
+        if (CmdResendRequested) {   // Checked protocol: Set by receiveEvent, reported from here to keep queue consistent
+            CmdResendRequested = false;
+            SendToRPi(RSP_CMD_RESEND, ExpectedCmdSeq, 0);
+        }
         if (dataInCmdQueue())
             UI_Command = pop_cmd(&param);   // Get next command from queue if one exists
         else
@@ -501,7 +539,7 @@ void loop() {
                 switch (UI_Command) {
                     case CMD_VERSION_ID:
                         DebugPrintStr(">V_ID");
-                        SendToRPi(RSP_VERSION_ID, 2, 0);  // 1 - Arduino, 2 - RPi Pico
+                        SendToRPi(RSP_VERSION_ID, 2 | (param & (CAP_MULTI_RESPONSE | CAP_CHECKED_PROTOCOL)), 0);  // 1 - Arduino, 2 - RPi Pico
                         break;
                     case CMD_START_SCAN:
                         SetReelsAsNeutral(HIGH, LOW, LOW);
@@ -1118,25 +1156,157 @@ ScanResult scan(int UI_Command) {
 // ---- Receive I2C command from Raspberry PI, ScanFilm... and more ------------
 // JRE 13/09/22: Theoretically this might happen any time, thu UI_Command might change in the middle of the loop. Adding a queue...
 void receiveEvent(int byteCount) {
-    int IncomingIc, param = 0;
-
-    if (Wire.available())
-        IncomingIc = Wire.read();
-    if (Wire.available())
-        param =  Wire.read();
-    if (Wire.available())
-        param +=  256*Wire.read();
-    while (Wire.available())
-        Wire.read();
-
-    if (IncomingIc > 0) {
+    int IncomingIc = 0, param = 0;
+    byte Frame[5];
+    int FrameSize = 0;
+
+    while (Wire.available()) {
+        if (FrameSize < 5)
+            Frame[FrameSize++] = Wire.read();
+        else
+            Wire.read();
+    }
+    if (FrameSize >= 1)
+        IncomingIc = Frame[0];
+    if (FrameSize >= 2)
+        param = Frame[1];
+    if (FrameSize >= 3)
+        param += 256*Frame[2];
+
+    if (IncomingIc == CMD_GET_CNT_STATUS_MULTI || IncomingIc == CMD_GET_CNT_STATUS_CHECKED)
+        ReadMode = IncomingIc;  // Not a command, just selects what sendEvent returns
+    else if (FrameSize == 5) {  // Checked protocol: Command, parameter, sequence number, CRC
+        ReadMode = CMD_GET_CNT_STATUS;
+        if (crc8(Frame, 4) != Frame[4])
+            CmdResendRequested = true;  // Corrupted: Ask RPi to send again
+        else if (IncomingIc == CMD_RESEND_RESPONSES)
+            ResendResponsesFrom(param);  // Not sequenced, handled right away
+        else
+            ReceiveCheckedCommand(IncomingIc, param, Frame[3]);
+    }
+    else if (IncomingIc > 0) {
+        ReadMode = CMD_GET_CNT_STATUS;
         push_cmd(IncomingIc, param); // No error treatment for now
     }
 }
 
+// Checked protocol: Commands accepted only in sequence, RPi sends again from ExpectedCmdSeq when told to
+void ReceiveCheckedCommand(int cmd, int param, byte seq) {
+    // RPi (re)started sequence, unless this is the last one accepted, sent again after an I/O error
+    if (ExpectedCmdSeq == -1 || ((seq & SEQ_SYNC) && (seq & SEQ_MASK) != ((ExpectedCmdSeq - 1) & SEQ_MASK)))
+        ExpectedCmdSeq = seq & SEQ_MASK;
+    seq &= SEQ_MASK;
+    if (seq == ExpectedCmdSeq) {
+        if (push_cmd(cmd, param))
+            ExpectedCmdSeq = (ExpectedCmdSeq + 1) & SEQ_MASK;
+        else
+            CmdResendRequested = true;  // Queue full, command lost
+    }
+    else if (((ExpectedCmdSeq - seq) & SEQ_MASK) > SEQ_MASK/2)
+        CmdResendRequested = true;  // Ahead of expected: Previous command(s) lost
+    // else: Behind expected, already received (sent again by RPi after an I/O error): Ignored
+}
+
+// Checked protocol: Responses already sent are kept, to send them again if RPi did not get them
+void ResendResponsesFrom(int seq) {
+    int pending = (NextRspSeq - seq) & SEQ_MASK;
+    if (pending <= RspHistoryCount)
+        ResendSeq = seq & SEQ_MASK;
+    else {  // Some are not in history anymore: Send the ones available, flagged for RPi to resync
+        ResendSeq = (NextRspSeq - RspHistoryCount) & SEQ_MASK;
+        ResendSync = true;
+    }
+    UpdateAttentionLine();
+}
+
+// Checked protocol: Next response to send (pending resend first), with its sequence number
+boolean NextCheckedResponse(int * cmd, int * p1, int * p2, byte * seq) {
+    int idx;
+    if (ResendSeq != NextRspSeq) {
+        idx = ResendSeq % RSP_HISTORY_SIZE;
+        *seq = RspHistorySeq[idx] | (ResendSync ? SEQ_SYNC : 0);
+        ResendSync = false;
+        ResendSeq = (ResendSeq + 1) & SEQ_MASK;
+    }
+    else {
+        *cmd = pop_rsp(p1, p2);
+        if (*cmd == -1)
+            return(false);
+        if (RspSeqSync) {   // First response sent: Start sequence at a random value, unlikely to be taken as duplicate
+            NextRspSeq = micros() & SEQ_MASK;
+            ResendSeq = NextRspSeq;
+        }
+        idx = NextRspSeq % RSP_HISTORY_SIZE;
+        RspHistoryData[idx] = *cmd;
+        RspHistoryParam[idx] = *p1;
+        RspHistoryParam2[idx] = *p2;
+        RspHistorySeq[idx] = NextRspSeq | (RspSeqSync ? SEQ_SYNC : 0);  // First response after start flagged
+        *seq = RspHistorySeq[idx];
+        RspSeqSync = false;
+        NextRspSeq = (NextRspSeq + 1) & SEQ_MASK;
+        ResendSeq = NextRspSeq;
+        if (RspHistoryCount < RSP_HISTORY_SIZE)
+            RspHistoryCount++;
+    }
+    *cmd = RspHistoryData[idx];
+    *p1 = RspHistoryParam[idx];
+    *p2 = RspHistoryParam2[idx];
+    return(true);
+}
+
+// Attention line raised as long as there is something for RPi to read (queued responses, or responses to resend)
+void UpdateAttentionLine() {
+    digitalWrite(PIN_ATTENTION, (dataInRspQueue() || ResendSeq != NextRspSeq) ? HIGH : LOW);
+}
+
+byte crc8(volatile byte * data, int len) {    // CRC-8, polynomial 0x07
+    byte crc = 0;
+    for (int i = 0; i < len; i++) {
+        crc ^= data[i];
+        for (int bit = 0; bit < 8; bit++)
+            crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+    return(crc);
+}
+
 // -- Sending I2C command to Raspberry PI, take picture now -------
 void sendEvent() {
-    int cmd, p1, p2;
+    int cmd, p1, p2, count = 0;
+    byte seq;
+    if (ReadMode == CMD_GET_CNT_STATUS_MULTI) {
+        // Several responses in one read, so that frequent ones (plotter info) do not delay the others
+        ReadMode = CMD_GET_CNT_STATUS;
+        while (count < RSP_MULTI_MAX && (cmd = pop_rsp(&p1, &p2)) != -1) {
+            BufferForRPi[1 + count*5] = cmd;
+            BufferForRPi[2 + count*5] = p1/256;
+            BufferForRPi[3 + count*5] = p1%256;
+            BufferForRPi[4 + count*5] = p2/256;
+            BufferForRPi[5 + count*5] = p2%256;
+            count++;
+        }
+        BufferForRPi[0] = count;
+        Wire.write(BufferForRPi, 1 + count*5);
+        UpdateAttentionLine();
+        return;
+    }
+    if (ReadMode == CMD_GET_CNT_STATUS_CHECKED) {
+        // Same, each response followed by its sequence number and CRC
+        ReadMode = CMD_GET_CNT_STATUS;
+        while (count < RSP_CHECKED_MAX && NextCheckedResponse(&cmd, &p1, &p2, &seq)) {
+            BufferForRPi[1 + count*7] = cmd;
+            BufferForRPi[2 + count*7] = p1/256;
+            BufferForRPi[3 + count*7] = p1%256;
+            BufferForRPi[4 + count*7] = p2/256;
+            BufferForRPi[5 + count*7] = p2%256;
+            BufferForRPi[6 + count*7] = seq;
+            BufferForRPi[7 + count*7] = crc8(&BufferForRPi[1 + count*7], 6);
+            count++;
+        }
+        BufferForRPi[0] = count;
+        Wire.write(BufferForRPi, 1 + count*7);
+        UpdateAttentionLine();
+        return;
+    }
     cmd = pop_rsp(&p1, &p2);
     if (cmd != -1) {
         BufferForRPi[0] = cmd;
@@ -1154,6 +1324,7 @@ void sendEvent() {
         BufferForRPi[4] = 0;
         Wire.write(BufferForRPi,5);
     }
+    UpdateAttentionLine();
 }
 
 boolean push(volatile Queue * queue, int IncomingIc, int param, int param2) {
@@ -1185,14 +1356,14 @@ int pop(volatile Queue * queue, int * param, int * param2) {
     return(retvalue);
 }
 
-void push_cmd(int cmd, int param) {
-    push(&CommandQueue, cmd, param, 0);
+boolean push_cmd(int cmd, int param) {
+    return(push(&CommandQueue, cmd, param, 0));
 }
 int pop_cmd(int * param) {
     return(pop(&CommandQueue, param, NULL));
 }
-void push_rsp(int rsp, int param, int param2) {
-    push(&ResponseQueue, rsp, param, param2);
+boolean push_rsp(int rsp, int param, int param2) {
+    return(push(&ResponseQueue, rsp, param, param2));
 }
 int pop_rsp(int * param, int * param2) {
     return(pop(&ResponseQueue, param, param2));
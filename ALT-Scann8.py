@@ -51,6 +51,7 @@ import math
 import hashlib
 import uuid
 import base64
+import io
 import webbrowser
 
 try:
@@ -74,7 +75,7 @@ except ImportError:
 
 try:
     import smbus
-    from picamera2 import Picamera2, Preview
+    from picamera2 import Picamera2, Preview, MappedArray
     from libcamera import Transform
     from libcamera import controls
 
@@ -82,8 +83,10 @@ try:
     IsPiCamera2 = True
     # Global variable to allow basic UI testing on PC (where PiCamera imports should fail)
     SimulatedRun = False
+    hardware_libs_loaded = True
 except ImportError:
     SimulatedRun = True
+    hardware_libs_loaded = False
 
 try:
     import qrcode
@@ -111,12 +114,17 @@ from camera_resolutions import CameraResolutions
 from dynamic_spinbox import DynamicSpinbox
 from tooltip import Tooltips
 from rolling_average import RollingAverage
-
-try:
-    import rawpy
-    can_check_dng_frames_for_misalignment = True
-except ImportError:
-    can_check_dng_frames_for_misalignment = False
+from shared_memory_encoder import SharedMemoryEncoder
+from save_worker_pool import SaveWorkerPool
+from byte_budget_queue import ByteBudgetQueue
+from spill_buffer import SpillBuffer
+from read_prefetcher import ReadPrefetcher
+from controller_link import ControllerLink, CAP_MULTI_RESPONSE, CAP_CHECKED_PROTOCOL
+from attention_line import GpioAttentionLine, SimulatedAttentionLine
+from controller_simulator import ControllerSimulator
+import replay_camera
+from frame_tracer import FrameTracer
+from frame_alignment import frame_centered_otsu
 
 #  ######### Global variable definition ##########
 win = None
@@ -180,7 +188,6 @@ anonymous_user_filename = os.path.join(ScriptDir, "alt_scann8_id.txt")  # Adjust
 available_space_mb = 0
 disk_space_error_to_notify = False
 
-ArduinoTrigger = 0
 last_frame_time = 0
 last_steps_time = 0
 reference_inactivity_delay = 6  # Max time (in sec) we wait for next frame. If expired, we force next frame again
@@ -209,6 +216,69 @@ IMAGE_TOKEN = "IMAGE_TOKEN"  # Queue element is an image
 REQUEST_TOKEN = "REQUEST_TOKEN"  # Queue element is a PiCamera2 request
 MaxQueueSize = 16
 DisableThreads = False
+ProcessPoolEncoder = False  # Encode JPG/PNG frames in worker processes (shared memory) instead of in the save threads
+image_encoder = None
+SaveWorkersMin = 2  # Save worker pool grows/shrinks between these limits, depending on queue depth and save latency
+SaveWorkersMax = 6
+save_worker_pool = None
+# Queues are also bounded by the memory used by queued items. When over budget, save queue blocks capture (nothing
+# is lost, scan slows down), display queue drops frames (only preview is lost)
+SaveQueueBudgetMB = 512
+DisplayQueueBudgetMB = 128
+capture_display_queue = None
+capture_save_queue = None
+# When save queue is over budget (target storage stalled), frames can be spilled to a fast local folder instead of
+# making capture wait. They are moved to the target folder later, in the background
+SpillEnabled = False
+SpillFolder = "/dev/shm/ALT-Scann8-spill"
+SpillMaxMB = 1024
+spill_buffer = None
+# Preview sized second stream (PiCamera2 lores), so that display thread does not need to resize full frames
+LoresPreview = True
+lores_preview_size = None  # Size of lores stream, None if not configured
+# Event driven scan: Scan sequencing (wait for frame, AE/AWB settle, capture, advance) runs in a dedicated thread woken
+# up by controller events, instead of capture_loop being re-armed by Tk timers. UI updates requested from that thread
+# are done by the Tk thread (see ui_call)
+ScanEventDriven = True
+scan_thread = None
+scan_event = threading.Event()
+# Scan state shared by scan thread and Tk thread (controller events, UI): NewFrameAvailable, ScanStopRequested,
+# ScanProcessError and scan error counters. Flags are consumed (read and cleared) by the scan sequence while holding it
+scan_state_lock = threading.Lock()
+ui_call_queue = queue.Queue()
+ui_calls_after = 0
+frame_event_time = 0  # Time when last frame available event was received
+# All I2C transactions are done by the ControllerLink thread: Controller polled every ControllerPollInterval ms, events
+# received dispatched by arduino_listen_loop in Tk thread
+ControllerPollInterval = 5
+controller_link = None
+# Checked protocol (sequence numbers and CRC) with controller, if supported: Lost messages sent again within a few ms,
+# no need to force a new frame after several seconds without news from controller
+CheckedProtocol = False
+# Attention line: RPi GPIO (BCM number) wired to controller pin asserted while it has responses queued (Nano: A3,
+# Pico: AUX2). Controller polled as soon as it is asserted, otherwise every AttentionPollInterval ms only. None: Not used
+# Nano (5V) line is open drain, active low, pulled up to 3.3V by the RPi: Wire it directly, without any pull up to 5V
+# (RPi GPIOs are not 5V tolerant). Pico (3.3V) drives it active high: Set AttentionActiveLow to False
+AttentionGpio = None
+AttentionActiveLow = True
+AttentionPollInterval = 50
+# Controller simulator (-c): Software controller instead of the real one, so that the scan path used with real
+# hardware runs without it. Settings passed to ControllerSimulator (e.g. "frame_time", "reel_frames",
+# "io_error_rate"), plus "attention_line" to also simulate the attention line
+UseControllerSimulator = False
+ControllerSimulatorSettings = {}
+controller_simulator = None
+# Replay camera (-r): Frames served from a folder of images (or generated ones) instead of the camera, so that the
+# capture path can run (and be profiled) without a Raspberry Pi camera. Settings passed to ReplayCamera (e.g.
+# "folder", "readout_time", "ae_speed")
+UseReplayCamera = False
+ReplayCameraSettings = {}
+# Frame trace (-g): Time taken by each stage of each frame (controller wait, AE/AWB waits, capture, queue waits,
+# encode, write, alignment check, display), written to Logs folder as a Chrome/Perfetto trace when scan ends
+TraceEnabled = False
+TraceBufferSize = 100000    # Spans kept (oldest overwritten), about 20 per frame
+frame_tracer = FrameTracer(TraceBufferSize)
+frame_wait_start = 0    # Time (perf_counter) the scan thread started waiting for next frame
 FrameArrivalTime = 0
 # Ids to allow cancelling afters on exit
 onesec_after = 0
@@ -241,6 +311,11 @@ ZoomSize = 0
 simulated_captured_frame_list = [None] * 1000
 simulated_capture_image = ''
 simulated_images_in_list = 0
+# Simulated scan: Frames read ahead in the background (number of frames and memory limit), so that preview display
+# does not wait on the folder I/O (e.g. network share) for each frame
+SimulatedPrefetchDepth = 8
+SimulatedPrefetchMaxMB = 256
+simulated_prefetcher = None
 preview_image_id_to_delete = None  # Image reference kept to clean up in next loop
 scan_error_counter = 0  # Number of RSP_SCAN_ERROR received
 scan_error_total_frames_counter = 0  # Number of frames received since error counter set to zero
@@ -304,6 +379,7 @@ SimplifiedMode = False
 UIScrollbars = False
 DetectMisalignedFrames = True
 MisalignedFrameTolerance = 8
+MisalignedSliceWidth = 10   # Width of the left stripe analyzed to detect misaligned frames
 FontSize = 0
 LoggingMode = "INFO"
 LogLevel = 20
@@ -450,6 +526,7 @@ total_wait_time_save_image = 0
 total_wait_time_preview_display = 0
 total_wait_time_awb = 0
 total_wait_time_autoexp = 0
+total_wait_time_frame_event = 0  # Time from frame available event to start of capture
 time_save_image = None
 time_preview_display = None
 time_awb = None
@@ -600,23 +677,30 @@ def exit_app(do_save):  # Exit Application
         win.after_cancel(onesec_after)
     if arduino_after != 0:
         win.after_cancel(arduino_after)
+    if ui_calls_after != 0:
+        win.after_cancel(ui_calls_after)
     # Terminate threads
     if not SimulatedRun and not CameraDisabled:
         capture_display_event.set()
-        capture_save_event.set()
         capture_display_queue.put(END_TOKEN)
-        capture_save_queue.put(END_TOKEN)
-        capture_save_queue.put(END_TOKEN)
-        capture_save_queue.put(END_TOKEN)
+        save_worker_pool.stop()
 
         while active_threads > 0:
             win.update()
             logging.debug(f"Waiting for threads to exit, {active_threads} pending")
             time.sleep(0.2)
+        if spill_buffer is not None:
+            spill_buffer.close()
+        if image_encoder is not None:
+            image_encoder.close()
 
     # Uncomment next two lines when running on RPi
     if not SimulatedRun:
         send_arduino_command(CMD_TERMINATE)  # Tell Arduino we stop (to turn off uv led
+        controller_link.stop()   # Pending commands (CMD_TERMINATE) are sent before stopping
+        logging.debug(f"I2C transactions: {controller_link.stats_report()}")
+        if controller_simulator is not None:
+            controller_simulator.stop()
         # Close preview if required
         if not CameraDisabled:
             if PiCam2PreviewEnabled:
@@ -862,13 +946,13 @@ def cmd_detect_misaligned_frames():
     global DetectMisalignedFrames, misaligned_tolerance_label
     DetectMisalignedFrames = detect_misaligned_frames.get()
     ConfigData["DetectMisalignedFrames"] = DetectMisalignedFrames
-    scan_error_counter_value_label.config(state = NORMAL if DetectMisalignedFrames and (FileType != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
+    scan_error_counter_value_label.config(state = NORMAL if DetectMisalignedFrames else DISABLED)
 
 
 def cmd_select_file_type(selected):
     global FileType
-    misaligned_tolerance_label.config(state = NORMAL if detect_misaligned_frames.get() and (file_type_dropdown_selected.get() != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
-    misaligned_tolerance_spinbox.config(state = NORMAL if detect_misaligned_frames.get() and (file_type_dropdown_selected.get() != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
+    misaligned_tolerance_label.config(state = NORMAL if detect_misaligned_frames.get() else DISABLED)
+    misaligned_tolerance_spinbox.config(state = NORMAL if detect_misaligned_frames.get() else DISABLED)
 
 
 
@@ -1005,8 +1089,8 @@ def cmd_settings_popup_accept():
     capture_info_str.set(f"{FileType} - {CaptureResolution}")
 
     if not SimplifiedMode:
-        detect_misaligned_frames_btn.config(state = NORMAL if (FileType != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
-        scan_error_counter_value_label.config(state = NORMAL if DetectMisalignedFrames and (FileType != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
+        detect_misaligned_frames_btn.config(state = NORMAL)
+        scan_error_counter_value_label.config(state = NORMAL if DetectMisalignedFrames else DISABLED)
 
     if DisableToolTips:
         as_tooltips.disable()
@@ -1195,8 +1279,8 @@ def cmd_settings_popup():
     options_ok_btn.grid(row=options_row, column=1, padx=10, pady=5, sticky='E')
 
     # arrange status for multidependent widgets. Initially enabled, increase counter for each disable condition   
-    misaligned_tolerance_label.config(state = NORMAL if DetectMisalignedFrames and (FileType != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
-    misaligned_tolerance_spinbox.config(state = NORMAL if DetectMisalignedFrames and (FileType != "dng" or can_check_dng_frames_for_misalignment) else DISABLED)
+    misaligned_tolerance_label.config(state = NORMAL if DetectMisalignedFrames else DISABLED)
+    misaligned_tolerance_spinbox.config(state = NORMAL if DetectMisalignedFrames else DISABLED)
 
     options_dlg.protocol("WM_DELETE_WINDOW", cmd_settings_popup_dismiss)  # intercept close button
     options_dlg.transient(win)  # dialog window is related to main
@@ -1784,7 +1868,6 @@ def adjust_auto_fine_tune():
 
 def is_frame_centered(img, film_type ='S8', compensate=True, threshold=10, slice_width=10):
     # Get dimensions of the binary image
-    height = img.shape[0]
     width = img.shape[1]
 
     # Slice only the left part of the image
@@ -1795,62 +1878,11 @@ def is_frame_centered(img, film_type ='S8', compensate=True, threshold=10, slice
     # Convert to grayscale
     img = cv2.cvtColor(sliced_image, cv2.COLOR_BGR2GRAY)
 
-    # Convert to pure black and white (binary image)
-    # _, binary_img = cv2.threshold(sliced_image, 220, 255, cv2.THRESH_BINARY)
-    _, binary_img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-
-    # Calculate the middle horizontal line
-    middle = height // 2
-
     # Adjust VCenter (not all films have the frames vertically centered respect to the holes)
-    if compensate:
-        middle += FrameVCenterImageShift
+    v_shift = FrameVCenterImageShift if compensate else 0
 
-    # Calculate margin
-    margin = height*threshold//100
-
-    # Sum along the width to get a 1D array representing white pixels at each height
-    height_profile = np.sum(binary_img, axis=1)
-    
-    # Find where the sum is non-zero (white areas)
-    if film_type == 'S8':
-        white_heights = np.where(height_profile > 0)[0]
-    else:
-        white_heights = np.where(height_profile == 0)[0]
-    
-    areas = []
-    start = None
-    min_gap_size = int(height*0.08)  # minimum hole height is around 8% of the frame height
-    previous = None
-    for i in white_heights:
-        if start is None:
-            start = i
-        if previous is not None and i-previous > 1: # end of first ares, check size
-            if previous-start > min_gap_size:  # min_gap_size is minimum number of consecutive pixels to skip small gaps
-                areas.append((start, previous - 1))
-            start = i
-        previous = i
-    if start is not None and white_heights[-1]-start > min_gap_size:  # Add the last area if it exists
-        areas.append((start, white_heights[-1]))
-    
-    result = 0
-    bigger = 0
-    area_count = 0
-    for start, end in areas:
-        area_count += 1
-        if area_count > 2:
-            break
-        if end-start > bigger:
-            bigger = end-start
-            center = int((start + end) // 2)
-            result = center
-
-    if result != 0:
-        if result >= middle - margin and result <= middle + margin:
-            return True, (result - middle) if result > middle else -(middle - result)
-        else:
-            return False, (result - middle) if result > middle else -(middle - result)
-    return False, -1
+    centered, offset, otsu_threshold = frame_centered_otsu(img, film_type, threshold, v_shift)
+    return centered, offset
 
 
 def reverse_image(image):
@@ -1876,115 +1908,231 @@ def capture_display_thread(queue, event, id):
         image = message[1]
         curframe = message[2]
         hdr_idx = message[3]
+        frame_tracer.end(('display', curframe, hdr_idx), 'display queue wait', curframe)
 
-        # If too many items in queue the skip display
-        if (MaxQueueSize - queue.qsize() <= 5):
-            logging.warning("Display queue almost full: Skipping frame display")
-        else:
-            draw_preview_image(image, curframe, hdr_idx)
-            logging.debug("Display thread complete: %s ms", str(round((time.time() - curtime) * 1000, 1)))
+        draw_preview_image(image, curframe, hdr_idx)
+        logging.debug("Display thread complete: %s ms", str(round((time.time() - curtime) * 1000, 1)))
     active_threads -= 1
     logging.debug("Exiting capture_display_thread")
 
 
-def capture_save_thread(queue, event, id):
+def queue_item_size(item):
+    # Estimated memory used by a queue item, for byte budgeted queues
+    if not isinstance(item, tuple):     # END_TOKEN
+        return 0
+    payload = item[1]
+    if isinstance(payload, Image.Image):
+        return payload.width * payload.height * len(payload.getbands())
+    if isinstance(payload, np.ndarray):
+        return payload.nbytes
+    # PiCamera2 request: Main stream (RGB888) plus raw stream (up to 16 bits per pixel), both at sensor resolution
+    width, height = camera_resolutions.get_sensor_resolution()
+    return width * height * (3 + 2)
+
+
+def queue_for_display(item):
+    # Display queue never blocks the caller: If over budget, frame is not displayed
+    key = ('display', item[2], item[3])     # Frame, HDR exposure
+    frame_tracer.begin(key)
+    try:
+        capture_display_queue.put(item, block=False)
+    except queue.Full:
+        frame_tracer.end(key, 'display skipped', item[2])
+        logging.warning("Display queue over budget: Skipping frame display")
+
+
+def spill_item(item):
+    # Write queue item to spill folder, returns False if not possible (spill folder full)
+    type, payload, frame_idx, hdr_idx = item
+    if hdr_idx > 1:  # Hdr frame 1 has standard filename
+        filename = HdrFrameFilenamePattern % (frame_idx, hdr_idx, FileType)
+    else:
+        filename = FrameFilenamePattern % (frame_idx, FileType)
+    if type == REQUEST_TOKEN:
+        display_from_request = (hdr_idx == 0 and frame_idx % PreviewModuleValue == 0
+                                and lores_preview_size is None)
+        if FileType == 'dng':
+            width, height = camera_resolutions.get_sensor_resolution()
+            spilled = spill_buffer.spill_file(payload.save_dng, width * height * 2, filename)
+            if spilled and display_from_request:
+                queue_for_display(tuple((IMAGE_TOKEN, payload.make_image('main'), frame_idx, hdr_idx)))
+        else:
+            image = payload.make_image('main')
+            if NegativeImage:
+                image = reverse_image(image)
+            spilled = spill_buffer.spill_array(np.asarray(image), filename)
+            if spilled and display_from_request:
+                queue_for_display(tuple((IMAGE_TOKEN, image, frame_idx, hdr_idx)))
+        if spilled:
+            payload.release()
+    else:
+        spilled = spill_buffer.spill_array(np.asarray(payload), filename)
+    if spilled:
+        logging.warning(f"Save queue over budget: Frame {frame_idx} spilled to {SpillFolder}")
+    return spilled
+
+
+def save_spilled_frame(array, filename):
+    # Invoked by spill buffer drain thread
+    pending_save = save_captured_image(array, filename, 0)
+    if pending_save is not None:
+        pending_save.get()
+
+
+def queue_for_save(item):
+    # Save queue applies backpressure: If over budget, capture waits until save threads release some memory
+    key = ('save', item[2], item[3])    # Frame, HDR exposure
+    frame_tracer.begin(key)
+    # Frames are never dropped here, so capacity is checked first instead of a non-blocking put (which would count
+    # them as rejected)
+    if not capture_save_queue.would_block(item):
+        capture_save_queue.put(item)
+        return
+    if spill_buffer is not None and spill_item(item):
+        frame_tracer.end(key, 'spill', item[2])
+        return
+    logging.warning(f"Save queue over budget ({capture_save_queue.bytes_used() // 2**20} MB): Capture waiting")
+    curtime = time.time()
+    with frame_tracer.span('save queue full', item[2]):
+        capture_save_queue.put(item)
+    logging.warning(f"Save queue: Capture resumed after {round((time.time() - curtime) * 1000, 1)} ms")
+
+
+def save_captured_image(image, filename, id, frame=None):
+    # Save (PIL image or NumPy array) either from the calling thread (PIL) or using the process pool encoder, if
+    # enabled. With the encoder, returns as soon as the frame is in shared memory: Caller goes on with other work
+    # while the frame is saved, and waits for it (get() on the returned result) before completing
+    if image_encoder is not None:
+        return image_encoder.encode_async(image, filename, quality=95)
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    if frame_tracer.enabled:
+        # Encoded in memory, then written, so that both are traced separately
+        buffer = io.BytesIO()
+        with frame_tracer.span('encode', frame):
+            image.save(buffer, format=Image.registered_extensions()[os.path.splitext(filename)[1].lower()],
+                       quality=95)
+        with frame_tracer.span('write', frame):
+            with open(filename, 'wb') as f:
+                f.write(buffer.getbuffer())
+    else:
+        image.save(filename, quality=95)
+
+
+def capture_save_item(message, id):
     global ScanStopRequested
-    global active_threads
     global total_wait_time_save_image
     global scan_error_counter, scan_error_total_frames_counter, DetectMisalignedFrames, MisalignedFrameTolerance
     global FilmType
 
-    logging.debug("Started capture_save_thread n.%i", id)
-    while not event.is_set() or not queue.empty():
-        message = queue.get()
-        curtime = time.time()
-        logging.debug("Thread %i: Retrieved message from capture save queue", id)
-        if ExitingApp:
-            break
-        if message == END_TOKEN:
-            break
-        # Invert image if button selected
-        is_dng = FileType == 'dng'
-        is_png = FileType == 'png'
-        # Extract info from message
-        type = message[0]
-        if type == REQUEST_TOKEN:
-            request = message[1]
-        elif type == IMAGE_TOKEN:
-            if is_dng:
-                logging.error("Cannot save plain image to DNG file.")
-                ScanStopRequested = True  # If target dir does not exist, stop scan
-                return
-            captured_image = message[1]
-        else:
-            logging.error(f"Invalid message type received: {type}")
-        frame_idx = message[2]
-        hdr_idx = message[3]
+    # Invoked by save worker pool threads for each item retrieved from capture save queue
+    curtime = time.time()
+    frame_tracer.end(('save', message[2], message[3]), 'save queue wait', message[2])
+    logging.debug("Thread %i: Retrieved message from capture save queue", id)
+    if ExitingApp:
+        return
+    # Invert image if button selected
+    is_dng = FileType == 'dng'
+    is_png = FileType == 'png'
+    # Extract info from message
+    type = message[0]
+    if type == REQUEST_TOKEN:
+        request = message[1]
+    elif type == IMAGE_TOKEN:
         if is_dng:
-            # Saving DNG/PNG implies passing a request, not an image, therefore no additional checks (no negative allowed)
-            if hdr_idx > 1:  # Hdr frame 1 has standard filename
+            logging.error("Cannot save plain image to DNG file.")
+            with scan_state_lock:
+                ScanStopRequested = True  # If target dir does not exist, stop scan
+            return
+        captured_image = message[1]
+    else:
+        logging.error(f"Invalid message type received: {type}")
+    frame_idx = message[2]
+    hdr_idx = message[3]
+    # Preview is extracted from the request here (not in capture loop) for single frame captures
+    # With lores preview stream, display is done from capture thread
+    display_from_request = (type == REQUEST_TOKEN and hdr_idx == 0 and frame_idx % PreviewModuleValue == 0
+                            and lores_preview_size is None)
+    if is_dng:
+        # Saving DNG/PNG implies passing a request, not an image, therefore no additional checks (no negative allowed)
+        if hdr_idx > 1:  # Hdr frame 1 has standard filename
+            with frame_tracer.span('save', frame_idx):
                 request.save_dng(HdrFrameFilenamePattern % (frame_idx, hdr_idx, FileType))
-            else:  # Non HDR
-                request.save_dng(FrameFilenamePattern % (frame_idx, FileType))                    
-                if DetectMisalignedFrames and can_check_dng_frames_for_misalignment:
-                    captured_image = request.make_array('main')
-            request.release()   # Release request ASAP (delay frame alignment check)
-            if DetectMisalignedFrames and can_check_dng_frames_for_misalignment and hdr_idx <= 1:
-                frame_centered, offset = is_frame_centered(captured_image, FilmType, threshold=MisalignedFrameTolerance)
-                offset_image.add_value(offset)
-                if AutoFineTuneEnabled:
-                    adjust_auto_fine_tune()
-                if not frame_centered:
-                    scan_error_counter += 1
-                    if scan_error_total_frames_counter > 0:
-                        scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
-                    with open(scan_error_log_fullpath, 'a') as f:
-                        f.write(f"Misaligned frame, {CurrentFrame}\n")
-            logging.debug("Thread %i saved request DNG image: %s ms", id,
+        else:  # Non HDR
+            with frame_tracer.span('save', frame_idx):
+                request.save_dng(FrameFilenamePattern % (frame_idx, FileType))
+            if DetectMisalignedFrames:
+                # Only the left stripe is needed for the alignment check: Copy just that from the main stream
+                # buffer, no need for a full frame copy
+                with MappedArray(request, 'main') as mapped:
+                    captured_image = mapped.array[:, :MisalignedSliceWidth].copy()
+        if display_from_request:
+            queue_for_display(tuple((IMAGE_TOKEN, request.make_image('main'), frame_idx, hdr_idx)))
+        request.release()   # Release request ASAP (delay frame alignment check)
+        if DetectMisalignedFrames and hdr_idx <= 1:
+            with frame_tracer.span('alignment', frame_idx):
+                frame_centered, offset = is_frame_centered(captured_image, FilmType,
+                                                           threshold=MisalignedFrameTolerance,
+                                                           slice_width=MisalignedSliceWidth)
+            offset_image.add_value(offset)
+            if AutoFineTuneEnabled:
+                adjust_auto_fine_tune()
+            if not frame_centered:
+                scan_error_counter += 1
+                if scan_error_total_frames_counter > 0:
+                    scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
+                with open(scan_error_log_fullpath, 'a') as f:
+                    f.write(f"Misaligned frame, {CurrentFrame}\n")
+        logging.debug("Thread %i saved request DNG image: %s ms", id,
+                      str(round((time.time() - curtime) * 1000, 1)))
+    else:
+        # If not is_dng AND request: Convert to image now (releasing request ASAP), and do a PIL save
+        if type == REQUEST_TOKEN:
+            with frame_tracer.span('extract', frame_idx):
+                captured_image = request.make_image('main')
+            request.release()
+            if NegativeImage:
+                captured_image = reverse_image(captured_image)
+            if display_from_request:
+                queue_for_display(tuple((IMAGE_TOKEN, captured_image, frame_idx, hdr_idx)))
+            logging.debug("Thread %i extracted image from request: %s ms", id,
                           str(round((time.time() - curtime) * 1000, 1)))
+        save_start = time.perf_counter()
+        if hdr_idx > 1:  # Hdr frame 1 has standard filename
+            logging.debug("Saving HDR frame n.%i", hdr_idx)
+            pending_save = save_captured_image(captured_image, HdrFrameFilenamePattern % (frame_idx, hdr_idx,
+                                                                                          FileType), id, frame_idx)
         else:
-            # If not is_dng AND negative_image AND request: Convert to image now, and do a PIL save
-            if type == REQUEST_TOKEN:
-                if NegativeImage:   # Warning  case
-                    logging.warning("Cannot reverse a PiCamera2 request, saving as captured.")
-                if hdr_idx > 1:  # Hdr frame 1 has standard filename
-                    request.save('main',
-                                 HdrFrameFilenamePattern % (frame_idx, hdr_idx, FileType))
-                else:  # Non HDR
-                    request.save('main', FrameFilenamePattern % (frame_idx, FileType))
-                    if DetectMisalignedFrames:
-                        captured_image = request.make_array('main')
-                request.release()
-                logging.debug("Thread %i saved request image: %s ms", id,
-                              str(round((time.time() - curtime) * 1000, 1)))
-            else:
-                if hdr_idx > 1:  # Hdr frame 1 has standard filename
-                    logging.debug("Saving HDR frame n.%i", hdr_idx)
-                    captured_image.save(
-                        HdrFrameFilenamePattern % (frame_idx, hdr_idx, FileType), quality=95)
-                else:
-                    captured_image.save(FrameFilenamePattern % (frame_idx, FileType),
-                                        quality=95)
-                    # Once the PIL Image has been saved, convert it to an array, as expected by is_frame_centered
-                    captured_image = np.array(captured_image)
-                logging.debug("Thread %i saved image: %s ms", id,
-                              str(round((time.time() - curtime) * 1000, 1)))
-            frame_centered, offset = is_frame_centered(captured_image, FilmType, threshold=MisalignedFrameTolerance)
+            pending_save = save_captured_image(captured_image, FrameFilenamePattern % (frame_idx, FileType), id,
+                                               frame_idx)
+            # Once the PIL Image has been saved (or copied to the encoder), convert it to an array, as expected by
+            # is_frame_centered
+            captured_image = np.array(captured_image)
+        # Other HDR exposures show the same frame position (and are still PIL images): Checked once per frame
+        if hdr_idx <= 1:
+            with frame_tracer.span('alignment', frame_idx):
+                frame_centered, offset = is_frame_centered(captured_image, FilmType,
+                                                           threshold=MisalignedFrameTolerance)
             offset_image.add_value(offset)
             if AutoFineTuneEnabled:
                 adjust_auto_fine_tune()
-            if DetectMisalignedFrames and hdr_idx <= 1 and not frame_centered:
+            if DetectMisalignedFrames and not frame_centered:
                 scan_error_counter += 1
                 if scan_error_total_frames_counter > 0:
                     scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
                 with open(scan_error_log_fullpath, 'a') as f:
                     f.write(f"Misaligned frame, {CurrentFrame}\n")
             logging.debug("Thread %i after checking misaligned frames", id)
-        aux = time.time() - curtime
-        total_wait_time_save_image += aux
-        time_save_image.add_value(aux)
-    active_threads -= 1
-    logging.debug("Exiting capture_save_thread n.%i", id)
+        if pending_save is not None:
+            # Frame encoded by process pool encoder while checking alignment: Wait for it to be written
+            encode_time = pending_save.get()
+            frame_tracer.add('save', frame_idx, save_start)
+            logging.debug("Thread %i, process pool encoder: %s ms", id, str(round(encode_time * 1000, 1)))
+        logging.debug("Thread %i saved image: %s ms", id,
+                      str(round((time.time() - curtime) * 1000, 1)))
+    aux = time.time() - curtime
+    total_wait_time_save_image += aux
+    time_save_image.add_value(aux)
 
 
 def disable_canvas(canvas):
@@ -2008,6 +2156,7 @@ def draw_preview_image(preview_image, curframe, idx):
     global preview_image_id_to_delete, IsSplashDisplayed, FocusViewEnabled, ScanOngoing, FocusPeakingEnabled
 
     curtime = time.time()
+    trace_start = time.perf_counter()
 
     if curframe % PreviewModuleValue == 0 and preview_image is not None:
         if FocusViewEnabled and FocusPeakingEnabled and preview_image is not None:
@@ -2030,8 +2179,9 @@ def draw_preview_image(preview_image, curframe, idx):
             except Exception as e:
                 logging.debug(f"Focus assist error: {e}")
         if idx == 0 or (idx == 2 and not HdrViewX4Active):
-            # Resiz image to fit canvas. Need to add 4 to each, otherwise there is a canvas cap not covered.
-            preview_image = preview_image.resize((PreviewWidth, PreviewHeight))
+            # Resize image to fit canvas, unless it comes already at canvas size (cropped from lores stream)
+            if preview_image.size != (PreviewWidth, PreviewHeight):
+                preview_image = preview_image.resize((PreviewWidth, PreviewHeight))
             PreviewAreaImage = ImageTk.PhotoImage(preview_image)
         elif HdrViewX4Active:
             # if using View4X mode and there are 5 exposures, we do not display the 5th
@@ -2060,6 +2210,7 @@ def draw_preview_image(preview_image, curframe, idx):
     aux = time.time() - curtime
     total_wait_time_preview_display += aux
     time_preview_display.add_value(aux)
+    frame_tracer.add('display', curframe, trace_start)
     logging.debug("Display preview image: %s ms", str(round((time.time() - curtime) * 1000, 1)))
 
 
@@ -2091,7 +2242,11 @@ def emergency_stop():
 def update_rpi_temp():
     global RPiTemp
     if not SimulatedRun:
-        file = open('/sys/class/thermal/thermal_zone0/temp', 'r')
+        try:
+            file = open('/sys/class/thermal/thermal_zone0/temp', 'r')
+        except OSError:     # Not a Raspberry Pi (e.g. controller simulator)
+            RPiTemp = 64.5
+            return
         temp_str = file.readline()
         file.close()
         RPiTemp = int(int(temp_str) / 100) / 10
@@ -2418,8 +2573,8 @@ def adjust_hdr_bracket():
         PreviousCurrentExposure = aux_current_exposure
         hdr_best_exp = aux_current_exposure
         HdrMinExp = max(hdr_best_exp - int(HdrBracketWidth / 2), HdrMinExp)
-        hdr_min_exp_value.set(HdrMinExp)
-        hdr_max_exp_value.set(HdrMinExp + HdrBracketWidth)
+        ui_call(hdr_min_exp_value.set, HdrMinExp)
+        ui_call(hdr_max_exp_value.set, HdrMinExp + HdrBracketWidth)
         ConfigData["HdrMinExp"] = HdrMinExp
         ConfigData["HdrMaxExp"] = HdrMaxExp
         recalculate_hdr_exp_list = True
@@ -2464,16 +2619,19 @@ def capture_hdr(mode):
         if perform_dry_run:
             camera.set_controls({"ExposureTime": int(exp * 1000)})
         else:
-            time.sleep(StabilizationDelayValue/1000)  # Allow time to stabilize image only if no dry run
+            with frame_tracer.span('stabilization', CurrentFrame):
+                time.sleep(StabilizationDelayValue/1000)  # Allow time to stabilize image only if no dry run
         if perform_dry_run:
-            for i in range(1, dry_run_iterations):  # Perform a few dummy captures to allow exposure stabilization
-                camera.capture_image("main")
+            with frame_tracer.span('HDR dry run', CurrentFrame):
+                for i in range(1, dry_run_iterations):  # Perform a few dummy captures to allow exposure stabilization
+                    camera.capture_image("main")
         # We skip dry run only for the first capture of each frame,
         # as it is the same exposure as the last capture of the previous one
         perform_dry_run = True
         # For PiCamera2, preview and save to file are handled in asynchronous threads
         if HdrMergeInPlace and not is_dng:  # For now we do not even try to merge DNG images in place
-            captured_image = camera.capture_image("main")  # If merge in place, Capture snapshot (no DNG allowed)
+            with frame_tracer.span('capture', CurrentFrame):
+                captured_image = camera.capture_image("main")  # If merge in place, Capture snapshot (no DNG allowed)
             # Convert Pillow image to NumPy array
             img_np = np.array(captured_image)
             # Convert the NumPy array to a format suitable for MergeMertens (e.g., float32)
@@ -2482,32 +2640,36 @@ def capture_hdr(mode):
         else:
             if is_dng or is_png:  # If not using DNG we can still use multithread (if not disabled)
                 # DNG + HDR, save threads not possible due to request conflicting with retrieve metadata
-                request = camera.capture_request()
+                with frame_tracer.span('capture', CurrentFrame):
+                    request = camera.capture_request()
                 if CurrentFrame % PreviewModuleValue == 0:
                     captured_image = request.make_image('main')
                     # Display preview using thread, not directly
                     queue_item = tuple((IMAGE_TOKEN, captured_image, CurrentFrame, idx))
-                    capture_display_queue.put(queue_item)
+                    queue_for_display(queue_item)
                 curtime = time.time()
-                if idx > 1:  # Hdr frame 1 has standard filename
-                    request.save_dng(HdrFrameFilenamePattern % (CurrentFrame, idx, FileType))
-                else:  # Non HDR
-                    request.save_dng(FrameFilenamePattern % (CurrentFrame, FileType))
+                with frame_tracer.span('save', CurrentFrame):
+                    if idx > 1:  # Hdr frame 1 has standard filename
+                        request.save_dng(HdrFrameFilenamePattern % (CurrentFrame, idx, FileType))
+                    else:  # Non HDR
+                        request.save_dng(FrameFilenamePattern % (CurrentFrame, FileType))
                 request.release()
                 logging.debug(f"Capture hdr, saved request image ({CurrentFrame}, {idx}: "
                               f"{round((time.time() - curtime) * 1000, 1)}")
             else:
-                captured_image = camera.capture_image("main")
+                with frame_tracer.span('capture', CurrentFrame):
+                    captured_image = camera.capture_image("main")
                 if NegativeImage:
                     captured_image = reverse_image(captured_image)
                 if DisableThreads:  # Save image in main loop
                     curtime = time.time()
                     draw_preview_image(captured_image, CurrentFrame, idx)
-                    if idx > 1:  # Hdr frame 1 has standard filename
-                        captured_image.save(
-                            HdrFrameFilenamePattern % (CurrentFrame, idx, FileType))
-                    else:
-                        captured_image.save(FrameFilenamePattern % (CurrentFrame, FileType))
+                    with frame_tracer.span('save', CurrentFrame):
+                        if idx > 1:  # Hdr frame 1 has standard filename
+                            captured_image.save(
+                                HdrFrameFilenamePattern % (CurrentFrame, idx, FileType))
+                        else:
+                            captured_image.save(FrameFilenamePattern % (CurrentFrame, FileType))
                     logging.debug(f"Capture hdr, saved image ({CurrentFrame}, {idx}): "
                                   f"{round((time.time() - curtime) * 1000, 1)} ms")
                 else:  # send image to threads
@@ -2518,21 +2680,23 @@ def capture_hdr(mode):
                         queue_item = tuple((IMAGE_TOKEN, captured_image, CurrentFrame, idx))
                         if CurrentFrame % PreviewModuleValue == 0:
                             # Display preview using thread, not directly
-                            capture_display_queue.put(queue_item)
-                        capture_save_queue.put(queue_item)
+                            queue_for_display(queue_item)
+                        queue_for_save(queue_item)
                         logging.debug(f"Queueing hdr image ({CurrentFrame}, {idx})")
         idx += idx_inc
     if HdrMergeInPlace and not is_dng:
         # Perform merge of the HDR image list
-        img = MergeMertens.process(images_to_merge)
-        # Convert the result back to PIL
-        img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
-        img = Image.fromarray(img)
+        with frame_tracer.span('HDR merge', CurrentFrame):
+            img = MergeMertens.process(images_to_merge)
+            # Convert the result back to PIL
+            img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+            img = Image.fromarray(img)
         if CurrentFrame % PreviewModuleValue == 0:
             # Display preview using thread, not directly
             queue_item = tuple((IMAGE_TOKEN, img, CurrentFrame, 0))
-            capture_display_queue.put(queue_item)
-        img.save(FrameFilenamePattern % (CurrentFrame, FileType), quality=95)
+            queue_for_display(queue_item)
+        with frame_tracer.span('save', CurrentFrame):
+            img.save(FrameFilenamePattern % (CurrentFrame, FileType), quality=95)
 
 
 def capture_single(mode):
@@ -2542,62 +2706,64 @@ def capture_single(mode):
 
     # *** ALT-Scann8 capture frame ***
     if hw_panel_installed:
-        hw_panel.ALT_Scann8_captured_frame()
+        ui_call(hw_panel.ALT_Scann8_captured_frame)
 
     is_dng = FileType == 'dng'
     is_png = FileType == 'png'
     curtime = time.time()
     if not DisableThreads:
-        if is_dng or is_png:  # Save as request only for DNG captures
+        # Capture as request for all file types (DNG, PNG and JPEG): The request buffer is handed to the save threads,
+        # which build the image (and the preview, if required) from it, so that the capture loop gets the camera back
+        # without waiting for a full resolution copy to be done
+        with frame_tracer.span('capture', CurrentFrame):
             request = camera.capture_request()
-            # For PiCamera2, preview and save to file are handled in asynchronous threads
-            if CurrentFrame % PreviewModuleValue == 0:
-                captured_image = request.make_image('main')
-                # Display preview using thread, not directly
-                queue_item = tuple((IMAGE_TOKEN, captured_image, CurrentFrame, 0))
-                capture_display_queue.put(queue_item)
-            else:
+        if mode == 'normal' or mode == 'manual':  # Do not save in preview mode, only display
+            if CurrentFrame % PreviewModuleValue != 0:
                 time_preview_display.add_value(0)
-            if mode == 'normal' or mode == 'manual':  # Do not save in preview mode, only display
-                save_queue_item = tuple((REQUEST_TOKEN, request, CurrentFrame, 0))
-                capture_save_queue.put(save_queue_item)
-                logging.debug(f"Queueing frame ({CurrentFrame}")
+            elif lores_preview_size is not None:
+                # Lores preview is cheap to extract: Do it here, save thread will not need to
+                with frame_tracer.span('preview extract', CurrentFrame):
+                    preview_image = request_preview_image(request)
+                queue_for_display(tuple((IMAGE_TOKEN, preview_image, CurrentFrame, 0)))
+            save_queue_item = tuple((REQUEST_TOKEN, request, CurrentFrame, 0))
+            queue_for_save(save_queue_item)
+            logging.debug(f"Queueing frame ({CurrentFrame}")
         else:
-            captured_image = camera.capture_image("main")
-            if NegativeImage:
-                captured_image = reverse_image(captured_image)
-            queue_item = tuple((IMAGE_TOKEN, captured_image, CurrentFrame, 0))
-            # For PiCamera2, preview and save to file are handled in asynchronous threads
+            # Nothing to save, so no save thread involved: Extract preview here and release request
             if CurrentFrame % PreviewModuleValue == 0:
+                captured_image = request_preview_image(request)
                 # Display preview using thread, not directly
-                capture_display_queue.put(queue_item)
+                queue_item = tuple((IMAGE_TOKEN, captured_image, CurrentFrame, 0))
+                queue_for_display(queue_item)
             else:
                 time_preview_display.add_value(0)
-            if mode == 'normal' or mode == 'manual':  # Do not save in preview mode, only display
-                capture_save_queue.put(queue_item)
-                logging.debug(f"Queuing frame {CurrentFrame}")
+            request.release()
         if mode == 'manual':  # In manual mode, increase CurrentFrame
             CurrentFrame += 1
             # Update number of captured frames
             Scanned_Images_number.set(CurrentFrame)
     else:
         if is_dng or is_png:
-            request = camera.capture_request()
+            with frame_tracer.span('capture', CurrentFrame):
+                request = camera.capture_request()
             if CurrentFrame % PreviewModuleValue == 0:
                 captured_image = request.make_image('main')
             else:
                 captured_image = None
             draw_preview_image(captured_image, CurrentFrame, 0)
             if mode == 'normal' or mode == 'manual':  # Do not save in preview mode, only display
-                request.save_dng(FrameFilenamePattern % (CurrentFrame, FileType))
+                with frame_tracer.span('save', CurrentFrame):
+                    request.save_dng(FrameFilenamePattern % (CurrentFrame, FileType))
                 logging.debug(f"Saving DNG frame ({CurrentFrame}: {round((time.time() - curtime) * 1000, 1)}")
             request.release()
         else:
-            captured_image = camera.capture_image("main")
+            with frame_tracer.span('capture', CurrentFrame):
+                captured_image = camera.capture_image("main")
             if NegativeImage:
                 captured_image = reverse_image(captured_image)
             draw_preview_image(captured_image, CurrentFrame, 0)
-            captured_image.save(FrameFilenamePattern % (CurrentFrame, FileType), quality=95)
+            with frame_tracer.span('save', CurrentFrame):
+                captured_image.save(FrameFilenamePattern % (CurrentFrame, FileType), quality=95)
             logging.debug(
                 f"Saving image ({CurrentFrame}: {round((time.time() - curtime) * 1000, 1)}")
         aux = time.time() - curtime
@@ -2630,6 +2796,7 @@ def capture(mode):
     if AutoExpEnabled and not HdrCaptureActive and (
             ExposureWbAdaptPause or CurrentFrame % PreviewModuleValue == 0):
         curtime = time.time()
+        trace_start = time.perf_counter()
         wait_loop_count = 0
         while True:  # In case of exposure change, give time for the camera to adapt
             metadata = camera.capture_metadata()
@@ -2654,10 +2821,11 @@ def capture(mode):
                 break
         if wait_loop_count >= 0:
             if ExpertMode:
-                exposure_value.set(aux_current_exposure / 1000)
+                ui_call(exposure_value.set, aux_current_exposure / 1000)
             aux = time.time() - curtime
             total_wait_time_autoexp += aux
             time_autoexp.add_value(aux)
+            frame_tracer.add('AE wait', CurrentFrame, trace_start)
             logging.debug("AE match delay: %s ms", str(round((time.time() - curtime) * 1000, 1)))
     else:
         time_autoexp.add_value(0)
@@ -2666,6 +2834,7 @@ def capture(mode):
     # If AWB disabled, only enter as per preview_module to refresh values
     if AutoWbEnabled and (ExposureWbAdaptPause or CurrentFrame % PreviewModuleValue == 0):
         curtime = time.time()
+        trace_start = time.perf_counter()
         wait_loop_count = 0
         while True:  # In case of exposure change, give time for the camera to adapt
             metadata = camera.capture_metadata()
@@ -2691,11 +2860,12 @@ def capture(mode):
                 break
         if wait_loop_count >= 0:
             if ExpertMode:
-                wb_red_value.set(round(aux_gain_red, 1))
-                wb_blue_value.set(round(aux_gain_blue, 1))
+                ui_call(wb_red_value.set, round(aux_gain_red, 1))
+                ui_call(wb_blue_value.set, round(aux_gain_blue, 1))
             aux = time.time() - curtime
             total_wait_time_awb += aux
             time_awb.add_value(aux)
+            frame_tracer.add('AWB wait', CurrentFrame, trace_start)
             logging.debug("AWB Match delay: %s ms", str(round((time.time() - curtime) * 1000, 1)))
     else:
         time_awb.add_value(0)
@@ -2710,7 +2880,8 @@ def capture(mode):
             camera.switch_mode_and_capture_file(capture_config, FrameFilenamePattern % CurrentFrame)
     else:
         # Allow time to stabilize image, it can get too fast with PiCamera2
-        time.sleep(StabilizationDelayValue/1000)
+        with frame_tracer.span('stabilization', CurrentFrame):
+            time.sleep(StabilizationDelayValue/1000)
         if mode == 'still':
             captured_image = camera.capture_image("main")
             captured_image.save(StillFrameFilenamePattern % (CurrentFrame, CurrentStill))
@@ -2775,6 +2946,7 @@ def cmd_start_scan_simulated():
     global total_wait_time_save_image
     global session_frames
     global last_frame_time
+    global simulated_prefetcher
     
     if film_type.get() == '':
         tk.messagebox.showerror("Error!",
@@ -2827,12 +2999,50 @@ def cmd_start_scan_simulated():
                 logging.error("No frames exist in folder, cannot simulate scan.")
                 tk.messagebox.showerror("Error!", "Folder " + CurrentDir + " does not contain any frames to simulate scan.")
                 ScanStopRequested = True
+            elif SimulatedPrefetchDepth > 0:
+                simulated_prefetcher = ReadPrefetcher(simulated_frame_paths(CurrentFrame), SimulatedPrefetchDepth,
+                                                      SimulatedPrefetchMaxMB * 2**20)
             # Invoke simulate pt to start simulation
             win.after(10, simulate_pt)
 
+def simulated_frame_paths(first_frame):
+    # Endless sequence of the JPG files displayed by capture_loop_simulated, in the same order, from first_frame
+    # (empty if there are none, otherwise the prefetcher reader thread would loop forever looking for one)
+    if not any(os.path.splitext(filename)[1] == '.jpg' for filename in simulated_captured_frame_list):
+        return
+    frame = first_frame
+    while True:
+        filename = simulated_captured_frame_list[frame % simulated_images_in_list]
+        if os.path.splitext(filename)[1] == '.jpg':
+            yield os.path.join(CurrentDir, filename)
+        frame += 1
+
+
+def simulated_frame_image(frame, filename):
+    global simulated_prefetcher
+    # Image of frame from prefetcher if it is the expected one. Otherwise (file not readable, or sequence changed)
+    # read it directly, and restart prefetch from next frame
+    if simulated_prefetcher is not None:
+        path, content = next(simulated_prefetcher, (None, None))
+        if content is not None and path == os.path.join(CurrentDir, filename):
+            return Image.open(io.BytesIO(content))
+        logging.debug("Simulated scan: Prefetched %s instead of %s, reading directly", path, filename)
+        simulated_prefetcher.close()
+        simulated_prefetcher = ReadPrefetcher(simulated_frame_paths(frame + 1), SimulatedPrefetchDepth,
+                                              SimulatedPrefetchMaxMB * 2**20)
+    return Image.open(filename)
+
+
 def stop_scan_simulated():
     global win
     global ScanOngoing
+    global simulated_prefetcher
+
+    if simulated_prefetcher is not None:
+        simulated_prefetcher.close()
+        logging.debug("Total time waiting for frame reads: %s seg, (%i waits)",
+                      str(round(simulated_prefetcher.wait_time, 1)), simulated_prefetcher.waits)
+        simulated_prefetcher = None
 
     start_btn.config(text="START Scan", bg=save_bg, fg=save_fg, relief=RAISED)
 
@@ -2883,7 +3093,7 @@ def capture_loop_simulated():
         frame_to_display = CurrentFrame % simulated_images_in_list
         filename, ext = os.path.splitext(simulated_captured_frame_list[frame_to_display])
         if ext == '.jpg':
-            simulated_capture_image = Image.open(simulated_captured_frame_list[frame_to_display])
+            simulated_capture_image = simulated_frame_image(CurrentFrame, simulated_captured_frame_list[frame_to_display])
             if NegativeImage:
                 simulated_capture_image = reverse_image(simulated_capture_image)
             draw_preview_image(simulated_capture_image, CurrentFrame, 0)
@@ -2944,10 +3154,11 @@ def start_scan():
     global ScanStopRequested
     global NewFrameAvailable
     global total_wait_time_autoexp, total_wait_time_awb, total_wait_time_preview_display, session_start_time
-    global total_wait_time_save_image
+    global total_wait_time_save_image, total_wait_time_frame_event
     global session_frames
     global last_frame_time
     global AutoExpEnabled, AutoWbEnabled
+    global frame_wait_start
 
     if film_type.get() == '':
         tk.messagebox.showerror("Error!",
@@ -2955,7 +3166,9 @@ def start_scan():
         return
 
     if ScanOngoing:
-        ScanStopRequested = True  # Ending the scan process will be handled in the next (or ongoing) capture loop
+        with scan_state_lock:
+            ScanStopRequested = True  # Ending the scan process will be handled in the next (or ongoing) capture loop
+        scan_event.set()
     else:
         if BaseFolder == CurrentDir or not os.path.isdir(CurrentDir):
             tk.messagebox.showerror("Error!", "Please specify target folder where captured frames will be stored.")
@@ -2984,8 +3197,11 @@ def start_scan():
         last_frame_time = time.time() + 3
 
         # Set new frame indicator to false, in case this is the cause of the strange
-        # behaviour after stopping/restarting the scan process
-        NewFrameAvailable = False
+        # behaviour after stopping/restarting the scan process. Same for a stop request arrived after previous session
+        # ended (e.g. end of reel event)
+        with scan_state_lock:
+            NewFrameAvailable = False
+            ScanStopRequested = False
 
         # Enable/Disable related buttons
         except_widget_global_enable([start_btn], not ScanOngoing)
@@ -2995,6 +3211,7 @@ def start_scan():
         total_wait_time_preview_display = 0
         total_wait_time_awb = 0
         total_wait_time_autoexp = 0
+        total_wait_time_frame_event = 0
         session_start_time = time.time()
         session_frames = 0
 
@@ -3006,11 +3223,11 @@ def start_scan():
                 camera.set_controls({"ExposureTime": int(int(exposure_value.get() * 1000))})
             logging.debug("Sending CMD_START_SCAN")
             send_arduino_command(CMD_START_SCAN, FrameDetectMode == 'VFD')       # Pass first parameter as True if in VFD mode
+            frame_wait_start = time.perf_counter()
 
         refresh_qr_code()
 
-        # Invoke capture_loop a first time when scan starts
-        win.after(5, capture_loop)
+        start_scan_sequencer()
 
 
 def stop_scan():
@@ -3032,48 +3249,204 @@ def stop_scan():
     except_widget_global_enable([start_btn], not ScanOngoing)
 
 
+def end_scan_session():
+    global ScanStopRequested
+    global disk_space_error_to_notify
+
+    stop_scan()
+    ScanStopRequested = False
+    curtime = time.time()
+    if session_frames > 0:
+        logging.debug("Total session time: %s seg for %i frames (%i ms per frame, %.1f frames per minute)",
+                      str(round((curtime - session_start_time), 1)),
+                      session_frames,
+                      round(((curtime - session_start_time) * 1000 / session_frames), 1),
+                      session_frames * 60 / (curtime - session_start_time))
+        logging.debug("Total time to save images: %s seg, (%i ms per frame)",
+                      str(round((total_wait_time_save_image), 1)),
+                      round((total_wait_time_save_image * 1000 / session_frames), 1))
+        logging.debug("Total time to display preview image: %s seg, (%i ms per frame)",
+                      str(round((total_wait_time_preview_display), 1)),
+                      round((total_wait_time_preview_display * 1000 / session_frames), 1))
+        logging.debug("Total time waiting for AWB adjustment: %s seg, (%i ms per frame)",
+                      str(round((total_wait_time_awb), 1)),
+                      round((total_wait_time_awb * 1000 / session_frames), 1))
+        logging.debug("Total time waiting for AE adjustment: %s seg, (%i ms per frame)",
+                      str(round((total_wait_time_autoexp), 1)),
+                      round((total_wait_time_autoexp * 1000 / session_frames), 1))
+        logging.debug("Total time from frame event to capture (%s): %s seg, (%.1f ms per frame)",
+                      "scan thread" if scan_thread is not None else "Tk timers",
+                      str(round((total_wait_time_frame_event), 1)),
+                      total_wait_time_frame_event * 1000 / session_frames)
+    if controller_link is not None:
+        logging.debug(f"I2C transactions: {controller_link.stats_report()}")
+    if frame_tracer.enabled and session_frames > 0:
+        export_frame_trace()
+    if disk_space_error_to_notify:
+        tk.messagebox.showwarning("Disk space low",
+                                  f"Running out of disk space, only {int(available_space_mb)} MB remain. "
+                                  "Please delete some files before continuing current scan.")
+        disk_space_error_to_notify = False
+
+
+def export_frame_trace():
+    # Frames still being saved when scan ends are not included (their save spans go to next session trace)
+    global frame_wait_start
+
+    filename = os.path.join(os.path.dirname(scan_error_log_fullpath),
+                            "FrameTrace." + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    try:
+        count = frame_tracer.export(filename)
+        logging.info(f"Frame trace ({count} spans) written to {filename}")
+    except OSError as e:
+        logging.error(f"Cannot write frame trace to {filename}: {e}")
+    frame_tracer.clear()
+    frame_wait_start = 0
+
+
+def update_scan_frame_status():
+    # UI updates after each frame captured (always invoked in Tk thread)
+    global FramesPerMinute, FramesToGo
+    global ScanStopRequested
+
+    # Update remaining time
+    aux = frames_to_go_str.get()
+    if aux.isdigit() and time.time() > frames_to_go_key_press_time:
+        FramesToGo = int(aux)
+        if FramesToGo > 0:
+            FramesToGo -= 1
+            frames_to_go_str.set(str(FramesToGo))
+            ConfigData["FramesToGo"] = FramesToGo
+            if FramesPerMinute != 0:
+                minutes_pending = FramesToGo // FramesPerMinute
+                frames_to_go_time_str.set(f"{(minutes_pending // 60):02}h {(minutes_pending % 60):02}m")
+        else:
+            if AutoStopEnabled and autostop_type.get() == "counter_to_zero":
+                with scan_state_lock:
+                    ScanStopRequested = True  # Stop in next capture loop
+                scan_event.set()
+            ConfigData["FramesToGo"] = -1
+            frames_to_go_str.set('')  # clear frames to go box to prevent it stops again in next scan
+
+    # Update number of captured frames
+    Scanned_Images_number.set(CurrentFrame)
+    # Update film time
+    fps = 18 if ConfigData["FilmType"] == "S8" else 16
+    film_time = f"{(CurrentFrame // fps) // 60:02}:{(CurrentFrame // fps) % 60:02}"
+    scanned_Images_time_value.set(film_time)
+    # Update Frames per Minute
+    scan_period_frames = CurrentFrame - CurrentScanStartFrame
+    if FPM_CalculatedValue == -1:  # FPM not calculated yet, display some indication
+        aux_str = ''.join([char * int(min(5, scan_period_frames)) for char in '.'])
+        scanned_Images_fps_value.set(aux_str)
+    else:
+        FramesPerMinute = FPM_CalculatedValue
+        scanned_Images_fps_value.set(f"{FPM_CalculatedValue / 60:.2f}")
+    if session_frames % 50 == 0 and not disk_space_available():  # Only every 50 frames (500MB buffer exist)
+        logging.error("No disk space available, stopping scan process.")
+        if ScanOngoing:
+            with scan_state_lock:
+                ScanStopRequested = True  # Stop in next capture loop
+            scan_event.set()
+
+    # display rolling averages
+    if ExpertMode:
+        time_save_image_value.set(
+            int(time_save_image.get_average() * 1000) if time_save_image.get_average() is not None else 0)
+        time_preview_display_value.set(
+            int(time_preview_display.get_average() * 1000) if time_preview_display.get_average() is not None else 0)
+        time_awb_value.set(int(time_awb.get_average() * 1000) if time_awb.get_average() is not None else 0)
+        time_autoexp_value.set(
+            int(time_autoexp.get_average() * 1000) if time_autoexp.get_average() is not None else 0)
+
+
+def ui_call(function, *args):
+    # Tk is not thread safe: Calls from other threads (scan thread) are queued, to be done by Tk thread
+    if threading.current_thread() is threading.main_thread():
+        function(*args)
+    else:
+        ui_call_queue.put((function, args))
+
+
+def process_ui_calls():
+    global ui_calls_after
+
+    while True:
+        try:
+            function, args = ui_call_queue.get_nowait()
+        except queue.Empty:
+            break
+        function(*args)
+    if not ExitingApp:
+        ui_calls_after = win.after(20, process_ui_calls)
+
+
+def start_scan_sequencer():
+    global scan_thread
+
+    # Scan thread requires save/display threads (preview is drawn directly by the capture code otherwise)
+    if ScanEventDriven and not DisableThreads:
+        scan_event.clear()
+        scan_thread = threading.Thread(target=scan_thread_loop, daemon=True)
+        scan_thread.start()
+    else:
+        scan_thread = None
+        # Invoke capture_loop a first time when scan starts
+        win.after(5, capture_loop)
+
+
+def scan_thread_loop():
+    logging.debug("Scan thread started")
+    while True:
+        # Event cleared before checking state, so that an event arriving during the step is not lost
+        scan_event.clear()
+        try:
+            delay = capture_loop_step()
+        except Exception as e:
+            logging.exception(f"Scan thread: Unexpected error, stopping scan: {e}")
+            ui_call(end_scan_session)
+            break
+        if delay is False:
+            break
+        # Wait for next event. Timeout is only a safety net, for state changes not signaled (e.g. from UI)
+        scan_event.wait(0.1 if delay is None else delay)
+    logging.debug("Scan thread exiting")
+
+
 def capture_loop():
+    delay = capture_loop_step()
+    if delay is not False:
+        # Invoke capture_loop one more time, as long as scan is ongoing
+        win.after(int(delay * 1000) if delay else 5, capture_loop)
+
+
+def capture_loop_step():
+    """
+    One step of the scan sequence: Stop request, VFD positioning, capture of new frame, recovery from errors.
+    Invoked by capture_loop (Tk timers) or scan_thread_loop (event driven). Returns delay (seconds) before next step
+    if something is pending, None to wait for next event, or False once scan has ended
+    """
     global win
     global CurrentFrame
-    global FramesPerMinute, FramesToGo
     global NewFrameAvailable
     global ScanProcessError, ScanProcessError_LastTime
     global ScanStopRequested
     global session_frames, CurrentStill
-    global disk_space_error_to_notify
-    global AutoStopEnabled
     global CapstanDiameter  # Temporary, check if it is a good idea to dynamically modify capstan diameter according to results
     global vfd_attempts_on_same_frame, vfd_CurrentFrame_previous
     global scan_error_counter, scan_error_total_frames_counter
     global steps_submitted, steps_completed, last_steps_time
-
-    if ScanStopRequested:
-        stop_scan()
-        ScanStopRequested = False
-        curtime = time.time()
-        if session_frames > 0:
-            logging.debug("Total session time: %s seg for %i frames (%i ms per frame)",
-                          str(round((curtime - session_start_time), 1)),
-                          session_frames,
-                          round(((curtime - session_start_time) * 1000 / session_frames), 1))
-            logging.debug("Total time to save images: %s seg, (%i ms per frame)",
-                          str(round((total_wait_time_save_image), 1)),
-                          round((total_wait_time_save_image * 1000 / session_frames), 1))
-            logging.debug("Total time to display preview image: %s seg, (%i ms per frame)",
-                          str(round((total_wait_time_preview_display), 1)),
-                          round((total_wait_time_preview_display * 1000 / session_frames), 1))
-            logging.debug("Total time waiting for AWB adjustment: %s seg, (%i ms per frame)",
-                          str(round((total_wait_time_awb), 1)),
-                          round((total_wait_time_awb * 1000 / session_frames), 1))
-            logging.debug("Total time waiting for AE adjustment: %s seg, (%i ms per frame)",
-                          str(round((total_wait_time_autoexp), 1)),
-                          round((total_wait_time_autoexp * 1000 / session_frames), 1))
-        if disk_space_error_to_notify:
-            tk.messagebox.showwarning("Disk space low",
-                                      f"Running out of disk space, only {int(available_space_mb)} MB remain. "
-                                      "Please delete some files before continuing current scan.")
-            disk_space_error_to_notify = False
+    global total_wait_time_frame_event, frame_event_time
+    global frame_wait_start
+
+    # Stop request consumed here, so that it does not remain set until end_scan_session is done by Tk thread
+    with scan_state_lock:
+        stop_requested, ScanStopRequested = ScanStopRequested, False
+    if stop_requested:
+        ui_call(end_scan_session)
+        return False
     elif ScanOngoing:
+        new_frame = False  # Set by VFD positioning when frame is in place
         if FrameDetectMode == 'VFD':
             # If we are in Visual Frame Detection mode, we need to:
             #   - Capture a snap
@@ -3082,8 +3455,7 @@ def capture_loop():
             if steps_submitted:
                 if not steps_completed and last_steps_time > time.time():
                     logging.debug(f"VFD: Frame {CurrentFrame}, waiting for response from Arduino to complete required steps")
-                    win.after(10, capture_loop)
-                    return # loop again to see if next attempt is OK
+                    return 0.01 # loop again to see if next attempt is OK
                 else:
                     if not steps_completed: # Timeout waiting for steps completion confirmation from Arduino: Continue
                         logging.warning(f"VFD: Frame {CurrentFrame}, timeout waiting for response comfirming required steps done")
@@ -3091,12 +3463,14 @@ def capture_loop():
                         logging.debug(f"VFD: Frame {CurrentFrame}, response received comfirming required steps done")
                     steps_submitted = False
                     steps_completed = False
+            vfd_start = time.perf_counter()
             time.sleep(0.05) # wait for film to settle (50 ms is enough, this is not the captured imnage, just to determine position)
             sample_image = camera.capture_image("main")
             # Convert PIL Image to NumPy array (RGB -> BGR for cv2)
             image_np = np.array(sample_image)  # PIL gives RGB by default
             image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)  # Convert RGB to BGR
             centered, offset = is_frame_centered(image_bgr, FilmType, threshold=MisalignedFrameTolerance)
+            frame_tracer.add('VFD positioning', CurrentFrame + 1, vfd_start)
             img_height = sample_image.size[1]
             pixels_per_step = img_height // (FrameStepsS8 if FilmType == 'S8' else FrameStepsR8)   # Height divided by number of steps = pixels per step
             vfd_CurrentFrame_previous = CurrentFrame
@@ -3115,15 +3489,15 @@ def capture_loop():
                 if steps_to_advance > 0:
                     scan_advance_steps(steps_to_advance)
                     logging.debug(f"VFD: Advancing frame {CurrentFrame} by {steps_to_advance} steps, @{pixels_per_step} pixels per step = ({pixels_per_step*steps_to_advance} pixels)")
-                    win.after(10, capture_loop)
-                    return # loog again to see if next attempt is OK
+                    return 0.01 # loog again to see if next attempt is OK
                 else:
                     logging.error(f"VFD: {CurrentFrame} produced no steps to advance ({steps_to_advance}), to be captured as-is.")
             else:
-                NewFrameAvailable = True
+                new_frame = True
                 steps_to_next = (FrameStepsS8 if FilmType == 'S8' else FrameStepsR8) - (offset//pixels_per_step) - 20 # Add (or remove) the small ofset allowed by margin when centered, or excess offfset if too far
-                scan_error_total_frames_counter += 1
-                scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
+                with scan_state_lock:
+                    scan_error_total_frames_counter += 1
+                ui_call(scan_error_counter_value.set, f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
                 if centered:
                     logging.info(f"VFD: {CurrentFrame} was captured within {offset} pixels of the right position.")
                     if vfd_attempts_on_same_frame > 10:
@@ -3133,106 +3507,77 @@ def capture_loop():
                         logging.debug(f"VFD frame {CurrentFrame} capture OK !!! (with small shift of {offset} pixels)")
                 else:
                     if abs(offset) > int(img_height*0.05):    # We consider frame in error if final offset > 5% of frame height (76 pixels for a 1520 pixel tall image)
-                        scan_error_counter += 1
-                    scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
+                        with scan_state_lock:
+                            scan_error_counter += 1
+                    ui_call(scan_error_counter_value.set, f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
                     logging.warning(f"VFD: Frame {CurrentFrame} was captured past the correct position (by {abs(offset)} pixels), it might not be correct.")
                     if abs(offset) > 20:
                         CapstanDiameter -=0.1
                         logging.debug(f"VFD frame {CurrentFrame} captured past position, reducing capstan diameter to  {CapstanDiameter:.1f}")
                 vfd_attempts_on_same_frame = 0
             # If centered, or gone too far, or offset too small to handle, let the code flow in the standard flow to do the normal capture
-        if NewFrameAvailable:
-            # Update remaining time
-            aux = frames_to_go_str.get()
-            if aux.isdigit() and time.time() > frames_to_go_key_press_time:
-                FramesToGo = int(aux)
-                if FramesToGo > 0:
-                    FramesToGo -= 1
-                    frames_to_go_str.set(str(FramesToGo))
-                    ConfigData["FramesToGo"] = FramesToGo
-                    if FramesPerMinute != 0:
-                        minutes_pending = FramesToGo // FramesPerMinute
-                        frames_to_go_time_str.set(f"{(minutes_pending // 60):02}h {(minutes_pending % 60):02}m")
-                else:
-                    if AutoStopEnabled and autostop_type.get() == "counter_to_zero":
-                        ScanStopRequested = True  # Stop in next capture loop
-                    ConfigData["FramesToGo"] = -1
-                    frames_to_go_str.set('')  # clear frames to go box to prevent it stops again in next scan
+        # Frame event consumed before capture: An event arriving while capturing or advancing is kept for next step
+        with scan_state_lock:
+            new_frame, NewFrameAvailable = new_frame or NewFrameAvailable, False
+            event_time, frame_event_time = (frame_event_time, 0) if new_frame else (0, frame_event_time)
+            process_error = ScanProcessError and not new_frame  # Error handled in next step if frame available
+            if process_error:
+                ScanProcessError = False
+        if new_frame:
+            if event_time != 0:
+                total_wait_time_frame_event += time.time() - event_time
+            if frame_wait_start != 0:
+                frame_tracer.add('controller wait', CurrentFrame + 1, frame_wait_start)
             CurrentFrame += 1
             session_frames += 1
             register_frame()
             CurrentStill = 1
-            capture('normal')
+            with frame_tracer.span('frame', CurrentFrame):
+                capture('normal')
             if FrameDetectMode == 'PFD':
                 if not SimulatedRun:
                     try:
-                        # Set NewFrameAvailable to False here, to avoid overwriting new frame from arduino
-                        NewFrameAvailable = False
                         logging.debug("Frame %i captured.", CurrentFrame)
                         send_arduino_command(CMD_GET_NEXT_FRAME)  # Tell Arduino to move to next frame
                     except IOError:
                         CurrentFrame -= 1
-                        NewFrameAvailable = True  # Set NewFrameAvailable to True to repeat next time
+                        with scan_state_lock:
+                            NewFrameAvailable = True  # Set NewFrameAvailable to True to repeat next time
                         # Log error to console
                         logging.warning("Error while telling Arduino to move to next Frame.")
                         logging.warning("Frame %i capture to be tried again.", CurrentFrame)
-                        win.after(5, capture_loop)
-                        return
+                        return 0.005
             else:   # VFD
                 logging.debug(f"Frame {CurrentFrame}: Advancing to next frame using {steps_to_next} steps")
                 scan_advance_steps(steps_to_next)
-                NewFrameAvailable = False
+            frame_wait_start = time.perf_counter()
             ConfigData["CurrentDate"] = str(datetime.now())
             ConfigData["CurrentDir"] = CurrentDir
             ConfigData["CurrentFrame"] = str(CurrentFrame)
             # with open(ConfigurationDataFilename, 'w') as f:
             #     json.dump(ConfigData, f)
 
-            # Update number of captured frames
-            Scanned_Images_number.set(CurrentFrame)
-            # Update film time
-            fps = 18 if ConfigData["FilmType"] == "S8" else 16
-            film_time = f"{(CurrentFrame // fps) // 60:02}:{(CurrentFrame // fps) % 60:02}"
-            scanned_Images_time_value.set(film_time)
-            # Update Frames per Minute
-            scan_period_frames = CurrentFrame - CurrentScanStartFrame
-            if FPM_CalculatedValue == -1:  # FPM not calculated yet, display some indication
-                aux_str = ''.join([char * int(min(5, scan_period_frames)) for char in '.'])
-                scanned_Images_fps_value.set(aux_str)
-            else:
-                FramesPerMinute = FPM_CalculatedValue
-                scanned_Images_fps_value.set(f"{FPM_CalculatedValue / 60:.2f}")
-            if session_frames % 50 == 0 and not disk_space_available():  # Only every 50 frames (500MB buffer exist)
-                logging.error("No disk space available, stopping scan process.")
-                if ScanOngoing:
-                    ScanStopRequested = True  # Stop in next capture loop
-        elif ScanProcessError:
+            # Frame counters, remaining frames and time, frames per minute, disk space
+            ui_call(update_scan_frame_status)
+            if NewFrameAvailable:
+                return 0.005    # Next frame already available, no event to wait for
+        elif process_error:
+            stopping = False
             if ScanProcessError_LastTime != 0:
                 if time.time() - ScanProcessError_LastTime <= 5:  # Second error in less than 5 seconds: Stop
-                    curtime = time.ctime()
                     logging.error("Too many errors during scan process, stopping.")
-                    ScanProcessError = False
-                    if ScanOngoing:
-                        ScanStopRequested = True  # Stop in next capture loop
+                    stopping = ScanOngoing
             ScanProcessError_LastTime = time.time()
-            ScanProcessError = False
-            if not ScanStopRequested:
-                NewFrameAvailable = True  # Simulate new frame to continue scan
-                logging.warning(
-                    f"Error during scan process, frame {CurrentFrame}, simulating new frame. Maybe misaligned.")
-
-        # display rolling averages
-        if ExpertMode:
-            time_save_image_value.set(
-                int(time_save_image.get_average() * 1000) if time_save_image.get_average() is not None else 0)
-            time_preview_display_value.set(
-                int(time_preview_display.get_average() * 1000) if time_preview_display.get_average() is not None else 0)
-            time_awb_value.set(int(time_awb.get_average() * 1000) if time_awb.get_average() is not None else 0)
-            time_autoexp_value.set(
-                int(time_autoexp.get_average() * 1000) if time_autoexp.get_average() is not None else 0)
-
-        # Invoke capture_loop one more time, as long as scan is ongoing
-        win.after(5, capture_loop)
+            with scan_state_lock:
+                if stopping:
+                    ScanStopRequested = True  # Stop in next capture loop
+                elif not ScanStopRequested:
+                    NewFrameAvailable = True  # Simulate new frame to continue scan
+                    logging.warning(
+                        f"Error during scan process, frame {CurrentFrame}, simulating new frame. Maybe misaligned.")
+            return 0.005
+        return None
+    return False
 
 
 def temperature_check():
@@ -3273,12 +3618,44 @@ def preview_check():
         cmd_set_focus_zoom()
 
 
+def save_worker_pool_check():
+    if save_worker_pool is None:
+        return
+    # Time between items queued for saving, based on current frames per minute (HDR queues several items per frame)
+    item_interval = None
+    if ScanOngoing and FPM_CalculatedValue > 0:
+        item_interval = 60 / FPM_CalculatedValue
+        if HdrCaptureActive and not HdrMergeInPlace:
+            item_interval /= hdr_num_exposures
+    pool_size = save_worker_pool.adjust(time_save_image.get_average(), item_interval)
+    if ExpertMode:
+        save_workers_value.set(pool_size)
+
+
+def queue_memory_check():
+    if capture_save_queue is None:
+        return
+    # Memory currently used by queued frames, and high-water mark since program start
+    used = (capture_save_queue.bytes_used() + capture_display_queue.bytes_used()) // 2**20
+    high_water = (capture_save_queue.high_water_bytes + capture_display_queue.high_water_bytes) // 2**20
+    if ExpertMode:
+        queue_memory_value.set(f"{used}/{high_water}")
+    if capture_save_queue.waited_puts > 0 or capture_display_queue.rejected_puts > 0:
+        logging.debug(f"Queue memory {used} MB (max {high_water} MB), capture waited {capture_save_queue.waited_puts} "
+                      f"times ({round(capture_save_queue.waited_time, 1)} s), "
+                      f"{capture_display_queue.rejected_puts} frames not displayed")
+    if spill_buffer is not None and len(spill_buffer) > 0:
+        logging.debug(f"Spill buffer: {len(spill_buffer)} frames pending ({spill_buffer.total_spilled} spilled so far)")
+
+
 def onesec_periodic_checks():  # Update RPi temperature every 10 seconds
     global win
     global onesec_after
 
     temperature_check()
     preview_check()
+    save_worker_pool_check()
+    queue_memory_check()
 
     if not ExitingApp:
         onesec_after = win.after(1000, onesec_periodic_checks)
@@ -3374,62 +3751,31 @@ def check_version(current_version, required_version):
 # send_arduino_command: No response expected
 def send_arduino_command(cmd, param=0):
     if not SimulatedRun:
-        time.sleep(0.0001)  # wait 100 µs, to avoid I/O errors
-        try:
-            i2c.write_i2c_block_data(16, cmd, [int(param % 256), int(param >> 8)])  # Send command to Arduino
-        except IOError:
-            logging.warning(
-                f"Error while sending command {cmd} (param {param}) to Arduino while handling frame {CurrentFrame}. "
-                f"Retrying...")
-            time.sleep(0.2)  # wait 100 µs, to avoid I/O errors
-
-        time.sleep(0.0001)  # wait 100 µs, same
+        # Queued, written by controller_link thread (errors logged there)
+        controller_link.send_command(cmd, param)
 
 
-def arduino_listen_loop():  # Waits for Arduino communicated events and dispatches accordingly
+def arduino_event(ArduinoTrigger, ArduinoParam1, ArduinoParam2, event_time):  # Dispatches one controller event
     global win
     global NewFrameAvailable
     global RewindErrorOutstanding, RewindEndOutstanding
     global FastForwardErrorOutstanding, FastForwardEndOutstanding
-    global ArduinoTrigger
     global ScanProcessError
     global last_frame_time
     global Controller_Id, Controller_full_version
     global ScanStopRequested
-    global arduino_after
     global PtLevelValue, StepsPerFrame
     global scan_error_counter, scan_error_total_frames_counter, scan_error_counter_value
     global steps_completed, steps_submitted
-
-    if not SimulatedRun:
-        try:
-            ArduinoData = i2c.read_i2c_block_data(16, CMD_GET_CNT_STATUS, 5)
-            ArduinoTrigger = ArduinoData[0]
-            ArduinoParam1 = ArduinoData[1] * 256 + ArduinoData[2]
-            ArduinoParam2 = ArduinoData[3] * 256 + ArduinoData[4]  # Sometimes this part arrives as 255, 255, no idea why
-        except IOError as e:
-            ArduinoTrigger = 0
-            # Log error to console
-            # When error is 121, not really an error, means Arduino has nothing to data available for us
-            if e.errno != 121:
-                logging.warning(
-                    f"Non-critical IOError ({e}) while checking incoming event from Arduino. Will check again.")
-
-    if ScanOngoing and FrameDetectMode == 'PFD' and time.time() > last_frame_time:  # Do not force new event in case of VFD - Arduino only asked to move the C motor
-        # If scan is ongoing, and more than 3 seconds have passed since last command, maybe one
-        # command from/to Arduino (frame received/go to next frame) has been lost.
-        # In such case, we force a 'fake' new frame command to allow process to continue
-        # This means a duplicate frame might be generated.
-        last_frame_time = time.time() + int(
-            max_inactivity_delay * 0.34)  # Delay shared with arduino, 1/3rd less to avoid conflict with end reel
-        NewFrameAvailable = True
-        logging.warning("More than %i sec. since last command: Forcing new "
-                        "frame event (frame %i).", int(max_inactivity_delay * 0.34), CurrentFrame)
-
-    if ArduinoTrigger == 0:  # Do nothing
-        pass
-    elif ArduinoTrigger == RSP_VERSION_ID:  # Version Id response
-        Controller_Id = ArduinoParam1%256
+    global frame_event_time
+
+    if ArduinoTrigger == RSP_VERSION_ID:  # Version Id response
+        # Controller Id shares byte with capabilities supported by both controller and UI (older controllers: None)
+        Controller_Id = ArduinoParam1 % 256 & ~(CAP_MULTI_RESPONSE | CAP_CHECKED_PROTOCOL)
+        controller_link.multi_response = (ArduinoParam1 & CAP_MULTI_RESPONSE) != 0
+        controller_link.checked_protocol = (ArduinoParam1 & CAP_CHECKED_PROTOCOL) != 0
+        logging.info(f"Multi-response reads {'enabled' if controller_link.multi_response else 'not supported'}, "
+                     f"checked protocol {'enabled' if controller_link.checked_protocol else 'not used'}")
         if Controller_Id == 1:
             logging.info("Arduino controller detected")
             Controller_type = "Nano"
@@ -3452,21 +3798,25 @@ def arduino_listen_loop():  # Waits for Arduino communicated events and dispatch
     elif ArduinoTrigger == RSP_FRAME_AVAILABLE:  # New Frame available
         # Delay shared with arduino, 2 seconds less to avoid conflict with end reel
         last_frame_time = time.time() + max_inactivity_delay - 2
-        NewFrameAvailable = True
-        scan_error_total_frames_counter += 1
+        with scan_state_lock:
+            NewFrameAvailable = True
+            frame_event_time = event_time
+            scan_error_total_frames_counter += 1
         scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
 
     elif ArduinoTrigger == RSP_SCAN_ERROR:  # Error during scan
         logging.warning("Received scan error from Arduino (%i, %i)", ArduinoParam1, ArduinoParam2)
-        ScanProcessError = True
-        scan_error_counter += 1
+        with scan_state_lock:
+            ScanProcessError = True
+            scan_error_counter += 1
         if scan_error_total_frames_counter > 0:
             scan_error_counter_value.set(f"{scan_error_counter} ({scan_error_counter*100/scan_error_total_frames_counter:.1f}%)")
         with open(scan_error_log_fullpath, 'a') as f:
             f.write(f"No Frame detected, {CurrentFrame}, {ArduinoParam1}, {ArduinoParam2}\n")
     elif ArduinoTrigger == RSP_SCAN_ENDED:  # Scan arrived at the end of the reel
         logging.warning("End of reel reached: Scan terminated")
-        ScanStopRequested = True
+        with scan_state_lock:
+            ScanStopRequested = True
     elif ArduinoTrigger == RSP_REPORT_AUTO_LEVELS:  # Get auto levels from Arduino, to be displayed in UI, if auto on
         if ExpertMode:
             if (AutoPtLevelEnabled):
@@ -3499,11 +3849,36 @@ def arduino_listen_loop():  # Waits for Arduino communicated events and dispatch
     else:
         logging.warning("Unrecognized incoming event (%i) from Arduino.", ArduinoTrigger)
 
-    if ArduinoTrigger != 0:
-        ArduinoTrigger = 0
+    scan_event.set()    # Wake up scan thread, event might be relevant for it
+
+
+def arduino_listen_loop():  # Dispatches events received from Arduino by controller_link thread
+    global NewFrameAvailable
+    global last_frame_time
+    global arduino_after
+
+    # Not needed with checked protocol, lost messages are sent again
+    if ScanOngoing and FrameDetectMode == 'PFD' and time.time() > last_frame_time and not controller_link.checked_protocol:  # Do not force new event in case of VFD - Arduino only asked to move the C motor
+        # If scan is ongoing, and more than 3 seconds have passed since last command, maybe one
+        # command from/to Arduino (frame received/go to next frame) has been lost.
+        # In such case, we force a 'fake' new frame command to allow process to continue
+        # This means a duplicate frame might be generated.
+        last_frame_time = time.time() + int(
+            max_inactivity_delay * 0.34)  # Delay shared with arduino, 1/3rd less to avoid conflict with end reel
+        with scan_state_lock:
+            NewFrameAvailable = True
+        scan_event.set()
+        logging.warning("More than %i sec. since last command: Forcing new "
+                        "frame event (frame %i).", int(max_inactivity_delay * 0.34), CurrentFrame)
+
+    while True:
+        event = controller_link.get_event()
+        if event is None:
+            break
+        arduino_event(*event)
 
     if not ExitingApp:
-        arduino_after = win.after(10, arduino_listen_loop)
+        arduino_after = win.after(5, arduino_listen_loop)
 
 
 # Base function for widget enable/disable/refresh
@@ -3739,6 +4114,10 @@ def load_config_data_pre_init():
     global ExpertMode, ExperimentalMode, PlotterEnabled, SimplifiedMode, UIScrollbars, DetectMisalignedFrames, MisalignedFrameTolerance, FontSize, DisableToolTips, BaseFolder
     global WidgetsEnabledWhileScanning, LogLevel, LoggingMode, ColorCodedButtons, TempInFahrenheit, LogLevel
     global UserConsent, AnonymousUuid, LastConsentDate
+    global ProcessPoolEncoder, SaveWorkersMin, SaveWorkersMax, SaveQueueBudgetMB, DisplayQueueBudgetMB
+    global SpillEnabled, SpillFolder, SpillMaxMB, LoresPreview, ControllerPollInterval, CheckedProtocol
+    global AttentionGpio, AttentionActiveLow, AttentionPollInterval, ControllerSimulatorSettings, ReplayCameraSettings
+    global TraceEnabled, TraceBufferSize
 
     for item in ConfigData:
         logging.debug("%s=%s", item, str(ConfigData[item]))
@@ -3791,6 +4170,42 @@ def load_config_data_pre_init():
             AnonymousUuid = ConfigData["AnonymousUuid"]
         if 'LastConsentDate' in ConfigData:
             LastConsentDate = datetime.fromisoformat(ConfigData["LastConsentDate"])
+        if 'ProcessPoolEncoder' in ConfigData:
+            ProcessPoolEncoder = ProcessPoolEncoder or ConfigData["ProcessPoolEncoder"]   # Command line has priority
+        if 'SaveWorkersMin' in ConfigData:
+            SaveWorkersMin = ConfigData["SaveWorkersMin"]
+        if 'SaveWorkersMax' in ConfigData:
+            SaveWorkersMax = ConfigData["SaveWorkersMax"]
+        if 'SaveQueueBudgetMB' in ConfigData:
+            SaveQueueBudgetMB = ConfigData["SaveQueueBudgetMB"]
+        if 'DisplayQueueBudgetMB' in ConfigData:
+            DisplayQueueBudgetMB = ConfigData["DisplayQueueBudgetMB"]
+        if 'SpillEnabled' in ConfigData:
+            SpillEnabled = ConfigData["SpillEnabled"]
+        if 'SpillFolder' in ConfigData:
+            SpillFolder = ConfigData["SpillFolder"]
+        if 'SpillMaxMB' in ConfigData:
+            SpillMaxMB = ConfigData["SpillMaxMB"]
+        if 'LoresPreview' in ConfigData:
+            LoresPreview = ConfigData["LoresPreview"]
+        if 'ControllerPollInterval' in ConfigData:
+            ControllerPollInterval = ConfigData["ControllerPollInterval"]
+        if 'CheckedProtocol' in ConfigData:
+            CheckedProtocol = ConfigData["CheckedProtocol"]
+        if 'AttentionGpio' in ConfigData:
+            AttentionGpio = ConfigData["AttentionGpio"]
+        if 'AttentionActiveLow' in ConfigData:
+            AttentionActiveLow = ConfigData["AttentionActiveLow"]
+        if 'AttentionPollInterval' in ConfigData:
+            AttentionPollInterval = ConfigData["AttentionPollInterval"]
+        if 'ControllerSimulatorSettings' in ConfigData:
+            ControllerSimulatorSettings = ConfigData["ControllerSimulatorSettings"]
+        if 'ReplayCameraSettings' in ConfigData:
+            ReplayCameraSettings = ConfigData["ReplayCameraSettings"]
+        if 'TraceEnabled' in ConfigData:
+            TraceEnabled = TraceEnabled or ConfigData["TraceEnabled"]
+        if 'TraceBufferSize' in ConfigData:
+            TraceBufferSize = ConfigData["TraceBufferSize"]
 
 
 def init_user_count_data():
@@ -4221,6 +4636,8 @@ def PiCam2_change_resolution():
     # capture_config["main"]["format"] = camera_resolutions.get_format()
     capture_config["raw"]["size"] = camera_resolutions.get_sensor_resolution()
     capture_config["raw"]["format"] = camera_resolutions.get_format()
+    if lores_preview_size is not None:
+        PiCam2_configure_lores()    # Lores stream cannot be larger than main stream
     camera.stop()
     camera.configure(capture_config)
     camera.start()
@@ -4229,14 +4646,70 @@ def PiCam2_change_resolution():
 
 
 
+def PiCam2_configure_lores():
+    global lores_preview_size
+
+    # Lores stream (YUV420, the only format available on all models), with the aspect ratio of the main stream and
+    # just large enough to cover the preview canvas: Preview is then only cropped, not resized (see
+    # request_preview_image). Width aligned to 64 pixels so that there is no padding at the end of each line, height
+    # aligned to 2 (chroma subsampling). Never larger than main stream (display thread resizes preview in that case)
+    main_width, main_height = capture_config["main"]["size"]
+    width = -(-PreviewWidth // 64) * 64
+    while width * main_height < PreviewHeight * main_width:    # Not high enough to cover canvas
+        width += 64
+    width = min(width, main_width // 64 * 64)
+    height = min(-(-(width * main_height // main_width) // 2) * 2, main_height // 2 * 2)
+    capture_config["lores"] = {"size": (width, height), "format": "YUV420"}
+    lores_preview_size = (width, height)
+
+
+def PiCam2_enable_lores_preview():
+    global lores_preview_size
+
+    # Invoked once preview canvas size is known
+    if PreviewWidth < 64 or PreviewHeight < 2:
+        return
+    PiCam2_configure_lores()
+    try:
+        camera.stop()
+        camera.configure(capture_config)
+        camera.start()
+        logging.debug(f"Lores preview stream configured: {lores_preview_size}")
+    except Exception as e:
+        logging.warning(f"Cannot configure lores preview stream, using main stream for preview: {e}")
+        capture_config["lores"] = None
+        lores_preview_size = None
+        camera.stop()
+        camera.configure(capture_config)
+        camera.start()
+
+
+def request_preview_image(request):
+    # Preview image from a request: Taken from lores stream if available (cropped to canvas size, centered),
+    # otherwise from main stream, to be resized by display thread
+    if lores_preview_size is not None:
+        preview = cv2.cvtColor(request.make_array('lores'), cv2.COLOR_YUV2RGB_I420)
+        height, width = preview.shape[:2]
+        x = max(0, (width - PreviewWidth) // 2)
+        y = max(0, (height - PreviewHeight) // 2)
+        image = Image.fromarray(preview[y:y + PreviewHeight, x:x + PreviewWidth])
+    else:
+        image = request.make_image('main')
+    if NegativeImage:
+        image = reverse_image(image)
+    return image
+
+
 def PiCam2_configure():
     global capture_config, preview_config, vfd_config
 
     camera.stop()
+    # Two buffers: Requests are now handed to the save threads for all file types, a single buffer would block
+    # capture_request until the save thread releases the previous one
     capture_config = camera.create_still_configuration(main={"size": camera_resolutions.get_sensor_resolution()},
                                                        raw={"size": camera_resolutions.get_sensor_resolution(),
                                                             "format": camera_resolutions.get_format()},
-                                                       transform=Transform(hflip=True))
+                                                       transform=Transform(hflip=True), buffer_count=2)
 
     preview_config = camera.create_preview_configuration({"size": (2028, 1520)}, transform=Transform(hflip=True))
     vfd_config = camera.create_preview_configuration({"size": (1332, 990)}, transform=Transform(hflip=True))
@@ -4463,37 +4936,94 @@ def hw_panel_callback(command):
     elif command == ALT_SCAN_8_RW:
         pass
 
+
+def init_capture_threads():
+    # Display thread, save worker pool and optional spill buffer/process pool encoder, used by the capture path
+    global capture_display_queue, capture_display_event
+    global capture_save_queue
+    global active_threads
+    global image_encoder, save_worker_pool, spill_buffer
+
+    # JRE 20/09/2022: Attempt to speed up overall process in PiCamera2 by having captured images
+    # displayed in the preview area by a dedicated thread, so that time consumed in this task
+    # does not impact the scan process speed
+    capture_display_queue = ByteBudgetQueue(DisplayQueueBudgetMB * 2**20, queue_item_size, maxsize=MaxQueueSize)
+    capture_display_event = threading.Event()
+    capture_save_queue = ByteBudgetQueue(SaveQueueBudgetMB * 2**20, queue_item_size, maxsize=MaxQueueSize)
+    display_thread = threading.Thread(target=capture_display_thread, args=(capture_display_queue,
+                                                                           capture_display_event, 0))
+    # Number of save threads adapts to load (file type, resolution...), see onesec_periodic_checks
+    save_worker_pool = SaveWorkerPool(capture_save_queue, capture_save_item, SaveWorkersMin, SaveWorkersMax,
+                                      END_TOKEN)
+    active_threads += 1
+    display_thread.start()
+    save_worker_pool.start()
+    logging.debug("Threads initialized")
+    if SpillEnabled:
+        # Spilled frames are drained only when there is nothing pending in save queue
+        spill_buffer = SpillBuffer(SpillFolder, save_spilled_frame, SpillMaxMB * 2**20,
+                                   lambda: capture_save_queue.empty())
+        logging.debug(f"Spill buffer initialized in {SpillFolder}")
+    if ProcessPoolEncoder:
+        # JPG/PNG encoding moved to worker processes, save threads just feed them via shared memory
+        image_encoder = SharedMemoryEncoder()
+        logging.debug(f"Process pool encoder initialized ({image_encoder.processes} processes)")
+
+
 def tscann8_init():
     global win
     global camera
     global i2c
     global CurrentDir
     global ZoomSize
-    global capture_display_queue, capture_display_event
-    global capture_save_queue, capture_save_event
     global MergeMertens, camera_resolutions
-    global active_threads
     global time_save_image, time_preview_display, time_awb, time_autoexp, offset_image
     global hw_panel, hw_panel_installed
+    global controller_link, controller_simulator
+    global frame_tracer
 
     if SimulatedRun:
         logging.info("Not running on Raspberry Pi, simulated run for UI debugging purposes only")
     else:
         logging.info("Running on Raspberry Pi")
 
-    if not can_check_dng_frames_for_misalignment:
-        logging.warning("Frame alignment for DNG files is disabled. To enable it please install rawpy library")
+    if TraceEnabled:
+        frame_tracer = FrameTracer(TraceBufferSize, enabled=True)
+        logging.info(f"Frame trace enabled ({TraceBufferSize} spans)")
 
     logging.debug("BaseFolder=%s", BaseFolder)
 
     if not SimulatedRun:
-        i2c = smbus.SMBus(1)
+        attention = None
+        if UseControllerSimulator:
+            settings = dict(ControllerSimulatorSettings)
+            if settings.pop('attention_line', False):
+                attention = SimulatedAttentionLine()
+            controller_simulator = ControllerSimulator(attention=attention, **settings)
+            i2c = controller_simulator
+            logging.info(f"Using controller simulator ({settings})")
+        else:
+            i2c = smbus.SMBus(1)
         # Set the I2C clock frequency to 400 kHz
         i2c.write_byte_data(16, 0x0F, 0x46)  # I2C_SCLL register
         i2c.write_byte_data(16, 0x10, 0x47)  # I2C_SCLH register
+        if AttentionGpio is not None and not UseControllerSimulator:
+            try:
+                attention = GpioAttentionLine(AttentionGpio, AttentionActiveLow)
+                logging.info(f"Attention line from controller on GPIO {AttentionGpio} "
+                             f"(active {'low' if AttentionActiveLow else 'high'})")
+            except OSError as e:
+                logging.warning(f"Attention line not available ({e}), polling controller instead")
+        # From now on, I2C bus only accessed through controller_link thread
+        controller_link = ControllerLink(i2c, ControllerPollInterval / 1000, attention=attention,
+                                         attention_poll_interval=AttentionPollInterval / 1000)
 
     if not SimulatedRun and not CameraDisabled:  # Init PiCamera2 here, need resolution list for drop down
-        camera = Picamera2()
+        if UseReplayCamera:
+            camera = replay_camera.ReplayCamera(**ReplayCameraSettings)
+            logging.info(f"Using replay camera ({ReplayCameraSettings})")
+        else:
+            camera = Picamera2()
         camera_resolutions = CameraResolutions(camera.sensor_modes)
         logging.info(f"Camera Sensor modes: {camera.sensor_modes}")
         PiCam2_configure()
@@ -4512,12 +5042,15 @@ def tscann8_init():
 
     create_main_window()
 
+    if not SimulatedRun and not CameraDisabled and LoresPreview:
+        PiCam2_enable_lores_preview()
+
     # Check if hw panel module available
     if SimulatedRun:
         hw_panel_installed = False
 
     if hw_panel_installed:
-        hw_panel = HwPanel(win, i2c, hw_panel_callback)
+        hw_panel = HwPanel(win, controller_link.bus, hw_panel_callback)
     else:
         hw_panel = None
 
@@ -4538,24 +5071,7 @@ def tscann8_init():
     win.update_idletasks()
 
     if not SimulatedRun and not CameraDisabled:
-        # JRE 20/09/2022: Attempt to speed up overall process in PiCamera2 by having captured images
-        # displayed in the preview area by a dedicated thread, so that time consumed in this task
-        # does not impact the scan process speed
-        capture_display_queue = queue.Queue(maxsize=MaxQueueSize)
-        capture_display_event = threading.Event()
-        capture_save_queue = queue.Queue(maxsize=MaxQueueSize)
-        capture_save_event = threading.Event()
-        display_thread = threading.Thread(target=capture_display_thread, args=(capture_display_queue,
-                                                                               capture_display_event, 0))
-        save_thread_1 = threading.Thread(target=capture_save_thread, args=(capture_save_queue, capture_save_event, 1))
-        save_thread_2 = threading.Thread(target=capture_save_thread, args=(capture_save_queue, capture_save_event, 2))
-        save_thread_3 = threading.Thread(target=capture_save_thread, args=(capture_save_queue, capture_save_event, 3))
-        active_threads += 4
-        display_thread.start()
-        save_thread_1.start()
-        save_thread_2.start()
-        save_thread_3.start()
-        logging.debug("Threads initialized")
+        init_capture_threads()
 
     logging.debug("ALT-Scann 8 initialized")
 
@@ -5239,6 +5755,7 @@ def create_widgets():
     global AE_enabled, AWB_enabled
     global extended_frame, expert_frame, experimental_frame
     global time_save_image_value, time_preview_display_value, time_awb_value, time_autoexp_value
+    global save_workers_value, queue_memory_value
     global AeConstraintMode_dropdown_selected, AeMeteringMode_dropdown_selected, AeExposureMode_dropdown_selected
     global AwbMode_dropdown_selected
     global AeConstraintMode_dropdown, AeMeteringMode_dropdown, AeExposureMode_dropdown, AwbMode_dropdown
@@ -5575,6 +6092,33 @@ def create_widgets():
         time_autoexp_label_ms = tk.Label(statistics_frame, text='ms', font=("Arial", FontSize - 1),
                                          name='time_autoexp_label_ms')
         time_autoexp_label_ms.grid(row=3, column=2, sticky=E)
+        # Current number of save threads
+        save_workers_label = tk.Label(statistics_frame, text='Save thr.:', font=("Arial", FontSize - 1),
+                                      name='save_workers_label')
+        save_workers_label.grid(row=4, column=0, sticky=E)
+        as_tooltips.add(save_workers_label, "Number of threads currently used to save frames (adjusted automatically "
+                                            "to the load)")
+        save_workers_value = tk.IntVar(value=save_worker_pool.size if save_worker_pool is not None else 0)
+        save_workers_value_label = tk.Label(statistics_frame, textvariable=save_workers_value,
+                                            font=("Arial", FontSize - 1), name='save_workers_value_label')
+        save_workers_value_label.grid(row=4, column=1, sticky=W)
+        as_tooltips.add(save_workers_value_label, "Number of threads currently used to save frames (adjusted "
+                                                  "automatically to the load)")
+        # Memory used by queued frames
+        queue_memory_label = tk.Label(statistics_frame, text='Queue:', font=("Arial", FontSize - 1),
+                                      name='queue_memory_label')
+        queue_memory_label.grid(row=5, column=0, sticky=E)
+        as_tooltips.add(queue_memory_label, "Memory used by frames waiting to be saved or displayed: Current/maximum "
+                                            "(in MB)")
+        queue_memory_value = tk.StringVar(value="0/0")
+        queue_memory_value_label = tk.Label(statistics_frame, textvariable=queue_memory_value,
+                                            font=("Arial", FontSize - 1), name='queue_memory_value_label')
+        queue_memory_value_label.grid(row=5, column=1, sticky=W)
+        as_tooltips.add(queue_memory_value_label, "Memory used by frames waiting to be saved or displayed: "
+                                                  "Current/maximum (in MB)")
+        queue_memory_label_mb = tk.Label(statistics_frame, text='MB', font=("Arial", FontSize - 1),
+                                         name='queue_memory_label_mb')
+        queue_memory_label_mb.grid(row=5, column=2, sticky=E)
         bottom_area_row += 1
 
     # Settings button, at the bottom of top left area
@@ -6620,7 +7164,8 @@ def create_widgets():
 def get_controller_version():
     if Controller_Id == 0:
         logging.debug("Requesting controller version")
-        send_arduino_command(CMD_VERSION_ID)
+        # Parameter: Capabilities supported by UI
+        send_arduino_command(CMD_VERSION_ID, CAP_MULTI_RESPONSE | (CAP_CHECKED_PROTOCOL if CheckedProtocol else 0))
 
 
 def reset_controller():
@@ -6700,12 +7245,14 @@ def main(argv):
     global DisableToolTips
     global win, hw_panel, hw_panel_installed
     global UserConsent, ConfigData, LastConsentDate
+    global ProcessPoolEncoder, UseControllerSimulator, UseReplayCamera, TraceEnabled
+    global controls, Transform, MappedArray
 
     DisableToolTips = False
     goanyway = False
 
     try:
-        opts, args = getopt.getopt(argv, "sexdl:phntwf:ba:", ["goanyway"])
+        opts, args = getopt.getopt(argv, "sexdl:phntmwf:ba:crg", ["goanyway"])
     except getopt.GetoptError as e:
         print(f"Invalid command line parameter: {e}")
         return
@@ -6719,6 +7266,12 @@ def main(argv):
             ExperimentalMode = not ExperimentalMode
         elif opt == '-d':
             CameraDisabled = True
+        elif opt == '-c':
+            UseControllerSimulator = True
+        elif opt == '-r':
+            UseReplayCamera = True
+        elif opt == '-g':
+            TraceEnabled = True
         elif opt == '-l':
             LoggingMode = arg
         elif  opt == '-a':
@@ -6733,6 +7286,8 @@ def main(argv):
             DisableToolTips = True
         elif opt == '-t':
             DisableThreads = True
+        elif opt == '-m':
+            ProcessPoolEncoder = True
         elif opt == '-w':
             WidgetsEnabledWhileScanning = not WidgetsEnabledWhileScanning
         elif opt == '-h':
@@ -6741,14 +7296,29 @@ def main(argv):
             print("  -e             Activate expert mode")
             print("  -x             Activate experimental mode")
             print("  -d             Disable camera (for development purposes)")
+            print("  -c             Use controller simulator instead of controller (no I2C hardware required)")
+            print("  -r             Use replay camera instead of camera (frames from a folder, no camera required)")
+            print("  -g             Record time taken by each stage of each frame, saved as a trace file in Logs folder")
             print("  -n             Disable Tooltips")
             print("  -t             Disable multi-threading")
+            print("  -m             Encode JPG/PNG frames using a pool of processes (multi-core)")
             print("  -f <size>      Set user interface font size (11 by default)")
             print("  -b             Add scrollbars to UI (in case it does not fit)")
             print("  -w             Keep control widgets enabled while scanning")
             print("  -l <log mode>  Set log level (standard Python values (DEBUG, INFO, WARNING, ERROR)")
             exit()
 
+    if UseControllerSimulator:    # Real scan path, even if not on a Raspberry Pi (simulated session not used)
+        SimulatedRun = False
+        if not hardware_libs_loaded and not UseReplayCamera:
+            CameraDisabled = True
+    if UseReplayCamera:
+        if SimulatedRun:
+            print("Replay camera requires the controller (or its simulator, -c), not used in simulated run")
+        else:
+            # Requests handled by replay camera, helpers must match (libcamera ones might not even be available)
+            controls, Transform, MappedArray = replay_camera.controls, replay_camera.Transform, replay_camera.MappedArray
+
     if goanyway:
         print("Work in progress, version not usable yet.")
         tk.messagebox.showerror("WIP", "Work in progress, version not usable yet.")
@@ -6825,6 +7395,7 @@ def main(argv):
         hw_panel.ALT_Scann8_init_completed()
 
     onesec_periodic_checks()
+    process_ui_calls()
 
     # Main Loop
     win.mainloop()  # running the loop that works as a trigger
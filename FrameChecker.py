@@ -31,7 +31,18 @@ import time
 import sys
 import random
 import re
+import functools
+import collections
+import io
+import multiprocessing
+import getopt
+import json
+import csv
 from PIL import ImageTk, Image
+from frame_alignment import frames_centered, sweep_profiles, evaluate_sweep, SWEEP_THRESHOLDS
+from frame_checker_cache import FrameCheckerCache
+from read_prefetcher import ReadPrefetcher
+from folder_watcher import FolderWatcher
 try:
     import rawpy
     check_dng_frames_for_misalignment = True
@@ -58,73 +69,60 @@ window_size = {'width': 640, 'height': 480}
 
 bad_frame_threshold = {}
 
-def is_frame_centered(idx, img, film_type='S8', threshold=10, slice_width=20):
-    global image_height, sprocket_hole_x
-    image_height = img.shape[0]
+# Number of processes used to analyze files in folder
+worker_processes = os.cpu_count()
+
+# Readahead of files in each worker process (see ReadPrefetcher): Number of files (0 to disable) and memory limit
+prefetch_depth = 4
+prefetch_max_mb = 256
+
+# Watch mode (follow folder of an ongoing scan): Worker processes run with lower priority, not to slow down the scan.
+# New files are analyzed once not modified for watch_settle_time seconds. An alert is raised if watch_alert_pct % of
+# the last watch_alert_window frames are misaligned or empty
+watch_workers = 1
+watch_nice = 10
+watch_settle_time = 1.0
+watch_alert_window = 100
+watch_alert_pct = 20
+
+def frame_stripe(img, slice_width=20, scale=1):
+    # scale > 1 if img was decoded at reduced resolution: Stripe position and width are scaled down
+    global sprocket_hole_x
     height, width = img.shape[:2]
+    hole_x = sprocket_hole_x // scale
+    slice_width = max(2, slice_width // scale)
     if slice_width > width:
         raise ValueError("Slice width exceeds image width")
-    stripe = img[:, sprocket_hole_x:sprocket_hole_x + slice_width]
-    gray = stripe
-    is_centered = False
-    off_center = -1
-    local_threshold = 174
-    best_match_found = False
-    candidate_found = False
-    save_gaps = 10  # arbitrary non-zero number to identify whe area with less gaps (ideally, zero)
-    while not is_centered and local_threshold < 255:
-        #_, binary_img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        _, binary_img = cv2.threshold(gray, local_threshold, 255, cv2.THRESH_BINARY)
-
-        middle = height // 2
-        margin = height * threshold // 100
-        height_profile = np.sum(binary_img, axis=1)
-        
-        # Dynamic thresholds
-        white_thresh = slice_width * 255 * 0.75
-        black_thresh = slice_width * 255 * 0.25
-        white_heights = np.where(height_profile > white_thresh)[0] if film_type == 'S8' else np.where(height_profile < black_thresh)[0]
-        
-        # Contiguous zones
-        min_area_size = int(height * 0.1 if film_type == 'S8' else height * 0.4)
-        # Searches for gaps in the target area. Used to be 1 pixel gap, which is too low, might be noise in the left stripe
-        min_gap_size = min_area_size // 2
-        if len(white_heights) > 0:
-            gaps = np.where(np.diff(white_heights) > min_gap_size)[0]  
-            areas = np.split(white_heights, gaps + 1) if len(gaps) > 0 else [white_heights]
-            areas = [a for a in areas if len(a) > min_area_size]
-            result = 0
-            bigger = 0
-            for area in areas:
-                if len(area) > bigger:
-                    bigger = len(area)
-                    result = (area[0] + area[-1]) // 2
-                    #break
-            
-            if result != 0:
-                if middle - margin <= result <= middle + margin:
-                    is_centered = True
-                    off_center = 0
-                    best_match_found = True
-                    break
-                elif len(gaps) <= save_gaps:
-                    save_is_centered = False
-                    save_off_center = result - middle if result > middle else -(middle - result)
-                    save__threshold = local_threshold
-                    save_gaps = len(gaps)
-                    candidate_found = True
-        local_threshold += 5 if local_threshold < 245 else 1
-
-    if not best_match_found and candidate_found:
-        is_centered = save_is_centered
-        off_center = save_off_center
-        local_threshold = save__threshold
+    return img[:, hole_x:hole_x + slice_width], slice_width
+
+
+def is_frame_centered(idx, img, film_type='S8', threshold=10, slice_width=20, scale=1):
+    # scale > 1 if img was decoded at reduced resolution: Offset is scaled up to full resolution
+    global image_height
+    image_height = img.shape[0] * scale
+    stripe, slice_width = frame_stripe(img, slice_width, scale)
+    # Threshold sweep done by batch function, as a stack of one stripe
+    centered, offsets, thresholds = frames_centered(stripe[np.newaxis], film_type, threshold, slice_width)
+    is_centered, off_center, local_threshold = bool(centered[0]), int(offsets[0]), int(thresholds[0])
+    if off_center != -1:
+        off_center *= scale
 
     bad_frame_threshold[idx] = min (local_threshold, 254)
         
     return is_centered, off_center, local_threshold
 
 
+def evaluate_profiles(heights, scales, results, gaps, threshold=10):
+    """
+    Centered flag, offset (full resolution pixels) and threshold of frames from their detection profiles (N x
+    threshold arrays, as returned by frame_profile_in_file). heights are those of the decoded images.
+    """
+    centered, offsets, thresholds = evaluate_sweep(np.asarray(results).T, np.asarray(gaps).T, np.asarray(heights),
+                                                   threshold)
+    offsets = np.where(offsets != -1, offsets * np.asarray(scales), -1)
+    return centered, offsets, thresholds
+
+
 def show_image_popup(image):
     global window_size
     
@@ -224,23 +222,134 @@ def display_image_popup(image_path, bw=False):
     show_image_popup(img)
 
 
-def is_frame_in_file_centered(image_path, film_type ='S8', threshold=10, slice_width=10):
-    global sprocket_best_x_found, sprocket_hole_x
-    # Read the image
+def bayer_to_rgb_half(bayer, raw):
+    # Each 2x2 Bayer quad gives one RGB pixel, linear and normalized (0-1), with daylight white balance applied
+    pattern = raw.raw_pattern   # Color index of each quad position: 0 R, 1 G, 2 B, 3 G2
+    black = raw.black_level_per_channel
+    scale = raw.white_level - np.array(black[:4], dtype=np.float32)
+    wb = np.array(raw.daylight_whitebalance[:3], dtype=np.float32)
+    wb = wb / wb.min() if wb.min() > 0 else np.ones(3, dtype=np.float32)
+    height, width = bayer.shape[0] // 2, bayer.shape[1] // 2
+    rgb = np.zeros((3, height, width), dtype=np.float32)
+    count = np.zeros(3, dtype=np.float32)
+    for dy in (0, 1):
+        for dx in (0, 1):
+            color = pattern[dy][dx]
+            channel = 1 if color == 3 else color
+            plane = bayer[dy:height * 2:2, dx:width * 2:2].astype(np.float32)
+            rgb[channel] += (plane - black[color]) / scale[color]
+            count[channel] += 1
+    rgb *= (wb / count)[:, np.newaxis, np.newaxis]
+    return np.clip(rgb, 0, 1, out=rgb)
+
+
+def load_dng_left_luminance(raw, columns):
+    """
+    Fast DNG path: Gray image (half size) of the left part of the frame (columns at full resolution), computed
+    directly from the raw Bayer data instead of a full rawpy postprocess. Emulates postprocess defaults closely
+    enough for hole detection: Daylight white balance, auto brightness (1% of pixels clipped, estimated on a
+    subsample of the whole frame) and BT.709 gamma. Color matrix is not applied.
+    """
+    bayer = raw.raw_image_visible
+    # Auto brightness: Level reached by the 1% brightest values, on one of every 8x8 quads
+    height, width = bayer.shape[0] // 2, bayer.shape[1] // 2
+    sample = bayer[:height * 2, :width * 2].reshape(height, 2, width, 2)[::8, :, ::8, :]
+    sample = sample.reshape(sample.shape[0] * 2, sample.shape[2] * 2)
+    white = max(np.percentile(bayer_to_rgb_half(sample, raw), 99), 1e-3)
+    # Left columns only (rounded up to whole quads)
+    columns = min(bayer.shape[1], (columns + 1) // 2 * 2)
+    rgb = np.clip(bayer_to_rgb_half(bayer[:, :columns], raw) / white, 0, 1)
+    # BT.709 gamma (rawpy default, gamma=(2.222, 4.5))
+    rgb = np.where(rgb < 0.018, rgb * 4.5, 1.099 * np.power(rgb, 0.45) - 0.099)
+    gray = 0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]
+    return np.round(gray * 255).astype(np.uint8)
+
+
+def load_frame(image_path, slice_width=10, fast_load=False, content=None):
+    global sprocket_hole_x
+    # Read the image. With fast_load, decode at reduced resolution where the format allows it: JPEG DCT scaling
+    # (1/4), DNG half size luminance of the left columns taken directly from raw data (see load_dng_left_luminance).
+    # PNG has no such option and is always decoded at full resolution. Returns image and scale used.
+    # If content of file was already read (prefetched), image is decoded from it
+    scale = 1
     if check_dng_frames_for_misalignment and image_path.lower().endswith('.dng'):
-        with rawpy.imread(image_path) as raw:
-            rgb = raw.postprocess()
-            # Convert the numpy array to something OpenCV can work with
-            img = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        with rawpy.imread(image_path if content is None else io.BytesIO(content)) as raw:
+            if fast_load:
+                img = load_dng_left_luminance(raw, sprocket_hole_x + max(slice_width, 20))
+                scale = 2
+            else:
+                rgb = raw.postprocess()
+                # Convert the numpy array to something OpenCV can work with
+                img = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    elif fast_load and image_path.lower().endswith(('.jpg', '.jpeg')):
+        img = decode_image(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4, content)
+        scale = 4
     else:
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        img = decode_image(image_path, cv2.IMREAD_GRAYSCALE, content)
 
     if img is None:
         raise ValueError("Could not read the image")
-    
-    
+    return img, scale
+
+
+def decode_image(image_path, flags, content=None):
+    if content is None:
+        return cv2.imread(image_path, flags)
+    return cv2.imdecode(np.frombuffer(content, dtype=np.uint8), flags)
+
+
+def is_frame_in_file_centered(image_path, film_type ='S8', threshold=10, slice_width=10, fast_load=False):
+    img, scale = load_frame(image_path, slice_width, fast_load)
     # Call is_frame_centered with the image
-    return is_frame_centered(frame_number_from_path(image_path), img, film_type, threshold, slice_width)
+    return is_frame_centered(frame_number_from_path(image_path), img, film_type, threshold, slice_width, scale)
+
+
+def frame_profile_in_file(image_path, film_type='S8', slice_width=10, fast_load=False, content=None):
+    # Detection profile of frame in file (see frame_alignment.sweep_profiles), valid for any tolerance.
+    # Returns height of decoded image, scale, and hole center and gaps for each sweep threshold
+    img, scale = load_frame(image_path, slice_width, fast_load, content)
+    stripe, slice_width = frame_stripe(img, slice_width, scale)
+    results, gaps = sweep_profiles(stripe[np.newaxis], film_type, slice_width)
+    return img.shape[0], scale, results[:, 0], gaps[:, 0]
+
+
+def check_file(image_path, film_type, fast_load=False, content=None):
+    # Invoked in worker processes: Profile is returned instead of the decision, so that it can be cached and
+    # evaluated for any threshold in main process. Height zero means file could not be read (error returned
+    # instead of scale)
+    try:
+        height, scale, results, gaps = frame_profile_in_file(image_path, film_type, fast_load=fast_load,
+                                                             content=content)
+    except ValueError as e:
+        return image_path, 0, str(e), None, None
+    return image_path, height, scale, results, gaps
+
+
+def check_files(image_paths, film_type, fast_load=False, depth=0, max_mb=256):
+    # Invoked in worker processes for a chunk of files. With depth > 0, next files are read while current one is
+    # being decoded. Returns results and time spent waiting for files to be read
+    if depth == 0:
+        return [check_file(image_path, film_type, fast_load) for image_path in image_paths], 0
+    prefetcher = ReadPrefetcher(image_paths, depth, max_mb * 2**20)
+    try:
+        # Content None if file could not be read: Read again directly, to get the actual error
+        results = [check_file(image_path, film_type, fast_load, content) for image_path, content in prefetcher]
+    finally:
+        prefetcher.close()
+    return results, prefetcher.wait_time
+
+
+def create_worker_pool(processes=None, nice=0):
+    # Use forkserver when available: Forking a process with Tk already running is unsafe
+    try:
+        context = multiprocessing.get_context('forkserver')
+    except ValueError:
+        context = multiprocessing.get_context('spawn')
+    if processes is None:
+        processes = worker_processes
+    if nice > 0 and hasattr(os, 'nice'):
+        return context.Pool(processes=processes, initializer=os.nice, initargs=(nice,))
+    return context.Pool(processes=processes)
 
 
 def frame_number_from_path(image_path):
@@ -292,12 +401,7 @@ def select_folder():
         result_text.insert(tk.END, "No folder selected\n")
 
 
-def process_images_in_folder(folder_path, film_type, threshold):
-    global processing, stop_processing_requested
-    global sprocket_best_x_found
-
-    root.after(1000, on_change_threshold)
-    question_film_type = False
+def list_image_files(folder_path):
     file_set = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.dng') if check_dng_frames_for_misalignment else ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
 
     file_list = os.listdir(folder_path)
@@ -306,54 +410,257 @@ def process_images_in_folder(folder_path, film_type, threshold):
         file for file in file_list
         if os.path.splitext(file)[1].lower() in file_set
     ]
-    sorted_filenames = sorted(filtered_list)
+    return [os.path.join(folder_path, filename) for filename in sorted(filtered_list)]
+
+
+def open_folder_cache(folder_path, film_type, fast_load):
+    return FrameCheckerCache(folder_path, {'film_type': film_type, 'sprocket_hole_x': sprocket_hole_x,
+                                           'fast_load': fast_load, 'sweep': SWEEP_THRESHOLDS})
+
+
+def analyze_folder(image_paths, film_type, threshold, fast_load=False, on_wait=None, report=None, pool=None,
+                   cache=None):
+    """
+    Generator yielding (image_path, image_height, centered, off_center, threshold) for each file in image_paths
+    (all in the same folder), in order. Image height zero means file could not be read (error message in place of
+    threshold). Does not depend on GUI:
+    - on_wait(): Invoked while waiting for worker processes (e.g. to keep GUI alive). Returning True stops
+    - report(message): Informative messages
+    Files are analyzed by a pool of worker processes. Profiles of files already analyzed with the same parameters
+    are taken from the folder cache (see FrameCheckerCache) instead, only new or modified files are loaded.
+    Pool and cache are created (and closed/saved at the end) unless provided by caller (watch mode).
+    """
+    if not image_paths:
+        return
+    own_pool = pool is None
+    own_cache = cache is None
+    if own_cache:
+        cache = open_folder_cache(os.path.dirname(image_paths[0]), film_type, fast_load)
+    cached = [cache.lookup(image_path) for image_path in image_paths]
+    cached_idx = [i for i, entry in enumerate(cached) if entry is not None]
+    pending_paths = [image_path for image_path, entry in zip(image_paths, cached) if entry is None]
+    # Cached frames are all evaluated at once
+    decisions = {}
+    if cached_idx:
+        if report is not None:
+            report(f"{len(cached_idx)} files already analyzed, taken from cache\n")
+        heights, scales, profile_results, profile_gaps = zip(*[cached[i] for i in cached_idx])
+        decisions = dict(zip(cached_idx, zip(*evaluate_profiles(heights, scales, profile_results, profile_gaps,
+                                                                threshold))))
+    completed = False
+    try:
+        if pending_paths:
+            if own_pool:
+                pool = create_worker_pool()
+            # Files sent in chunks, to reduce inter-process overhead (imap with chunksize > 1 cannot be waited
+            # with a timeout), long enough for readahead to be effective
+            chunk_size = max(4, prefetch_depth * 2)
+            chunks = [pending_paths[i:i + chunk_size] for i in range(0, len(pending_paths), chunk_size)]
+            results = pool.imap(functools.partial(check_files, film_type=film_type, fast_load=fast_load,
+                                                  depth=prefetch_depth, max_mb=prefetch_max_mb), chunks)
+            chunk_results = collections.deque()
+            io_wait_time = 0
+        for idx, image_path in enumerate(image_paths):
+            if cached[idx] is None:
+                while not chunk_results:
+                    try:
+                        chunk, chunk_wait_time = results.next(timeout=0.1)
+                        chunk_results.extend(chunk)
+                        io_wait_time += chunk_wait_time
+                    except multiprocessing.TimeoutError:
+                        if on_wait is not None and on_wait():
+                            return
+                image_path, height, scale, profile_results, profile_gaps = chunk_results.popleft()
+                if height == 0:     # Error message in place of scale
+                    yield image_path, 0, False, -1, scale
+                    continue
+                cache.store(image_path, height, scale, profile_results, profile_gaps)
+                centered, off_center, img_threshold = evaluate_profiles([height], [scale], [profile_results],
+                                                                        [profile_gaps], threshold)
+                decisions[idx] = (centered[0], off_center[0], img_threshold[0])
+            else:
+                height, scale = cached[idx][:2]
+            centered, off_center, img_threshold = decisions[idx]
+            yield image_path, height * scale, bool(centered), int(off_center), int(img_threshold)
+        completed = True
+        if own_pool and pending_paths and prefetch_depth > 0 and report is not None:
+            report(f"Time waiting for file reads: {io_wait_time:.1f} seconds (all worker processes)\n")
+    finally:
+        # Pending files are discarded if processing was stopped
+        if own_pool and pool is not None:
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+        # Profiles of files analyzed are kept even if processing was stopped
+        if own_cache:
+            cache.save()
+
+
+def watch_folder(folder_path, film_type, threshold, fast_load=False, on_wait=None, report=None):
+    """
+    Watch mode: Same as analyze_folder for the files already in folder, then follows it (see FolderWatcher), yielding
+    results of new files as they are written by an ongoing scan. Never ends by itself, only when on_wait() (also
+    invoked while waiting for new files) returns True. Analysis uses watch_workers processes, with lower priority.
+    """
+    watcher = FolderWatcher(folder_path, ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.dng') if check_dng_frames_for_misalignment else ('.png', '.jpg', '.jpeg', '.gif', '.bmp'))
+    if report is not None:
+        report(f"Watching {folder_path} ({'inotify' if watcher.uses_inotify else 'polling'})\n")
+    cache = open_folder_cache(folder_path, film_type, fast_load)
+    pool = create_worker_pool(watch_workers, watch_nice)
+    analyzed = {}   # path -> modification time when analyzed
+    candidates = set(list_image_files(folder_path))     # Watcher started first: Files written later not missed
+    last_cache_save = time.time()
+    try:
+        while True:
+            # Files are analyzed once settled (polling might report files still being written)
+            ready = []
+            now = time.time()
+            for image_path in sorted(candidates):
+                try:
+                    mtime_ns = os.stat(image_path).st_mtime_ns
+                except OSError:     # Removed
+                    candidates.discard(image_path)
+                    continue
+                if analyzed.get(image_path) == mtime_ns:
+                    candidates.discard(image_path)
+                elif now - mtime_ns / 1e9 >= watch_settle_time:
+                    candidates.discard(image_path)
+                    analyzed[image_path] = mtime_ns
+                    ready.append(image_path)
+            if ready:
+                yield from analyze_folder(ready, film_type, threshold, fast_load, on_wait, report, pool, cache)
+            if on_wait is not None and on_wait():
+                return
+            if time.time() - last_cache_save > 60:
+                cache.save()
+                last_cache_save = time.time()
+            candidates.update(watcher.wait(0.2))
+    finally:
+        pool.terminate()
+        pool.join()
+        watcher.close()
+        cache.save()
+
+
+def misalignment_alert(recent_frames, bad):
+    # Watch mode: Message if too many of the last frames analyzed (deque with maxlen) were misaligned or empty, which
+    # points to a problem in the ongoing scan (film threading, tension), None otherwise. Restarts after each alert
+    recent_frames.append(bad)
+    if len(recent_frames) < recent_frames.maxlen:
+        return None
+    bad_pct = sum(recent_frames) * 100 / len(recent_frames)
+    if bad_pct < watch_alert_pct:
+        return None
+    recent_frames.clear()
+    return f"WARNING: {bad_pct:.0f}% of the last {recent_frames.maxlen} frames are misaligned or empty, please check scanner\n"
+
+
+def frame_status(off_center):
+    if off_center == -1:
+        return "possibly empty"
+    elif off_center < 0:
+        return f"{-off_center} pixels too high"
+    else:
+        return f"{off_center} pixels too low"
+
+
+def write_history_entry(folder_path, threshold, processed_files, misaligned_counter, empty_counter):
+    if not os.path.exists(frame_alignment_checker_history_fullpath): # If historic log does not exist, write header
+        with open(frame_alignment_checker_history_fullpath, 'a') as f:
+            message = "Check time, Folder name, Folder creation date, Shift threshold, % misaligned, % empty, Processed files, Misaligned frames, Empty frames\r\n"
+            f.write(message)  
+    with open(frame_alignment_checker_history_fullpath, 'a') as f:
+        message = f"{time.ctime()}, {folder_path}, {get_folder_creation_date(folder_path)}, {int(image_height*threshold/100)}, {misaligned_counter*100/processed_files:.2f}, {empty_counter*100/processed_files:.2f}, {processed_files}, {misaligned_counter}, {empty_counter}\r\n"
+        f.write(message)                
+
+
+def process_images_in_folder(folder_path, film_type, threshold):
+    global processing, stop_processing_requested
+    global sprocket_best_x_found, image_height
+
+    root.after(1000, on_change_threshold)
+    # In watch mode folder is followed until stopped, total number of files is unknown (zero)
+    watch = watch_var.get()
+    question_film_type = watch     # Watch mode raises alerts instead
+    image_paths = [] if watch else list_image_files(folder_path)
 
     sprocket_best_x_found = False # Search again for new optimal x search position
-    total_files = len(sorted_filenames)
+    total_files = len(image_paths)
     processed_files = 0
     misaligned_counter = 0
     empty_counter = 0
+    recent_frames = collections.deque(maxlen=watch_alert_window)
     # Record start time
     start_time = time.time()
-    result_text.insert(tk.END, f"Processing {total_files} files in {folder_path}\n")
-
-    for filename in sorted_filenames:
-        if stop_processing_requested:  # Check if processing was stopped            
-            break
-        if filename.lower().endswith(file_set):
-            image_path = os.path.join(folder_path, filename)
-            centered, off_center, img_threshold = is_frame_in_file_centered(image_path, film_type, threshold)
-            if not centered:
-                display_bad_frame(image_path)
-                if off_center == -1:
-                    status = "possibly empty" 
-                elif off_center < 0:
-                    status = f"{-off_center} pixels too high" 
-                else:
-                    status = f"{off_center} pixels too low"
-                message = f"{image_path}, {status}, threshold = {img_threshold}\n"
+    if not watch:
+        result_text.insert(tk.END, f"Processing {total_files} files in {folder_path}\n")
+
+    def keep_gui_alive():
+        root.update()
+        return stop_processing_requested
+
+    # Results are collected here in order, GUI is kept alive while waiting for them. GUI refresh is throttled,
+    # otherwise it dominates processing time for cached frames
+    last_gui_update = 0
+    last_bad_frame_display = 0
+    if watch:
+        frames = watch_folder(folder_path, film_type, threshold, fast_load_var.get(), on_wait=keep_gui_alive,
+                              report=lambda message: result_text.insert(tk.END, message))
+    else:
+        frames = analyze_folder(image_paths, film_type, threshold, fast_load_var.get(), on_wait=keep_gui_alive,
+                                report=lambda message: result_text.insert(tk.END, message))
+    try:
+        for image_path, height, centered, off_center, img_threshold in frames:
+            if stop_processing_requested:  # Check if processing was stopped
+                break
+            if height == 0:     # File could not be read
+                message = f"{image_path}, could not be read: {img_threshold}\n"
                 result_text.insert(tk.END, message)
-                result_text.see(tk.END)
-                if off_center == -1:
-                    empty_counter += 1
-                else:
-                    misaligned_counter += 1
                 with open(frame_alignment_checker_log_fullpath, 'a') as f:
                     f.write(message)
+            else:
+                image_height = height
+                frame_idx = frame_number_from_path(image_path)
+                bad_frame_threshold[frame_idx] = min(img_threshold, 254)
+                if not centered:
+                    if time.time() - last_bad_frame_display > 0.5:
+                        display_bad_frame(image_path)
+                        last_bad_frame_display = time.time()
+                    message = f"{image_path}, {frame_status(off_center)}, threshold = {img_threshold}\n"
+                    result_text.insert(tk.END, message)
+                    if off_center == -1:
+                        empty_counter += 1
+                    else:
+                        misaligned_counter += 1
+                    with open(frame_alignment_checker_log_fullpath, 'a') as f:
+                        f.write(message)
+                if watch:
+                    alert = misalignment_alert(recent_frames, not centered)
+                    if alert is not None:
+                        result_text.insert(tk.END, alert)
+                        with open(frame_alignment_checker_log_fullpath, 'a') as f:
+                            f.write(alert)
 
             # Update progress
             processed_files += 1
-            bad_frame_count.config(text=f"Processed: {processed_files}\r\nMisaligned: {misaligned_counter} ({misaligned_counter*100/processed_files:.2f}%)\r\nEmpty: {empty_counter} ({empty_counter*100/processed_files:.2f}%)")
-            progress = (processed_files / total_files) * 100 if total_files > 0 else 0
-            progress_bar['value'] = progress
-            root.update_idletasks()
-            root.update()
+            if watch or time.time() - last_gui_update > 0.1 or processed_files == total_files:
+                bad_frame_count.config(text=f"Processed: {processed_files}\r\nMisaligned: {misaligned_counter} ({misaligned_counter*100/processed_files:.2f}%)\r\nEmpty: {empty_counter} ({empty_counter*100/processed_files:.2f}%)")
+                progress = (processed_files / total_files) * 100 if total_files > 0 else 0
+                progress_bar['value'] = progress
+                result_text.see(tk.END)
+                root.update_idletasks()
+                root.update()
+                last_gui_update = time.time()
             if not question_film_type and processed_files > 200 and (misaligned_counter+empty_counter)*100//processed_files > 80:
                 if tk.messagebox.askokcancel("Too many failures", "Too many misaligned frames. Selected film type (S8/R8) might be wrong, do you want to stop to correct that?"):
                     stop_processing_requested = True
                 else:
                     question_film_type = True
-    
+    finally:
+        frames.close()
+
     # Record end time
     end_time = time.time()
 
@@ -376,15 +683,9 @@ def process_images_in_folder(folder_path, film_type, threshold):
             result_text.insert(tk.END, message)
             with open(frame_alignment_checker_log_fullpath, 'a') as f:
                 f.write(message)
-            if not stop_processing_requested:   # If processed completely add entry to history lof
-                if not os.path.exists(frame_alignment_checker_history_fullpath): # If historic log does not exist, write header
-                    with open(frame_alignment_checker_history_fullpath, 'a') as f:
-                        message = "Check time, Folder name, Folder creation date, Shift threshold, % misaligned, % empty, Processed files, Misaligned frames, Empty frames\r\n"
-                        f.write(message)  
-                thres = int(threshold_spinbox.get())
-                with open(frame_alignment_checker_history_fullpath, 'a') as f:
-                    message = f"{time.ctime()}, {folder_path}, {get_folder_creation_date(folder_path)}, {int(image_height*thres/100)}, {misaligned_counter*100/processed_files:.2f}, {empty_counter*100/processed_files:.2f}, {processed_files}, {misaligned_counter}, {empty_counter}\r\n"
-                    f.write(message)                
+            if not stop_processing_requested or watch:   # If processed completely add entry to history lof
+                write_history_entry(folder_path, int(threshold_spinbox.get()), processed_files, misaligned_counter,
+                                    empty_counter)
         else:
             message = f"{processed_files} frames verified, all are correctly aligned!!!\n"
             result_text.insert(tk.END, message)
@@ -400,6 +701,118 @@ def process_images_in_folder(folder_path, film_type, threshold):
     root.config(cursor="")  # Change cursor to indicate processing ended
 
 
+def frame_record(image_path, height, centered, off_center, img_threshold):
+    # Per frame result in batch mode output
+    frame = {'file': os.path.basename(image_path), 'frame': frame_number_from_path(image_path)}
+    if height == 0:
+        frame.update(status='error', centered=False, offset=None, threshold=None, error=img_threshold)
+    else:
+        status = 'centered' if centered else 'empty' if off_center == -1 else 'misaligned'
+        frame.update(status=status, centered=centered, offset=None if off_center == -1 else off_center,
+                     threshold=img_threshold, error=None)
+    return frame
+
+
+def check_folders_headless(folders, film_type, threshold, fast_load=False, output_format='json', output_dir=None,
+                           watch=False, idle_timeout=0):
+    """
+    Batch mode, without GUI: Check each folder, write per frame results (JSON or CSV file per folder, in output_dir,
+    log folder by default) and add the summary of each one to the history CSV. Returns number of folders that could
+    not be checked.
+    With watch, folder is followed while being scanned (see watch_folder), until interrupted (Ctrl-C) or no new frame
+    arrives for idle_timeout seconds (if not zero). Results are streamed: Written as soon as each frame is analyzed
+    (JSON Lines instead of JSON) and misaligned frames added to the log, with an alert if there are too many of them.
+    """
+    global image_height
+    if output_dir is None:
+        output_dir = os.path.dirname(frame_alignment_checker_history_fullpath)
+    os.makedirs(output_dir, exist_ok=True)
+    failed_folders = 0
+    for folder_path in folders:
+        folder_path = os.path.abspath(folder_path)
+        if not os.path.isdir(folder_path):
+            print(f"{folder_path}: Not a folder, skipped")
+            failed_folders += 1
+            continue
+        start_time = time.time()
+        frames = []
+        misaligned_counter = 0
+        empty_counter = 0
+        processed_files = 0
+        unreadable_counter = 0  # Not included in processed files (as in the CSV, where they have their own status)
+        output_file = os.path.join(output_dir, f"frame_alignment_checker.{os.path.basename(folder_path)}."
+                                               f"{time.strftime('%Y%m%d-%H%M%S')}."
+                                               f"{'jsonl' if watch and output_format == 'json' else output_format}")
+        output = open(output_file, 'w', newline='')
+        if output_format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=['file', 'frame', 'status', 'centered', 'offset', 'threshold',
+                                                        'error'])
+            writer.writeheader()
+        report = lambda message: print(message, end='')
+        if watch:
+            last_frame_time = time.time()
+            recent_frames = collections.deque(maxlen=watch_alert_window)
+            results = watch_folder(folder_path, film_type, threshold, fast_load, report=report,
+                                   on_wait=lambda: idle_timeout > 0 and time.time() - last_frame_time > idle_timeout)
+        else:
+            image_paths = list_image_files(folder_path)
+            print(f"Processing {len(image_paths)} files in {folder_path}")
+            results = analyze_folder(image_paths, film_type, threshold, fast_load, report=report)
+        try:
+            for image_path, height, centered, off_center, img_threshold in results:
+                frame = frame_record(image_path, height, centered, off_center, img_threshold)
+                if frame['status'] == 'error':
+                    unreadable_counter += 1
+                else:
+                    processed_files += 1
+                    image_height = height
+                if frame['status'] == 'empty':
+                    empty_counter += 1
+                elif frame['status'] == 'misaligned':
+                    misaligned_counter += 1
+                if output_format == 'csv':
+                    writer.writerow(frame)
+                elif watch:
+                    output.write(json.dumps(frame) + '\n')
+                else:
+                    frames.append(frame)
+                if watch:
+                    last_frame_time = time.time()
+                    output.flush()
+                    messages = []
+                    if frame['status'] in ('empty', 'misaligned'):
+                        messages.append(f"{image_path}, {frame_status(off_center)}, threshold = {img_threshold}\n")
+                    elif frame['status'] == 'error':
+                        messages.append(f"{image_path}, could not be read: {img_threshold}\n")
+                    alert = misalignment_alert(recent_frames, frame['status'] in ('empty', 'misaligned'))
+                    if alert is not None:
+                        messages.append(alert)
+                    if messages:
+                        print(''.join(messages), end='')
+                        with open(frame_alignment_checker_log_fullpath, 'a') as f:
+                            f.write(''.join(messages))
+        except KeyboardInterrupt:
+            print("Watch interrupted")
+        finally:
+            results.close()
+            if output_format == 'json' and not watch:
+                json.dump({'folder': folder_path, 'film_type': film_type, 'threshold': threshold,
+                           'shift_threshold': int(image_height * threshold / 100), 'processed': processed_files,
+                           'misaligned': misaligned_counter, 'empty': empty_counter, 'unreadable': unreadable_counter,
+                           'frames': frames}, output, indent=1)
+            output.close()
+
+        if processed_files > 0:
+            write_history_entry(folder_path, threshold, processed_files, misaligned_counter, empty_counter)
+            print(f"{processed_files} frames verified, {misaligned_counter} misaligned "
+                  f"({misaligned_counter*100/processed_files:.2f}%), {empty_counter} possibly empty "
+                  f"({empty_counter*100/processed_files:.2f}%). Duration: {format_duration(time.time() - start_time)}")
+        if unreadable_counter > 0:
+            print(f"{unreadable_counter} files could not be read")
+        print(f"Results written to {output_file}")
+    return failed_folders
+
+
 def prevent_input(event):
     # Returning "break" prevents the event from propagating further
     return "break"
@@ -640,9 +1053,72 @@ def get_folder_creation_date(folder_path):
 
 
 def main (argv):
-    global result_text, progress_bar, root, threshold_spinbox, film_type_var
+    global result_text, progress_bar, root, threshold_spinbox, film_type_var, fast_load_var, watch_var
     global threshold_message, bad_frame_count, bad_frame_canvas, selected_folder_value
     global start_stop_button, select_button, close_button
+    global worker_processes, prefetch_depth
+
+    headless = False
+    film_type = 'S8'
+    threshold = 10
+    fast_load = False
+    output_format = 'json'
+    output_dir = None
+    watch = False
+    idle_timeout = 0
+    try:
+        opts, args = getopt.getopt(argv, "br:t:w:qo:d:p:Wi:h")
+    except getopt.GetoptError as e:
+        print(f"Invalid command line parameter: {e}")
+        return
+
+    for opt, arg in opts:
+        if opt == '-b':
+            headless = True
+        elif opt == '-r':
+            film_type = arg.upper()
+        elif opt == '-t':
+            threshold = int(arg)
+        elif opt == '-w':
+            worker_processes = max(1, int(arg))
+        elif opt == '-q':
+            fast_load = True
+        elif opt == '-p':
+            prefetch_depth = max(0, int(arg))
+        elif opt == '-W':
+            watch = True
+        elif opt == '-i':
+            idle_timeout = float(arg)
+        elif opt == '-o':
+            output_format = arg.lower()
+        elif opt == '-d':
+            output_dir = arg
+        elif opt == '-h':
+            print("Frame Alignment Checker Command line parameters")
+            print("  -b                 Batch mode (no GUI): Check folders given after options")
+            print("  -r <S8|R8>         Film type (S8 by default)")
+            print("  -t <threshold>     Shift threshold, in % of frame height (10 by default)")
+            print("  -w <workers>       Number of worker processes (number of CPUs by default)")
+            print("  -q                 Fast load (decode JPEG/DNG files at reduced resolution)")
+            print("  -p <depth>         Number of files read ahead by each worker process (4 by default, 0 disables)")
+            print("  -o <json|csv>      Format of per frame results in batch mode (json by default)")
+            print("  -d <folder>        Folder for per frame results in batch mode (Logs by default)")
+            print("  -W                 Watch mode: Follow folder of an ongoing scan, analyzing new frames as they")
+            print("                     are written (Ctrl-C to stop). In GUI, 'Watch' checkbox does the same")
+            print("  -i <seconds>       Watch mode: Stop after no new frames for this time (0 by default: never)")
+            print("Example: FrameChecker.py -b -r R8 -t 8 -o csv /path/reel1 /path/reel2")
+            exit()
+
+    if headless:
+        if film_type not in ('S8', 'R8') or output_format not in ('json', 'csv') or not args:
+            print("Batch mode requires at least one folder, film type S8 or R8 and output format json or csv")
+            sys.exit(2)
+        if watch and len(args) > 1:
+            print("Watch mode can follow only one folder")
+            sys.exit(2)
+        init_logging()
+        sys.exit(1 if check_folders_headless(args, film_type, threshold, fast_load, output_format, output_dir, watch,
+                                             idle_timeout) else 0)
 
     # Main window setup
     root = tk.Tk()
@@ -681,6 +1157,12 @@ def main (argv):
     film_type_var = tk.StringVar(value='S8')  # Default value
     tk.Radiobutton(radio_frame, text='S8', variable=film_type_var, value='S8').pack(side=tk.LEFT)
     tk.Radiobutton(radio_frame, text='R8', variable=film_type_var, value='R8').pack(side=tk.LEFT)
+    # Fast load: Decode files at reduced resolution (JPEG and DNG only)
+    fast_load_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(radio_frame, text='Fast load', variable=fast_load_var).pack(side=tk.LEFT)
+    # Watch: Follow folder of an ongoing scan, analyzing new frames as they are written, until stopped
+    watch_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(radio_frame, text='Watch', variable=watch_var).pack(side=tk.LEFT)
 
     bad_frame_count = tk.Label(top_frame, text="Misaligned: 0\r\nEmpty: 0")
     bad_frame_count.grid(row=2, column=1, padx=(20, 5), pady=5)
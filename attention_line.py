@@ -0,0 +1,85 @@
+"""
+****************************************************************************************************************
+Classes GpioAttentionLine, SimulatedAttentionLine
+Attention line from the controller: A GPIO asserted by the controller (Arduino Nano or RPi Pico) while it has
+responses waiting to be read, so that ControllerLink reads them as soon as they are available instead of on its next
+poll.
+- Arduino Nano (5V) uses it as open drain, active low: Line only pulled low by the controller, pulled up to 3.3V by
+  the RPi internal pull up (active_low=True), so that the RPi GPIO never sees 5V. RPi Pico (3.3V) drives it both
+  ways, active high
+- Both classes have the same interface: on_raised (callback invoked, in any thread, when line is raised), is_raised()
+  and close()
+- GpioAttentionLine uses gpiozero (standard in Raspberry Pi OS). If not available, or if the GPIO cannot be used,
+  creation fails with OSError, and caller should keep polling the controller. 'Raised' means asserted, whatever the
+  polarity
+- SimulatedAttentionLine is driven by software (raise_line/lower_line), to be used with a simulated controller or for
+  testing without hardware
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "AttentionLine"
+__version__ = "1.0.0"
+__date__ = "2025-11-30"
+__version_highlight__ = "AttentionLine - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import threading
+
+try:
+    from gpiozero import DigitalInputDevice
+    gpiozero_loaded = True
+except ImportError:
+    gpiozero_loaded = False
+
+
+class GpioAttentionLine:
+    def __init__(self, pin, active_low=True):
+        if not gpiozero_loaded:
+            raise OSError("gpiozero not available")
+        try:
+            # Active low (Nano, open drain): Pull up to 3.3V, gpiozero then reports the line active when low.
+            # Active high (Pico, drives the line both ways): Pull down only to keep it low if disconnected
+            self.device = DigitalInputDevice(pin, pull_up=active_low)
+        except Exception as e:     # gpiozero raises its own exceptions (pin in use, no pin factory...)
+            raise OSError(f"Cannot use GPIO {pin} as attention line: {e}")
+        self.on_raised = None
+        self.device.when_activated = self._raised
+
+    def _raised(self):
+        if self.on_raised is not None:
+            self.on_raised()
+
+    def is_raised(self):
+        return self.device.is_active
+
+    def close(self):
+        self.device.close()
+
+
+class SimulatedAttentionLine:
+    def __init__(self):
+        self.on_raised = None
+        self.raised = False
+        self.lock = threading.Lock()
+
+    def raise_line(self):
+        with self.lock:
+            edge = not self.raised
+            self.raised = True
+        if edge and self.on_raised is not None:
+            self.on_raised()
+
+    def lower_line(self):
+        with self.lock:
+            self.raised = False
+
+    def is_raised(self):
+        return self.raised
+
+    def close(self):
+        self.on_raised = None
@@ -0,0 +1,82 @@
+"""
+****************************************************************************************************************
+Validation of FrameChecker fast DNG path
+For each DNG file in a folder, runs the alignment check with the full rawpy postprocess and with the fast raw
+luminance path (fast load), and reports frames where the decision differs, maximum offset difference (pixels)
+and time per frame of each path.
+Usage: python benchmarks/dng_fast_path_check.py -f folder [-t S8|R8] [-p threshold] [-n max_files]
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "DngFastPathCheck"
+__version__ = "1.0.0"
+__date__ = "2025-11-25"
+__version_highlight__ = "DngFastPathCheck - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import getopt
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+import FrameChecker
+
+
+def main(argv):
+    folder = None
+    film_type = 'S8'
+    threshold = 10
+    max_files = 0
+    opts, args = getopt.getopt(argv, "f:t:p:n:")
+    for opt, arg in opts:
+        if opt == '-f':
+            folder = arg
+        elif opt == '-t':
+            film_type = arg.upper()
+        elif opt == '-p':
+            threshold = int(arg)
+        elif opt == '-n':
+            max_files = int(arg)
+    if folder is None:
+        print(__doc__)
+        return
+    if not FrameChecker.check_dng_frames_for_misalignment:
+        print("rawpy library is required to check DNG files")
+        return
+
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith('.dng'))
+    if max_files > 0:
+        files = files[:max_files]
+    mismatches = 0
+    max_offset_diff = 0
+    full_time = fast_time = 0
+    for filename in files:
+        path = os.path.join(folder, filename)
+        start_time = time.perf_counter()
+        full = FrameChecker.is_frame_in_file_centered(path, film_type, threshold)
+        full_time += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        fast = FrameChecker.is_frame_in_file_centered(path, film_type, threshold, fast_load=True)
+        fast_time += time.perf_counter() - start_time
+        # Same decision: centered, misaligned or empty (offset -1)
+        if full[0] != fast[0] or (full[1] == -1) != (fast[1] == -1):
+            mismatches += 1
+            print(f"{filename}: Full {full}, fast {fast}")
+        elif full[1] != -1:
+            max_offset_diff = max(max_offset_diff, abs(full[1] - fast[1]))
+    if len(files) > 0:
+        print(f"{len(files)} DNG files, {mismatches} different decisions, max offset difference {max_offset_diff} px")
+        print(f"Full postprocess {full_time * 1000 / len(files):.1f} ms per frame, "
+              f"fast path {fast_time * 1000 / len(files):.1f} ms per frame")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,202 @@
+"""
+****************************************************************************************************************
+Micro-benchmark for ALT-Scann8 is_frame_centered
+Compares the vectorized sprocket hole segmentation against the previous per-row loop implementation (kept here as
+reference), using synthetic S8 and R8 frames. Checks that both give identical results (also for blank and
+saturated frames, where no hole is found), then times them, one frame at a time and as a single batch
+(frame_alignment module).
+Usage: python benchmarks/frame_centered_benchmark.py [-n iterations] [-r WIDTHxHEIGHT]
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "FrameCenteredBenchmark"
+__version__ = "1.0.0"
+__date__ = "2025-11-23"
+__version_highlight__ = "FrameCenteredBenchmark - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import getopt
+import importlib.util
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+import frame_alignment
+
+
+def load_alt_scann8():
+    # ALT-Scann8.py cannot be imported by name (dash in filename)
+    spec = importlib.util.spec_from_file_location("alt_scann8", os.path.join(os.path.dirname(script_dir),
+                                                                             "ALT-Scann8.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reference_hole_areas(white_heights, min_gap_size):
+    # Previous per-row segmentation loop of is_frame_centered
+    areas = []
+    start = None
+    previous = None
+    for i in white_heights:
+        if start is None:
+            start = i
+        if previous is not None and i-previous > 1:
+            if previous-start > min_gap_size:
+                areas.append((start, previous - 1))
+            start = i
+        previous = i
+    if start is not None and white_heights[-1]-start > min_gap_size:
+        areas.append((start, white_heights[-1]))
+    return areas
+
+
+def reference_is_frame_centered(img, film_type='S8', threshold=10, slice_width=10, v_shift=0):
+    # Previous implementation of ALT-Scann8 is_frame_centered (per-row loop), used as reference
+    height = img.shape[0]
+    sliced_image = img[:, :slice_width]
+    img = cv2.cvtColor(sliced_image, cv2.COLOR_BGR2GRAY)
+    _, binary_img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+    middle = height // 2 + v_shift
+    margin = height*threshold//100
+    height_profile = np.sum(binary_img, axis=1)
+    if film_type == 'S8':
+        white_heights = np.where(height_profile > 0)[0]
+    else:
+        white_heights = np.where(height_profile == 0)[0]
+    areas = reference_hole_areas(white_heights, int(height*0.08))
+    result = 0
+    bigger = 0
+    area_count = 0
+    for start, end in areas:
+        area_count += 1
+        if area_count > 2:
+            break
+        if end-start > bigger:
+            bigger = end-start
+            center = int((start + end) // 2)
+            result = center
+    if result != 0:
+        if result >= middle - margin and result <= middle + margin:
+            return True, (result - middle) if result > middle else -(middle - result)
+        else:
+            return False, (result - middle) if result > middle else -(middle - result)
+    return False, -1
+
+
+def synthetic_frame(rng, film_type, width, height):
+    # Film base on the left edge with one or two sprocket holes (bright for S8, dark for R8 on a bright edge),
+    # plus noise and a few short spurious runs, so that all branches of the segmentation are exercised
+    edge_width = 32
+    base, hole = (30, 230) if film_type == 'S8' else (230, 30)
+    img = np.full((height, edge_width, 3), base, dtype=np.uint8)
+    hole_height = int(height * rng.uniform(0.10, 0.20))
+    center = int(height * rng.uniform(0.2, 0.8))
+    img[max(0, center - hole_height // 2):center + hole_height // 2, :] = hole
+    if rng.random() < 0.5:  # Partial second hole at top or bottom
+        partial = int(height * rng.uniform(0.02, 0.12))
+        if rng.random() < 0.5:
+            img[:partial, :] = hole
+        else:
+            img[height - partial:, :] = hole
+    for i in range(rng.integers(0, 6)):  # Short spurious runs (dust, scratches)
+        row = rng.integers(0, height - 10)
+        img[row:row + rng.integers(1, 10), :] = hole
+    noise = rng.integers(-15, 16, img.shape)
+    img = np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :edge_width] = img
+    return frame
+
+
+def frame_white_rows(frame, film_type, slice_width=10):
+    gray = cv2.cvtColor(frame[:, :slice_width], cv2.COLOR_BGR2GRAY)
+    _, binary_img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+    white_rows = np.any(binary_img, axis=1)
+    return white_rows if film_type == 'S8' else ~white_rows
+
+
+def benchmark(function, frames, film_type, iterations):
+    start_time = time.perf_counter()
+    for i in range(iterations):
+        for frame in frames:
+            function(frame, film_type)
+    return (time.perf_counter() - start_time) / (iterations * len(frames))
+
+
+def main(argv):
+    iterations = 20
+    width, height = 2028, 1520
+    opts, args = getopt.getopt(argv, "n:r:h")
+    for opt, arg in opts:
+        if opt == '-n':
+            iterations = int(arg)
+        elif opt == '-r':
+            width, height = [int(value) for value in arg.lower().split('x')]
+        elif opt == '-h':
+            print(__doc__)
+            return
+
+    alt_scann8 = load_alt_scann8()
+    rng = np.random.default_rng(8)
+    for film_type in ('S8', 'R8'):
+        frames = [synthetic_frame(rng, film_type, width, height) for i in range(50)]
+        # Blank and saturated frames (leader, trailer) checked too, not timed
+        blank_frames = [np.full((height, width, 3), value, dtype=np.uint8) for value in (0, 255)]
+        for frame in frames + blank_frames:
+            expected = reference_is_frame_centered(frame, film_type, v_shift=alt_scann8.FrameVCenterImageShift)
+            obtained = alt_scann8.is_frame_centered(frame, film_type)
+            if tuple(expected) != tuple(obtained):
+                print(f"{film_type}: Result mismatch, reference {expected}, vectorized {obtained}")
+                sys.exit(1)
+        # Segmentation only (the part that was rewritten)
+        masks = [frame_white_rows(frame, film_type) for frame in frames]
+        min_gap_size = int(height * 0.08)
+        for mask in masks + [frame_white_rows(frame, film_type) for frame in blank_frames]:
+            area_frames, starts, ends = frame_alignment.hole_areas(mask[np.newaxis], min_gap_size)
+            if reference_hole_areas(np.flatnonzero(mask), min_gap_size) != list(zip(starts, ends)):
+                print(f"{film_type}: Segmentation mismatch")
+                sys.exit(1)
+        reference_time = benchmark(lambda m, t: reference_hole_areas(np.flatnonzero(m), min_gap_size),
+                                   masks, film_type, iterations)
+        vectorized_time = benchmark(lambda m, t: frame_alignment.hole_areas(m[np.newaxis], min_gap_size),
+                                    masks, film_type, iterations)
+        print(f"{film_type} {width}x{height} segmentation: Reference {reference_time * 1000:.3f} ms, "
+              f"vectorized {vectorized_time * 1000:.3f} ms, speedup x{reference_time / vectorized_time:.1f}")
+        # Complete is_frame_centered call
+        reference_time = benchmark(
+            lambda f, t: reference_is_frame_centered(f, t, v_shift=alt_scann8.FrameVCenterImageShift),
+            frames, film_type, iterations)
+        vectorized_time = benchmark(alt_scann8.is_frame_centered, frames, film_type, iterations)
+        print(f"{film_type} {width}x{height} is_frame_centered: Reference {reference_time * 1000:.3f} ms, "
+              f"vectorized {vectorized_time * 1000:.3f} ms, speedup x{reference_time / vectorized_time:.1f}")
+        # Whole set of frames in a single batch call
+        blank_stripes = np.stack([cv2.cvtColor(frame[:, :10], cv2.COLOR_BGR2GRAY) for frame in blank_frames])
+        centered, offsets, thresholds = frame_alignment.frames_centered_otsu(
+            blank_stripes, film_type, v_shift=alt_scann8.FrameVCenterImageShift)
+        expected = [reference_is_frame_centered(frame, film_type, v_shift=alt_scann8.FrameVCenterImageShift)
+                    for frame in blank_frames]
+        if [tuple(result) for result in expected] != list(zip(centered.tolist(), offsets.tolist())):
+            print(f"{film_type}: Batch result mismatch for blank frames, reference {expected}, batch "
+                  f"{list(zip(centered.tolist(), offsets.tolist()))}")
+            sys.exit(1)
+        stripes = np.stack([cv2.cvtColor(frame[:, :10], cv2.COLOR_BGR2GRAY) for frame in frames])
+        batch_time = benchmark(lambda s, t: frame_alignment.frames_centered_otsu(
+            s, t, v_shift=alt_scann8.FrameVCenterImageShift), [stripes], film_type, iterations) / len(frames)
+        print(f"{film_type} {width}x{height} batch of {len(frames)} stripes: {batch_time * 1000:.3f} ms per frame, "
+              f"speedup x{reference_time / batch_time:.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
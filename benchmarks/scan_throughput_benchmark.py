@@ -0,0 +1,475 @@
+"""
+****************************************************************************************************************
+End to end scan throughput benchmark for ALT-Scann8
+Runs the scan path of ALT-Scann8 (scan thread, capture, AE/AWB waits, HDR, save worker pool, display thread,
+controller link) against the controller simulator and the replay camera, for each combination of the requested
+settings: File type, capture resolution, HDR, frame detection mode (PFD/VFD), misaligned frame detection, auto white
+balance (AWB wait of each capture, as with a user session with AWB enabled), number of save threads and scan sequencing (event driven scan thread, or Tk timers as before). Each combination runs in its own process, so that CPU usage and peak memory are its own.
+Reports, for each one, frames per minute (from first capture until last frame saved), latency percentiles of each
+stage (frame event to capture, AE/AWB waits, capture, save, display), CPU usage (100% = one core) and peak RSS.
+Results can be saved (-o) and compared with a previous run (-c): Runs with FPM below baseline by more than the
+tolerance (-p) are flagged, and exit code is 1.
+With -g, a frame trace (time taken by each stage of each frame, see FrameTracer) is also written for each run, to
+be opened with Perfetto.
+Tk user interface is not used: Preview is resized to canvas size but not drawn, other UI updates are ignored.
+DNG files are written with PiDNG, as with a real camera. Without PiDNG (or if it cannot compress), the replay camera
+writes TIFF files (or uncompressed DNGs) instead: DNG save timings are then not representative, and flagged as such.
+Usage: python benchmarks/scan_throughput_benchmark.py [-t jpg,png,dng] [-r 2028x1520,...] [-H off,on]
+       [-m PFD,VFD] [-a off,on] [-b off,on] [-w 2,4] [-e event,timer] [-n frames] [-s frame_time|model] [-d stabilization_ms] [-i image_folder]
+       [-o results.json] [-c baseline.json] [-p tolerance_%] [-g trace_folder]
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "ScanThroughputBenchmark"
+__version__ = "1.0.0"
+__date__ = "2025-12-03"
+__version_highlight__ = "ScanThroughputBenchmark - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import getopt
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+STAGES = ['frame_event', 'autoexp', 'awb', 'capture', 'save', 'display']
+RUN_TIMEOUT = 600
+STALL_TIMEOUT = 60  # No frame captured for this long: Scan path stuck (e.g. save threads died)
+
+
+def load_alt_scann8():
+    # ALT-Scann8.py cannot be imported by name (dash in filename)
+    spec = importlib.util.spec_from_file_location("alt_scann8", os.path.join(os.path.dirname(script_dir),
+                                                                             "ALT-Scann8.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p * len(values)))]
+    return {'p50': pick(0.5) * 1000, 'p90': pick(0.9) * 1000, 'p99': pick(0.99) * 1000, 'max': values[-1] * 1000}
+
+
+# ----- Single run (child process) -----
+
+class HeadlessVar:
+    # Stand-in for Tk variables: Keeps value only
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class HeadlessWidget:
+    # Stand-in for Tk widgets: Any method call ignored
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class HeadlessWindow(HeadlessWidget):
+    # Stand-in for Tk main window: Timers (after) are kept, and run from the benchmark loop as Tk main loop would
+    def __init__(self):
+        self.timers = []
+
+    def after(self, ms, function=None, *args):
+        self.timers.append((time.perf_counter() + ms / 1000, function, args))
+
+    def next_timer(self):
+        return min((timer[0] for timer in self.timers), default=None)
+
+    def run_timers(self):
+        now = time.perf_counter()
+        due = sorted((timer for timer in self.timers if timer[0] <= now), key=lambda timer: timer[0])
+        self.timers = [timer for timer in self.timers if timer[0] > now]
+        for due_time, function, args in due:
+            function(*args)
+
+
+def make_recording_average(rolling_average_class, samples):
+    class RecordingAverage(rolling_average_class):
+        # Rolling average used by ALT-Scann8 for its stage timings, also keeping every value for percentiles
+        def add_value(self, value):
+            samples.append(value)
+            super().add_value(value)
+    return RecordingAverage
+
+
+def run_single(config, frames, frame_time, stabilization_delay, image_folder, trace_folder):
+    from controller_link import ControllerLink
+    from controller_simulator import ControllerSimulator
+    from camera_resolutions import CameraResolutions
+    from frame_tracer import FrameTracer
+    import cv2
+    import replay_camera
+
+    app = load_alt_scann8()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    out_folder = tempfile.mkdtemp(prefix="alt-scann8-benchmark-")
+    samples = {stage: [] for stage in STAGES}
+
+    # Headless UI: Tk variables and widgets used by the scan path
+    for name in ['scan_error_counter_value', 'Scanned_Images_number', 'frames_to_go_str', 'frames_to_go_time_str',
+                 'scanned_Images_time_value', 'scanned_Images_fps_value', 'exposure_value', 'wb_red_value',
+                 'wb_blue_value', 'hdr_min_exp_value', 'hdr_max_exp_value', 'autostop_type']:
+        setattr(app, name, HeadlessVar())
+    app.win = HeadlessWindow()
+    app.refresh_qr_code = lambda: None
+    app.PreviewWidth, app.PreviewHeight = 640, 480
+
+    def draw_preview_image(preview_image, curframe, idx):
+        # Same work as ALT-Scann8 display, except the drawing itself (needs Tk)
+        curtime = time.time()
+        trace_start = time.perf_counter()
+        if curframe % app.PreviewModuleValue == 0 and preview_image is not None:
+            if preview_image.size != (app.PreviewWidth, app.PreviewHeight):
+                preview_image.resize((app.PreviewWidth, app.PreviewHeight))
+        app.time_preview_display.add_value(time.time() - curtime)
+        app.frame_tracer.add('display', curframe, trace_start)
+    app.draw_preview_image = draw_preview_image
+
+    scan_ended = threading.Event()
+
+    def end_scan_session():
+        app.ScanOngoing = False
+        app.ScanStopRequested = False
+        app.send_arduino_command(app.CMD_STOP_SCAN)
+        scan_ended.set()
+    app.end_scan_session = end_scan_session
+
+    # Stage timings: ALT-Scann8 rolling averages, plus capture and frame event to capture
+    recording = {stage: make_recording_average(app.RollingAverage, samples[stage])(50)
+                 for stage in ['autoexp', 'awb', 'save', 'display']}
+    app.time_autoexp, app.time_awb = recording['autoexp'], recording['awb']
+    app.time_save_image, app.time_preview_display = recording['save'], recording['display']
+    app.offset_image = app.RollingAverage(5)
+    frame_event = {'time': 0}
+    capture_times = []
+    arduino_event, capture = app.arduino_event, app.capture
+
+    def timed_arduino_event(trigger, param1, param2, event_time):
+        if trigger == app.RSP_FRAME_AVAILABLE:
+            frame_event['time'] = event_time
+        arduino_event(trigger, param1, param2, event_time)
+
+    def timed_capture(mode):
+        start = time.perf_counter()
+        if frame_event['time']:     # Event time from time.time(), as in ALT-Scann8
+            samples['frame_event'].append(time.time() - frame_event['time'])
+            frame_event['time'] = 0
+        capture(mode)
+        capture_times.append(start)
+        samples['capture'].append(time.perf_counter() - start)
+    app.arduino_event, app.capture = timed_arduino_event, timed_capture
+
+    # Settings
+    app.SimulatedRun = False
+    app.CameraDisabled = False
+    app.ExpertMode = False
+    app.controls, app.Transform, app.MappedArray = (replay_camera.controls, replay_camera.Transform,
+                                                    replay_camera.MappedArray)
+    app.CurrentDir = out_folder
+    app.scan_error_log_fullpath = os.path.join(out_folder, "scan_error.log")
+    app.ConfigData = {"FilmType": "S8"}
+    app.FilmType = 'S8'
+    app.FileType = config['file_type']
+    app.CaptureResolution = config['resolution']
+    app.HdrCaptureActive = config['hdr']
+    app.FrameDetectMode = config['mode']
+    app.DetectMisalignedFrames = config['align']
+    app.AutoWbEnabled = config.get('awb', False)
+    app.SaveWorkersMin = app.SaveWorkersMax = config['threads']
+    app.ScanEventDriven = config.get('sequencing', 'event') == 'event'
+    if stabilization_delay is not None:
+        app.StabilizationDelayValue = stabilization_delay
+    if trace_folder is not None:
+        app.frame_tracer = FrameTracer(enabled=True)
+    app.adjust_default_frame_steps()
+
+    # Controller, camera and capture threads, as done by tscann8_init
+    simulator = ControllerSimulator(frame_time=frame_time, seed=1)
+    app.controller_link = ControllerLink(simulator, app.ControllerPollInterval / 1000)
+    app.camera = replay_camera.ReplayCamera(folder=image_folder, seed=1)
+    app.camera_resolutions = CameraResolutions(app.camera.sensor_modes)
+    app.camera_resolutions.set_active(config['resolution'])
+    app.PiCam2_configure()
+    if app.LoresPreview:
+        app.PiCam2_enable_lores_preview()
+    if config['hdr']:
+        # HDR bracket as set by a user session (HDR is available in experimental mode)
+        app.ExperimentalMode = True
+        app.hdr_best_exp = (app.HdrMinExp + app.HdrMaxExp) // 2
+        app.hdr_init()
+        app.MergeMertens = cv2.createMergeMertens()
+    app.init_capture_threads()
+
+    def dispatch_events():
+        while True:
+            event = app.controller_link.get_event()
+            if event is None:
+                break
+            app.arduino_event(*event)
+        while not app.ui_call_queue.empty():
+            function, args = app.ui_call_queue.get_nowait()
+            function(*args)
+
+    app.reset_controller()
+    app.get_controller_version()
+    deadline = time.time() + 5
+    while app.Controller_Id == 0 and time.time() < deadline:
+        dispatch_events()
+        time.sleep(0.005)
+
+    # Start scan, as done by start_scan (minus UI)
+    cpu_start = os.times()
+    start_time = time.time()
+    app.ScanOngoing = True
+    app.NewFrameAvailable = False
+    app.session_start_time = time.time()
+    app.session_frames = 0
+    app.camera.set_controls({"AeEnable": app.AutoExpEnabled})
+    app.camera.set_controls({"AwbEnable": app.AutoWbEnabled})
+    app.send_arduino_command(app.CMD_START_SCAN, app.FrameDetectMode == 'VFD')
+    app.start_scan_sequencer()
+    last_check = time.time()
+    last_progress = (time.time(), 0)
+    while not scan_ended.is_set() and time.time() - start_time < RUN_TIMEOUT:
+        dispatch_events()
+        if app.session_frames != last_progress[1]:
+            last_progress = (time.time(), app.session_frames)
+        elif time.time() - last_progress[0] > STALL_TIMEOUT:
+            # Threads cannot be stopped cleanly in this state
+            print(f"Scan stalled after {app.session_frames} frames", file=sys.stderr, flush=True)
+            shutil.rmtree(out_folder, ignore_errors=True)
+            os._exit(1)
+        if app.session_frames >= frames and not app.ScanStopRequested:
+            app.ScanStopRequested = True
+            app.scan_event.set()
+        if time.time() - last_check >= 1:
+            app.save_worker_pool_check()
+            last_check = time.time()
+        # Timer driven sequencing: capture_loop runs here, in the same thread dispatching events (as with Tk)
+        app.win.run_timers()
+        next_timer = app.win.next_timer()
+        time.sleep(0.005 if next_timer is None else min(0.005, max(0, next_timer - time.perf_counter())))
+    # Frames are done once save queue is drained
+    app.capture_display_event.set()
+    app.capture_display_queue.put(app.END_TOKEN)
+    app.save_worker_pool.stop()
+    end_time = time.time()
+    end_perf = time.perf_counter()
+    cpu_end = os.times()
+    app.controller_link.stop()
+    simulator.stop()
+    app.camera.close()
+    if trace_folder is not None:
+        app.frame_tracer.export(os.path.join(trace_folder, config_key(config).replace(' ', '_') + ".json"))
+    saved = len([name for name in os.listdir(out_folder) if name.startswith('picture-')])
+    shutil.rmtree(out_folder, ignore_errors=True)
+
+    captured = len(capture_times)
+    elapsed = end_perf - capture_times[0] if capture_times else 0
+    cpu = (cpu_end.user + cpu_end.system) - (cpu_start.user + cpu_start.system)
+    return {'config': config, 'frame_time': frame_time, 'frames': captured, 'files': saved,
+            'fpm': captured * 60 / elapsed if elapsed else 0, 'cpu': cpu * 100 / (end_time - start_time),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'stages': {stage: percentiles(values) for stage, values in samples.items()},
+            'scan_errors': app.scan_error_counter, 'timed_out': not scan_ended.is_set(),
+            'dng_writer': app.camera.dng_writer if config['file_type'] == 'dng' else None}
+
+
+# ----- Matrix of runs (parent process) -----
+
+def config_key(config):
+    # AWB and sequencing only shown when not default (AWB on, timer mode), so that results saved before they were
+    # options can still be compared
+    return (f"{config['file_type']} {config['resolution']} {'HDR' if config['hdr'] else 'SDR'} {config['mode']} "
+            f"{'align' if config['align'] else 'noalign'}{' awb' if config.get('awb', False) else ''} "
+            f"{config['threads']}t{' timer' if config.get('sequencing', 'event') == 'timer' else ''}")
+
+
+def run_matrix(configs, run_args):
+    results = []
+    for config in configs:
+        print(f"Running {config_key(config)}...", flush=True)
+        command = [sys.executable, os.path.abspath(__file__), '--run', json.dumps(config)] + run_args
+        try:
+            process = subprocess.run(command, capture_output=True, text=True, timeout=RUN_TIMEOUT + 60)
+        except subprocess.TimeoutExpired:
+            print("  Timed out")
+            continue
+        lines = process.stdout.strip().splitlines()
+        if process.returncode != 0 or not lines:
+            print(f"  Failed (exit code {process.returncode}):\n{process.stderr[-2000:]}")
+            continue
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+def print_report(results, baseline, tolerance):
+    regressions = 0
+    for result in results:
+        key = config_key(result['config'])
+        line = (f"{key:40} {result['fpm']:7.1f} FPM  {result['frames']:4} frames  CPU {result['cpu']:5.0f}%  "
+                f"RSS {result['peak_rss_mb']:6.0f} MB")
+        if result['timed_out']:
+            line += "  TIMED OUT"
+        if key in baseline and baseline[key]['frame_time'] != result['frame_time']:
+            line += "  (baseline frame time differs, not compared)"
+        elif key in baseline:
+            change = (result['fpm'] - baseline[key]['fpm']) * 100 / baseline[key]['fpm']
+            line += f"  {change:+.1f}% vs baseline"
+            if change < -tolerance:
+                line += "  *** REGRESSION"
+                regressions += 1
+        print(line)
+        if result.get('dng_writer') == 'TIFF':
+            print("    DNG save timings not representative: PiDNG not installed, TIFF files written instead")
+        elif result.get('dng_writer') == 'PiDNG uncompressed':
+            print("    DNG save timings not representative: PiDNG cannot compress, DNG files written uncompressed")
+        for stage in STAGES:
+            stats = result['stages'][stage]
+            if stats is not None:
+                print(f"    {stage:12} p50 {stats['p50']:8.1f}  p90 {stats['p90']:8.1f}  p99 {stats['p99']:8.1f}  "
+                      f"max {stats['max']:8.1f} ms")
+    return regressions
+
+
+def parse_list(arg, convert=str):
+    return [convert(item.strip()) for item in arg.split(',') if item.strip()]
+
+
+def parse_on_off(item):
+    if item.lower() not in ('on', 'off'):
+        raise ValueError(f"Expected on/off, got {item}")
+    return item.lower() == 'on'
+
+
+def main(argv):
+    file_types = ['jpg', 'png', 'dng']
+    resolutions = ['2028x1520']
+    hdr_values = [False]
+    modes = ['PFD']
+    align_values = [False, True]
+    awb_values = [False, True]
+    thread_counts = [2]
+    sequencing_modes = ['event']
+    frames = 30
+    frame_time = '0.05'
+    stabilization_delay = None
+    image_folder = None
+    output_file = None
+    baseline_file = None
+    tolerance = 10
+    trace_folder = None
+    config = None
+    opts, args = getopt.getopt(argv, "t:r:H:m:a:b:w:e:n:s:d:i:o:c:p:g:", ["run="])
+    for opt, arg in opts:
+        if opt == '-t':
+            file_types = parse_list(arg)
+        elif opt == '-r':
+            resolutions = parse_list(arg)
+        elif opt == '-H':
+            hdr_values = parse_list(arg, parse_on_off)
+        elif opt == '-m':
+            modes = parse_list(arg, str.upper)
+        elif opt == '-a':
+            align_values = parse_list(arg, parse_on_off)
+        elif opt == '-b':
+            awb_values = parse_list(arg, parse_on_off)
+        elif opt == '-w':
+            thread_counts = parse_list(arg, int)
+        elif opt == '-e':
+            sequencing_modes = parse_list(arg, str.lower)
+        elif opt == '-n':
+            frames = int(arg)
+        elif opt == '-s':
+            frame_time = arg
+        elif opt == '-d':
+            stabilization_delay = int(arg)
+        elif opt == '-i':
+            image_folder = os.path.abspath(arg)
+        elif opt == '-o':
+            output_file = arg
+        elif opt == '-c':
+            baseline_file = arg
+        elif opt == '-p':
+            tolerance = float(arg)
+        elif opt == '-g':
+            trace_folder = os.path.abspath(arg)
+        elif opt == '--run':
+            config = json.loads(arg)
+
+    if config is not None:
+        # Child process: Single run, result printed as last line
+        result = run_single(config, frames, None if frame_time == 'model' else float(frame_time),
+                            stabilization_delay, image_folder, trace_folder)
+        print(json.dumps(result))
+        return 0
+
+    from camera_resolutions import CameraResolutions
+    import replay_camera
+    available = CameraResolutions(replay_camera.HQ_SENSOR_MODES).get_list()
+    for resolution in resolutions:
+        if resolution not in available:
+            print(f"Unknown resolution {resolution}, available: {', '.join(available)}")
+            return 2
+    for sequencing in sequencing_modes:
+        if sequencing not in ('event', 'timer'):
+            print(f"Unknown scan sequencing {sequencing}, expected event or timer")
+            return 2
+    configs = [{'file_type': file_type, 'resolution': resolution, 'hdr': hdr, 'mode': mode, 'align': align,
+                'awb': awb, 'threads': threads, 'sequencing': sequencing}
+               for file_type, resolution, hdr, mode, align, awb, threads, sequencing in
+               itertools.product(file_types, resolutions, hdr_values, modes, align_values, awb_values, thread_counts,
+                                 sequencing_modes)]
+    run_args = ['-n', str(frames), '-s', frame_time]
+    if stabilization_delay is not None:
+        run_args += ['-d', str(stabilization_delay)]
+    if image_folder is not None:
+        run_args += ['-i', image_folder]
+    if trace_folder is not None:
+        os.makedirs(trace_folder, exist_ok=True)
+        run_args += ['-g', trace_folder]
+    results = run_matrix(configs, run_args)
+
+    baseline = {}
+    if baseline_file is not None:
+        with open(baseline_file) as f:
+            baseline = {config_key(result['config']): result for result in json.load(f)}
+    print(f"\n{len(results)} runs, {frames} frames each, frame time {frame_time}")
+    regressions = print_report(results, baseline, tolerance)
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=1)
+    if regressions:
+        print(f"{regressions} runs below baseline by more than {tolerance}%")
+        return 1
+    return 0 if len(results) == len(configs) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
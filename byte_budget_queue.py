@@ -0,0 +1,104 @@
+"""
+****************************************************************************************************************
+Class ByteBudgetQueue
+Queue bounded by the memory used by the items it holds, not only by their number: A full resolution frame, an HDR
+sub-exposure or a PiCamera2 request can differ in size by more than 10x, so an item count alone does not prevent
+running out of memory.
+- Size of each item is estimated by a function provided by the caller when the item is queued
+- put() blocks (or raises queue.Full if non-blocking) while adding the item would exceed the byte budget. An item
+  is always accepted when the queue is empty, so that an item larger than the budget cannot block forever
+- Keeps some statistics: Bytes currently queued, high-water mark, number of puts that had to wait (and total time
+  waited) and number of puts rejected
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "ByteBudgetQueue"
+__version__ = "1.0.0"
+__date__ = "2025-11-21"
+__version_highlight__ = "ByteBudgetQueue - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import collections
+import queue
+import time
+
+
+class ByteBudgetQueue(queue.Queue):
+    def __init__(self, byte_budget, item_size, maxsize=0):
+        self.byte_budget = byte_budget
+        self.item_size = item_size  # item_size(item): Returns estimated size of item in bytes
+        self.bytes_queued = 0
+        self.high_water_bytes = 0
+        self.waited_puts = 0
+        self.waited_time = 0
+        self.rejected_puts = 0
+        super().__init__(maxsize)
+
+    # Items are stored together with their estimated size, so that the same value is subtracted when retrieved
+    def _init(self, maxsize):
+        self.queue = collections.deque()
+
+    def _put(self, entry):
+        self.queue.append(entry)
+        self.bytes_queued += entry[1]
+        self.high_water_bytes = max(self.high_water_bytes, self.bytes_queued)
+
+    def _get(self):
+        item, size = self.queue.popleft()
+        self.bytes_queued -= size
+        # Waiting items have different sizes: Wake all of them (get() only notifies one), any might fit now
+        self.not_full.notify_all()
+        return item
+
+    def _is_full(self, size):
+        if 0 < self.maxsize <= self._qsize():
+            return True
+        return self.bytes_queued > 0 and self.bytes_queued + size > self.byte_budget
+
+    def put(self, item, block=True, timeout=None):
+        size = self.item_size(item)
+        with self.not_full:
+            if self._is_full(size):
+                if not block:
+                    self.rejected_puts += 1
+                    raise queue.Full
+                start_time = time.time()
+                if timeout is None:
+                    while self._is_full(size):
+                        self.not_full.wait()
+                elif timeout < 0:
+                    raise ValueError("'timeout' must be a non-negative number")
+                else:
+                    endtime = start_time + timeout
+                    while self._is_full(size):
+                        remaining = endtime - time.time()
+                        if remaining <= 0.0:
+                            self.rejected_puts += 1
+                            raise queue.Full
+                        self.not_full.wait(remaining)
+                self.waited_puts += 1
+                self.waited_time += time.time() - start_time
+            self._put((item, size))
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def would_block(self, item):
+        # True if put(item) would have to wait now. Not counted as a rejected put
+        with self.mutex:
+            return self._is_full(self.item_size(item))
+
+    def bytes_used(self):
+        with self.mutex:
+            return self.bytes_queued
+
+    def reset_stats(self):
+        with self.mutex:
+            self.high_water_bytes = self.bytes_queued
+            self.waited_puts = 0
+            self.waited_time = 0
+            self.rejected_puts = 0
@@ -0,0 +1,403 @@
+"""
+****************************************************************************************************************
+Class ControllerLink
+Single owner of the I2C bus shared with the controller (Arduino Nano or RPi Pico): A background thread does all I2C
+transactions, so that a slow or stalled bus never blocks the UI, and so that transactions requested from different
+threads (UI, scan thread, hardware panel) are never interleaved.
+- Controller status is polled at a configurable interval. Each response received (RSP_* code plus two 16 bit
+  parameters) is decoded and queued in 'events', together with the time it was read, for the application to dispatch
+- Commands (send_command) are queued and written by the I2C thread, caller does not wait. Pending commands have
+  priority over polling, as long as a poll is not overdue
+- Any other transaction (e.g. other devices on the same bus) can be run in the I2C thread through 'bus', an object
+  with the same methods as smbus.SMBus, whose calls wait for the transaction to be done and return its result
+- If the controller supports it (multi_response, set once negotiated), several queued responses are read in a
+  single transaction (count byte followed by the responses), so that frequent responses (plotter info) do not delay
+  the others. Controller is polled again without waiting whenever more responses might be pending
+- Optional checked protocol (checked_protocol, also negotiated): Commands and responses carry a 7 bit sequence
+  number and a CRC-8. A corrupted or missing message is detected by the receiver and sent again within a few
+  milliseconds, instead of being lost (commands: controller asks for them with RSP_CMD_RESEND, responses: UI asks for
+  them with CMD_RESEND_RESPONSES). Commands failing with an I/O error are retried, duplicates are discarded by the
+  controller thanks to the sequence number
+- Optional attention line (see attention_line.py): A GPIO raised by the controller while it has responses queued.
+  When used, controller is polled as soon as the line is raised (and again while it stays raised), and otherwise only
+  at a slower safety interval. If responses keep arriving on safety polls without the line ever being raised (line
+  not wired, old firmware), attention line is dropped and controller is polled at the normal interval again
+- Keeps per transaction type statistics: Number of transactions, errors, total and maximum latency
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "ControllerLink"
+__version__ = "1.0.0"
+__date__ = "2025-11-27"
+__version_highlight__ = "ControllerLink - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+CONTROLLER_ADDRESS = 16
+CMD_GET_CNT_STATUS = 2
+CMD_GET_CNT_STATUS_MULTI = 5
+CMD_GET_CNT_STATUS_CHECKED = 6
+CMD_RESEND_RESPONSES = 7
+RSP_CMD_RESEND = 91
+RESPONSE_SIZE = 5
+CHECKED_RESPONSE_SIZE = 7  # Response followed by sequence number and CRC
+RSP_MULTI_MAX = 6  # Controller Wire buffer is 32 bytes: Count byte plus up to 6 responses
+RSP_CHECKED_MAX = 4
+# Capability flags, negotiated with CMD_VERSION_ID/RSP_VERSION_ID
+CAP_MULTI_RESPONSE = 0x80
+CAP_CHECKED_PROTOCOL = 0x40
+SEQ_MASK = 0x7F
+SEQ_SYNC = 0x80  # Set in sequence number when sender (re)starts sequence, so that receiver resyncs
+COMMAND_HISTORY_SIZE = 32  # Commands kept to be sent again if controller did not get them
+ATTENTION_UNSIGNALED_MAX = 3  # Safety polls with responses, line never raised, before giving up on attention line
+COMMAND_RETRIES = 3
+COMMAND_RETRY_DELAY = 0.002
+COMMAND_REQUEUE_MAX = 20  # Times a command failing all retries is queued again, before giving up
+ERRNO_NO_DATA = 121  # Returned by controller when it has nothing to report, not an actual error
+BUS_GAP = 0.0001  # Minimum time between two transactions, to avoid I/O errors
+WRITE_ERROR_BACKOFF = 0.2  # Time to let the bus recover after a failed write
+
+
+def crc8(data):  # Polynomial 0x07, same as controller
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for bit in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class TransactionStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0
+        self.max_time = 0
+
+    def add(self, latency, error=False):
+        self.count += 1
+        self.total_time += latency
+        self.max_time = max(self.max_time, latency)
+        if error:
+            self.errors += 1
+
+    def __str__(self):
+        average = self.total_time * 1000 / self.count if self.count > 0 else 0
+        return f"{self.count} ({self.errors} errors), avg {average:.2f} ms, max {self.max_time * 1000:.2f} ms"
+
+
+class SerializedBus:
+    # smbus.SMBus look-alike: Each call is run by the I2C thread, caller waits for its result
+    def __init__(self, link):
+        self.link = link
+
+    def __getattr__(self, name):
+        def transaction(*args):
+            return self.link.call(name, *args)
+        return transaction
+
+
+class ControllerLink:
+    def __init__(self, i2c, poll_interval=0.005, address=CONTROLLER_ADDRESS, attention=None,
+                 attention_poll_interval=0.05):
+        self.i2c = i2c
+        self.poll_interval = poll_interval
+        self.address = address
+        self.attention = attention
+        self.attention_poll_interval = attention_poll_interval
+        self.attention_polls = 0  # Polls triggered by attention line
+        self.unsignaled_polls = 0  # Safety polls getting responses, while attention line never raised
+        self.received_responses = 0
+        self.events = queue.Queue()  # (trigger, param1, param2, time received)
+        self.requests = queue.Queue()  # (method name, args, Future or None)
+        self.bus = SerializedBus(self)
+        self.stats = {'poll': TransactionStats(), 'command': TransactionStats(), 'other': TransactionStats()}
+        self.last_transaction_time = 0
+        self.multi_response = False
+        self.checked_protocol = False
+        self.command_seq = random.randrange(SEQ_MASK + 1)   # Random start, unlikely to be taken as duplicate
+        self.command_sync = True    # First command flagged, controller syncs on it
+        self.command_history = {}  # sequence number -> (sequence byte, cmd, param)
+        self.expected_response_seq = None   # None: Accept any and sync
+        self.resent_commands = 0
+        self.requested_responses = 0
+        self.discarded_responses = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        if attention is not None:
+            attention.on_raised = self.poll_now
+
+    def poll_now(self):
+        # Can be called from any thread (e.g. attention line callback): Controller is polled without waiting
+        self.requests.put(('poll', (), None))
+
+    def send_command(self, cmd, param=0):
+        self.requests.put(('command', (cmd, param), None))
+
+    def call(self, method, *args, timeout=None):
+        if not self.thread.is_alive():
+            raise IOError("ControllerLink stopped")
+        future = Future()
+        self.requests.put((method, args, future))
+        return future.result(timeout)
+
+    def get_event(self):
+        # Non-blocking: Returns next event received, or None
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _transaction(self, method, args):
+        delay = self.last_transaction_time + BUS_GAP - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            return getattr(self.i2c, method)(*args)
+        finally:
+            self.last_transaction_time = time.perf_counter()
+
+    def _do_request(self, method, args, future):
+        if method == 'command':
+            self._write_command(*args)
+            return
+        start = time.perf_counter()
+        try:
+            result = self._transaction(method, args)
+        except Exception as e:
+            self.stats['other'].add(time.perf_counter() - start, True)
+            future.set_exception(e)
+            return
+        self.stats['other'].add(time.perf_counter() - start)
+        future.set_result(result)
+
+    def _write_command(self, cmd, param, seq=None, requeued=0):
+        data = [int(param % 256), int(param >> 8)]
+        if not self.checked_protocol:
+            start = time.perf_counter()
+            try:
+                self._transaction('write_i2c_block_data', (self.address, cmd, data))
+            except IOError as e:
+                self.stats['command'].add(time.perf_counter() - start, True)
+                logging.warning(f"ControllerLink: Error while sending command {cmd} (param {param}) to "
+                                f"controller: {e}")
+                time.sleep(WRITE_ERROR_BACKOFF)
+                return
+            self.stats['command'].add(time.perf_counter() - start)
+            return
+        if cmd == CMD_RESEND_RESPONSES:
+            seq = 0     # Not sequenced
+        elif seq is None:     # New command (otherwise sent again)
+            seq = self.command_seq | (SEQ_SYNC if self.command_sync else 0)
+            self.command_history[self.command_seq] = (seq, cmd, param)
+            self.command_history.pop((self.command_seq - COMMAND_HISTORY_SIZE) & SEQ_MASK, None)
+            self.command_seq = (self.command_seq + 1) & SEQ_MASK
+            self.command_sync = False
+        data += [seq, crc8([cmd] + data + [seq])]
+        # Retried on error: If it was received anyway, controller discards the duplicate
+        for attempt in range(COMMAND_RETRIES):
+            start = time.perf_counter()
+            try:
+                self._transaction('write_i2c_block_data', (self.address, cmd, data))
+            except IOError as e:
+                self.stats['command'].add(time.perf_counter() - start, True)
+                time.sleep(COMMAND_RETRY_DELAY)
+                continue
+            self.stats['command'].add(time.perf_counter() - start)
+            return
+        if cmd == CMD_RESEND_RESPONSES:
+            return  # Requested again on next poll if still needed
+        if requeued < COMMAND_REQUEUE_MAX:  # Tried again later, after pending requests and next poll
+            self.requests.put(('command', (cmd, param, seq, requeued + 1), None))
+        else:
+            logging.error(f"ControllerLink: Error while sending command {cmd} (param {param}) to controller, "
+                          f"giving up after {COMMAND_RETRIES * (COMMAND_REQUEUE_MAX + 1)} attempts")
+
+    def _resend_commands(self, first_seq):
+        # Controller lost (or rejected) commands starting from first_seq: Send them again, in order
+        if first_seq > SEQ_MASK:    # Controller got no valid command yet
+            first_seq = min(self.command_history, key=lambda seq: (seq - self.command_seq) & SEQ_MASK,
+                            default=self.command_seq)
+        count = (self.command_seq - first_seq) & SEQ_MASK
+        if count > len(self.command_history):
+            logging.warning(f"ControllerLink: Cannot send again commands lost by controller (from sequence "
+                            f"{first_seq}), not in history anymore")
+            self.command_sync = True
+            return
+        logging.debug(f"ControllerLink: Controller requested {count} commands again, from sequence {first_seq}")
+        for i in range(count):
+            seq, cmd, param = self.command_history[(first_seq + i) & SEQ_MASK]
+            self._write_command(cmd, param, seq)
+            self.resent_commands += 1
+
+    def _request_responses(self):
+        # Responses lost or corrupted: Ask controller to send again from first one not received
+        self.requested_responses += 1
+        self._write_command(CMD_RESEND_RESPONSES, self.expected_response_seq or 0)
+
+    def _receive_checked(self, responses, received_time):
+        # Returns False if responses were missing or corrupted (requested again, following ones discarded)
+        for data in responses:
+            if crc8(data[:6]) != data[6]:
+                self.discarded_responses += 1
+                self._request_responses()
+                return False
+            seq = data[5] & SEQ_MASK
+            # Controller (re)started sequence, unless this is the last one received, sent again
+            if self.expected_response_seq is None or (data[5] & SEQ_SYNC and
+                                                      seq != (self.expected_response_seq - 1) & SEQ_MASK):
+                if self.expected_response_seq not in (None, seq):
+                    logging.warning(f"ControllerLink: Controller restarted response sequence (or responses lost), "
+                                    f"resyncing")
+                self.expected_response_seq = seq
+            if seq != self.expected_response_seq:
+                if (self.expected_response_seq - seq) & SEQ_MASK > SEQ_MASK // 2:   # Ahead: Some missing
+                    self.discarded_responses += 1
+                    self._request_responses()
+                    return False
+                continue    # Behind: Duplicate, already received
+            self.expected_response_seq = (seq + 1) & SEQ_MASK
+            if data[0] == RSP_CMD_RESEND:   # Protocol response, not for the application
+                self._resend_commands(data[1] * 256 + data[2])
+            else:
+                self._queue_event(data, received_time)
+        return True
+
+    def _poll(self):
+        # Returns True if more responses might be pending in controller
+        start = time.perf_counter()
+        checked = self.checked_protocol     # Might be enabled meanwhile from another thread
+        try:
+            if checked:
+                size = CHECKED_RESPONSE_SIZE
+                data = self._transaction('read_i2c_block_data', (self.address, CMD_GET_CNT_STATUS_CHECKED,
+                                                                 1 + RSP_CHECKED_MAX * size))
+                if data[0] > RSP_CHECKED_MAX:
+                    raise ValueError(f"Invalid response count {data[0]}")
+                responses = [data[1 + i * size:1 + (i + 1) * size] for i in range(data[0])]
+                more_pending = data[0] == RSP_CHECKED_MAX
+            elif self.multi_response:
+                size = RESPONSE_SIZE
+                data = self._transaction('read_i2c_block_data', (self.address, CMD_GET_CNT_STATUS_MULTI,
+                                                                 1 + RSP_MULTI_MAX * size))
+                count = min(data[0], RSP_MULTI_MAX)
+                responses = [data[1 + i * size:1 + (i + 1) * size] for i in range(count)]
+                more_pending = count == RSP_MULTI_MAX
+            else:
+                responses = [self._transaction('read_i2c_block_data',
+                                               (self.address, CMD_GET_CNT_STATUS, RESPONSE_SIZE))]
+                more_pending = responses[0][0] != 0
+        except IOError as e:
+            # Error 121 means controller has no data available for us
+            self.stats['poll'].add(time.perf_counter() - start, e.errno != ERRNO_NO_DATA)
+            if e.errno != ERRNO_NO_DATA:
+                logging.warning(f"ControllerLink: Non-critical IOError ({e}) while checking incoming event from "
+                                f"controller. Will check again.")
+                if checked:   # Responses might have been sent and lost
+                    self._request_responses()
+                    return True
+            return False
+        except Exception as e:  # Malformed response
+            self.stats['poll'].add(time.perf_counter() - start, True)
+            logging.warning(f"ControllerLink: Unexpected error ({e}) while checking incoming event from controller.")
+            if checked:
+                self._request_responses()
+                return True
+            return False
+        self.stats['poll'].add(time.perf_counter() - start)
+        received_time = time.time()
+        if checked:
+            return not self._receive_checked(responses, received_time) or more_pending
+        for data in responses:
+            if data[0] != 0:
+                self._queue_event(data, received_time)
+        return more_pending
+
+    def _queue_event(self, data, received_time):
+        self.events.put((data[0], data[1] * 256 + data[2], data[3] * 256 + data[4], received_time))
+        self.received_responses += 1
+
+    def _check_attention(self, signaled, received):
+        # Drop attention line if controller has responses for us but never raises it
+        if signaled or self.attention_polls > 0 or received == 0:
+            return
+        self.unsignaled_polls += 1
+        if self.unsignaled_polls >= ATTENTION_UNSIGNALED_MAX:
+            logging.warning("ControllerLink: Attention line never raised by controller, polling it instead")
+            attention, self.attention = self.attention, None
+            attention.close()
+
+    def _run(self):
+        next_poll = time.monotonic()
+        while next_poll is not None:
+            try:
+                next_poll = self._run_step(next_poll)
+            except Exception as e:
+                # This thread is the only one talking to the controller: It must survive anything unexpected
+                logging.exception(f"ControllerLink: Unexpected error: {e}")
+                next_poll = time.monotonic() + self.poll_interval
+
+    def _run_step(self, next_poll):
+        # Serve one request or poll. Returns time of next poll, None once stopped
+        signaled = False
+        try:
+            method, args, future = self.requests.get(timeout=max(0, next_poll - time.monotonic()))
+        except queue.Empty:
+            pass
+        else:
+            if method is None:  # Stop request, queued after any pending request
+                return None
+            if method == 'poll':
+                signaled = True
+                self.attention_polls += 1
+            else:
+                self._do_request(method, args, future)
+                if time.monotonic() < next_poll:
+                    return next_poll    # Pending requests go first, as long as poll is not due
+        received = self.received_responses
+        more_pending = self._poll()
+        if self.attention is not None:
+            received = self.received_responses - received
+            self._check_attention(signaled, received)
+        # Attention line might have been dropped by the check above
+        if self.attention is None:
+            interval = self.poll_interval
+        else:
+            # Line still raised: More responses queued meanwhile (a line stuck high does not make us spin)
+            more_pending = more_pending or (received > 0 and self.attention.is_raised())
+            interval = self.attention_poll_interval
+        return time.monotonic() + (0 if more_pending else interval)
+
+    def stats_report(self):
+        report = ', '.join(f"{name}: {stats}" for name, stats in self.stats.items())
+        if self.attention_polls > 0:
+            report += f", polls on attention line: {self.attention_polls}"
+        if self.checked_protocol:
+            report += (f", commands sent again: {self.resent_commands}, responses requested again: "
+                       f"{self.requested_responses} ({self.discarded_responses} discarded)")
+        return report
+
+    def stop(self):
+        # Requests queued before stopping (e.g. a last command to the controller) are done first
+        self.requests.put((None, None, None))
+        self.thread.join(1)
+        while True:
+            try:
+                method, args, future = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future.set_exception(IOError("ControllerLink stopped"))
+        if self.attention is not None:
+            self.attention.close()
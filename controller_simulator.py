@@ -0,0 +1,588 @@
+"""
+****************************************************************************************************************
+Class ControllerSimulator
+Software stand-in for the scanner controller (Arduino Nano or RPi Pico): An object with the same methods as
+smbus.SMBus, to be used by ControllerLink instead of the real I2C bus, so that the scan path used with real hardware
+(capture loop, PFD/VFD logic, I2C error handling) can run, and be benchmarked, on any computer.
+- Speaks the same I2C protocol as the controller firmware: Commands (CMD_*) written with write_i2c_block_data,
+  responses (RSP_*) read with read_i2c_block_data, including multi-response reads and checked protocol (sequence
+  numbers, CRC, lost messages sent again) when negotiated. Can drive a SimulatedAttentionLine
+- A background thread emulates the controller main loop and its states (idle, scan, rewind, fast forward, slow
+  forward/backward, reels unlocked, manual UV led), in real time:
+  - Frame detection time derived from scan speed and steps per frame, as the firmware does, or fixed (frame_time),
+    with some random variation (frame_jitter)
+  - Film ends after reel_frames frames (None: endless reel). From then on frames are not detected anymore (scan
+    errors), and once film is missing for the stall time, end of reel is reported if auto stop is enabled
+  - Random scan errors (scan_error_rate: probability for a frame not to be detected)
+  - Plotter samples (RSP_REPORT_PLOTTER_INFO) every 20 ms, if requested, with a simulated phototransistor signal
+- Random I2C faults can be injected: I/O errors (io_error_rate, message delivered or not) and corrupted bytes in
+  responses (corruption_rate), so that error handling can be exercised
+- Keeps counters of commands received, responses sent, frames detected, scan errors and injected faults
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "ControllerSimulator"
+__version__ = "1.0.0"
+__date__ = "2025-12-01"
+__version_highlight__ = "ControllerSimulator - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import collections
+import errno
+import logging
+import math
+import random
+import threading
+import time
+
+from controller_link import (crc8, CMD_GET_CNT_STATUS, CMD_GET_CNT_STATUS_MULTI, CMD_GET_CNT_STATUS_CHECKED,
+                             CMD_RESEND_RESPONSES, RSP_CMD_RESEND, RSP_MULTI_MAX, RSP_CHECKED_MAX, CAP_MULTI_RESPONSE,
+                             CAP_CHECKED_PROTOCOL, SEQ_MASK, SEQ_SYNC)
+
+# Same codes as controller firmware
+CMD_VERSION_ID = 1
+CMD_RESET_CONTROLLER = 3
+CMD_ADJUST_MIN_FRAME_STEPS = 4
+CMD_START_SCAN = 10
+CMD_TERMINATE = 11
+CMD_GET_NEXT_FRAME = 12
+CMD_STOP_SCAN = 13
+CMD_SET_REGULAR_8 = 18
+CMD_SET_SUPER_8 = 19
+CMD_SWITCH_REEL_LOCK_STATUS = 20
+CMD_MANUAL_UV_LED = 22
+CMD_FILM_FORWARD = 30
+CMD_FILM_BACKWARD = 31
+CMD_SINGLE_STEP = 40
+CMD_ADVANCE_FRAME = 41
+CMD_ADVANCE_FRAME_FRACTION = 42
+CMD_RUN_FILM_COLLECTION = 43
+CMD_SET_PT_LEVEL = 50
+CMD_SET_MIN_FRAME_STEPS = 52
+CMD_SET_FRAME_FINE_TUNE = 54
+CMD_SET_EXTRA_STEPS = 56
+CMD_SET_UV_LEVEL = 58
+CMD_REWIND = 60
+CMD_FAST_FORWARD = 61
+CMD_INCREASE_WIND_SPEED = 62
+CMD_DECREASE_WIND_SPEED = 63
+CMD_UNCONDITIONAL_REWIND = 64
+CMD_UNCONDITIONAL_FAST_FORWARD = 65
+CMD_SET_SCAN_SPEED = 70
+CMD_SET_STALL_TIME = 72
+CMD_SET_AUTO_STOP = 74
+CMD_REPORT_PLOTTER_INFO = 87
+RSP_VERSION_ID = 1
+RSP_FORCE_INIT = 2
+RSP_FRAME_AVAILABLE = 80
+RSP_SCAN_ERROR = 81
+RSP_REWIND_ERROR = 82
+RSP_FAST_FORWARD_ERROR = 83
+RSP_REWIND_ENDED = 84
+RSP_FAST_FORWARD_ENDED = 85
+RSP_REPORT_AUTO_LEVELS = 86
+RSP_REPORT_PLOTTER_INFO = 87
+RSP_SCAN_ENDED = 88
+RSP_FILM_FORWARD_ENDED = 89
+RSP_ADVANCE_FRAME_FRACTION = 90
+
+CONTROLLER_NANO = 1
+CONTROLLER_PICO = 2
+QUEUE_SIZE = 20     # As in firmware: Queues hold up to QUEUE_SIZE-1 entries, what does not fit is lost
+RSP_HISTORY_SIZE = 16
+# Film and motor figures, as in firmware
+S8_HEIGHT = 4.01
+R8_HEIGHT = 3.3
+CAPSTAN_DIAMETER = 14.3
+MICROSTEP_DEGREES = 1.8 / 16
+PT_LEVEL_S8 = 90
+PT_LEVEL_R8 = 180
+BASE_SCAN_SPEED_DELAY = 10e-6
+STEP_SCAN_SPEED_DELAY = 100e-6
+DECREASE_SCAN_SPEED_DELAY_STEP = 50e-6
+STEP_OVERHEAD = 250e-6  # Time per scan step besides scan speed delay (PT read, motor pulse)
+SLOW_FORWARD_STEP_TIME = 400e-6
+WIND_STOP_TIME = 0.5    # Rewind/fast forward deceleration until stopped
+TICK_INTERVAL = 0.02    # Plotter report and film movement update
+
+# Controller states
+STS_IDLE = 'Idle'
+STS_SCAN = 'Scan'
+STS_SINGLE_STEP = 'SingleStep'
+STS_UNLOCK_REELS = 'UnlockReels'
+STS_MANUAL_UV_LED = 'ManualUvLed'
+STS_REWIND = 'Rewind'
+STS_FAST_FORWARD = 'FastForward'
+STS_SLOW_FORWARD = 'SlowForward'
+STS_SLOW_BACKWARD = 'SlowBackward'
+PT_READ_STATES = (STS_SCAN, STS_SINGLE_STEP, STS_UNLOCK_REELS, STS_MANUAL_UV_LED, STS_SLOW_FORWARD)
+
+
+def min_frame_steps(height, capstan_diameter=CAPSTAN_DIAMETER):
+    return int(height / ((math.pi * capstan_diameter) / (360 / MICROSTEP_DEGREES)))
+
+
+class ControllerSimulator:
+    def __init__(self, controller_id=CONTROLLER_NANO, version="1.1.14",
+                 capabilities=CAP_MULTI_RESPONSE | CAP_CHECKED_PROTOCOL, frame_time=None, frame_jitter=0.1,
+                 reel_frames=None, scan_error_rate=0.0, io_error_rate=0.0, corruption_rate=0.0, bus_speed=400000,
+                 attention=None, seed=None):
+        self.controller_id = controller_id
+        self.version = [int(n) for n in version.split('.')]
+        self.capabilities = capabilities   # Those supported by simulated firmware (0: Old firmware)
+        self.frame_time = frame_time
+        self.frame_jitter = frame_jitter
+        self.reel_frames = reel_frames
+        self.scan_error_rate = scan_error_rate
+        self.io_error_rate = io_error_rate
+        self.corruption_rate = corruption_rate
+        self.bus_speed = bus_speed
+        self.attention = attention
+        self.random = random.Random(seed)
+        self.lock = threading.Condition()
+        self.stats = collections.Counter()
+        self.stopped = False
+        self._reset()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _reset(self):
+        # Power up (or CMD_RESET_CONTROLLER) state
+        self.commands = collections.deque()
+        self.responses = collections.deque()
+        self.read_mode = CMD_GET_CNT_STATUS
+        # Checked protocol
+        self.expected_cmd_seq = None
+        self.cmd_resend_requested = False
+        self.next_rsp_seq = 0
+        self.resend_seq = 0
+        self.rsp_seq_sync = True
+        self.resend_sync = False
+        self.rsp_history = [None] * RSP_HISTORY_SIZE
+        self.rsp_history_count = 0
+        # Controller settings
+        self.is_s8 = True
+        self.min_frame_steps_s8 = min_frame_steps(S8_HEIGHT)
+        self.min_frame_steps_r8 = min_frame_steps(R8_HEIGHT)
+        self.min_frame_steps = self.min_frame_steps_s8
+        self.frame_steps_auto = True
+        self.pt_level_auto = True
+        self.pt_level = PT_LEVEL_S8
+        self.scan_speed = 10
+        self.stall_time = 6
+        self.auto_stop = False
+        self.plotter = False
+        # Controller state
+        self.state = STS_IDLE
+        self.scan_ongoing = False
+        self.vfd_mode = False
+        self.end_scan_notified = False
+        self.stopping = False   # Rewind/fast forward decelerating
+        self.deadline = None    # Time when ongoing action (frame search, advance, wind stop) is done
+        self.action_duration = 0
+        self.action_done = None
+        self.busy = False   # Action blocks controller loop (capstan advance)
+        self.next_tick = 0
+        self.last_tick = time.monotonic()
+        self.pt_signal = 0
+        self.steps_done = 0
+        self.film_position = 0.0  # In frames
+        self.film_end_time = None
+
+    # ----- I2C side (smbus.SMBus methods), called from ControllerLink thread -----
+
+    def _bus_time(self, length):
+        # Address plus command bytes, 9 clocks each
+        time.sleep((length + 2) * 9 / self.bus_speed)
+
+    def _fault(self, kind):
+        if self.io_error_rate > 0 and self.random.random() < self.io_error_rate:
+            self.stats[kind] += 1
+            return True
+        return False
+
+    def write_i2c_block_data(self, address, cmd, data):
+        self._bus_time(1 + len(data))
+        if self._fault('write_errors_lost'):
+            raise OSError(errno.EIO, "Simulated I/O error (command not received)")
+        with self.lock:
+            self._receive([cmd] + list(data))
+            self.lock.notify()
+        if self._fault('write_errors_delivered'):
+            raise OSError(errno.EIO, "Simulated I/O error (command received)")
+
+    def read_i2c_block_data(self, address, cmd, length):
+        self._bus_time(1 + length)
+        if self._fault('read_errors_lost'):
+            raise OSError(errno.EIO, "Simulated I/O error (nothing read)")
+        with self.lock:
+            self._receive([cmd])
+            data = self._send_responses()
+            self.lock.notify()
+        data = (data + [0xFF] * length)[:length]    # Bytes not written by controller read as 0xFF
+        if self.corruption_rate > 0 and self.random.random() < self.corruption_rate:
+            self.stats['corrupted_reads'] += 1
+            data[self.random.randrange(len(data))] ^= 1 << self.random.randrange(8)
+        if self._fault('read_errors_delivered'):     # Responses popped, but not received by caller
+            raise OSError(errno.EIO, "Simulated I/O error (responses lost)")
+        return data
+
+    def write_byte_data(self, address, register, value):
+        self._bus_time(2)     # Bus settings (e.g. I2C clock registers): Nothing to do
+
+    def close(self):
+        self.stop()
+
+    def _receive(self, frame):
+        # Same as firmware receiveEvent
+        cmd = frame[0]
+        param = frame[1] + 256 * frame[2] if len(frame) >= 3 else (frame[1] if len(frame) == 2 else 0)
+        if cmd in (CMD_GET_CNT_STATUS_MULTI, CMD_GET_CNT_STATUS_CHECKED):
+            self.read_mode = cmd
+        elif len(frame) == 5:
+            self.read_mode = CMD_GET_CNT_STATUS
+            if crc8(frame[:4]) != frame[4]:
+                self.cmd_resend_requested = True
+            elif cmd == CMD_RESEND_RESPONSES:
+                self._resend_responses_from(param)
+            else:
+                self._receive_checked_command(cmd, param, frame[3])
+        elif len(frame) > 1 and cmd > 0:
+            self.read_mode = CMD_GET_CNT_STATUS
+            self._push_command(cmd, param)
+        else:
+            self.read_mode = CMD_GET_CNT_STATUS
+
+    def _push_command(self, cmd, param):
+        if len(self.commands) >= QUEUE_SIZE - 1:
+            self.stats['commands_lost'] += 1
+            return False
+        self.commands.append((cmd, param))
+        self.stats['commands'] += 1
+        return True
+
+    def _receive_checked_command(self, cmd, param, seq):
+        if self.expected_cmd_seq is None or (seq & SEQ_SYNC and
+                                             seq & SEQ_MASK != (self.expected_cmd_seq - 1) & SEQ_MASK):
+            self.expected_cmd_seq = seq & SEQ_MASK
+        seq &= SEQ_MASK
+        if seq == self.expected_cmd_seq:
+            if self._push_command(cmd, param):
+                self.expected_cmd_seq = (self.expected_cmd_seq + 1) & SEQ_MASK
+            else:
+                self.cmd_resend_requested = True
+        elif (self.expected_cmd_seq - seq) & SEQ_MASK > SEQ_MASK // 2:
+            self.cmd_resend_requested = True
+        else:
+            self.stats['duplicate_commands'] += 1
+
+    def _resend_responses_from(self, seq):
+        pending = (self.next_rsp_seq - seq) & SEQ_MASK
+        if pending <= self.rsp_history_count:
+            self.resend_seq = seq & SEQ_MASK
+        else:
+            self.resend_seq = (self.next_rsp_seq - self.rsp_history_count) & SEQ_MASK
+            self.resend_sync = True
+        self.stats['resend_requests'] += 1
+        self._update_attention()
+
+    def _next_checked_response(self):
+        if self.resend_seq != self.next_rsp_seq:
+            cmd, p1, p2, seq = self.rsp_history[self.resend_seq % RSP_HISTORY_SIZE]
+            seq = (seq & SEQ_MASK) | (SEQ_SYNC if self.resend_sync else 0)
+            self.resend_sync = False
+            self.resend_seq = (self.resend_seq + 1) & SEQ_MASK
+            self.stats['responses_resent'] += 1
+            return cmd, p1, p2, seq
+        if not self.responses:
+            return None
+        cmd, p1, p2 = self.responses.popleft()
+        if self.rsp_seq_sync:
+            self.next_rsp_seq = self.random.randrange(SEQ_MASK + 1)
+        seq = self.next_rsp_seq | (SEQ_SYNC if self.rsp_seq_sync else 0)
+        self.rsp_history[self.next_rsp_seq % RSP_HISTORY_SIZE] = (cmd, p1, p2, seq)
+        self.rsp_seq_sync = False
+        self.next_rsp_seq = (self.next_rsp_seq + 1) & SEQ_MASK
+        self.resend_seq = self.next_rsp_seq
+        self.rsp_history_count = min(self.rsp_history_count + 1, RSP_HISTORY_SIZE)
+        return cmd, p1, p2, seq
+
+    def _send_responses(self):
+        # Same as firmware sendEvent
+        mode = self.read_mode
+        self.read_mode = CMD_GET_CNT_STATUS
+        data = []
+        if mode == CMD_GET_CNT_STATUS_CHECKED:
+            while len(data) < RSP_CHECKED_MAX:
+                response = self._next_checked_response()
+                if response is None:
+                    break
+                cmd, p1, p2, seq = response
+                message = [cmd, p1 >> 8 & 0xFF, p1 & 0xFF, p2 >> 8 & 0xFF, p2 & 0xFF, seq]
+                data.append(message + [crc8(message)])
+        else:
+            count = RSP_MULTI_MAX if mode == CMD_GET_CNT_STATUS_MULTI else 1
+            while len(data) < count and self.responses:
+                cmd, p1, p2 = self.responses.popleft()
+                data.append([cmd, p1 >> 8 & 0xFF, p1 & 0xFF, p2 >> 8 & 0xFF, p2 & 0xFF])
+        self.stats['responses_sent'] += len(data)
+        self._update_attention()
+        if mode == CMD_GET_CNT_STATUS:
+            return data[0] if data else [0] * 5
+        return [len(data)] + [byte for message in data for byte in message]
+
+    def _update_attention(self):
+        if self.attention is None:
+            return
+        if self.responses or self.resend_seq != self.next_rsp_seq:
+            self.attention.raise_line()
+        else:
+            self.attention.lower_line()
+
+    # ----- Controller side -----
+
+    def _send(self, rsp, param1=0, param2=0):
+        # Same as firmware SendToRPi
+        if len(self.responses) >= QUEUE_SIZE - 1:
+            self.stats['responses_lost'] += 1
+            return
+        self.responses.append((rsp, param1, param2))
+        self._update_attention()
+
+    def _film_present(self):
+        return self.reel_frames is None or self.film_position < self.reel_frames
+
+    def _advance_film(self, frames, now):
+        present = self._film_present()
+        self.film_position += frames
+        if present and not self._film_present():
+            self.film_end_time = now
+
+    def _no_film_detected(self, now):
+        return not self._film_present() and now >= self.film_end_time + self.stall_time
+
+    def _step_time(self):
+        return BASE_SCAN_SPEED_DELAY + (10 - self.scan_speed) * STEP_SCAN_SPEED_DELAY + STEP_OVERHEAD
+
+    def _scan_time(self, steps):
+        # Time to scan a number of steps, including progressive speed decrease before expected frame
+        if self.frame_time is not None:
+            duration = self.frame_time * steps / self.min_frame_steps
+        else:
+            decrease_steps = max(0, steps - (self.min_frame_steps - max(3, 53 - 5 * self.scan_speed)))
+            duration = steps * self._step_time() + sum(min(0.02, DECREASE_SCAN_SPEED_DELAY_STEP * (i + 1))
+                                                       for i in range(decrease_steps))
+        return duration * (1 + self.random.uniform(-self.frame_jitter, self.frame_jitter))
+
+    def _advance_time(self, steps):
+        # Same as firmware capstan_advance: Acceleration and deceleration if more than 20 steps
+        if steps <= 20:
+            return steps * 100e-6
+        middle = steps // 2
+        return sum(50e-6 + min(500, (middle - x if x < middle else steps - x) * 10) * 1e-6 for x in range(steps))
+
+    def _start_action(self, duration, done, busy=False):
+        self.deadline = time.monotonic() + duration
+        self.action_duration = duration
+        self.action_done = done
+        self.busy = busy
+
+    def _search_frame(self, now):
+        # Scan state: Find next frame, either detected or failing after twice the expected steps
+        steps = self.min_frame_steps + self.random.randrange(8)
+        if self._film_present() and self.random.random() >= self.scan_error_rate:
+            self._start_action(self._scan_time(steps), lambda: self._frame_detected(steps))
+        else:
+            self._start_action(self._scan_time(2 * self.min_frame_steps), self._frame_not_detected)
+
+    def _frame_detected(self, steps):
+        now = time.monotonic()
+        self._advance_film(1, now)
+        self.stats['frames'] += 1
+        if self.state == STS_SCAN:
+            self._send(RSP_FRAME_AVAILABLE, steps, self.pt_level)
+        self.state = STS_IDLE
+
+    def _frame_not_detected(self):
+        now = time.monotonic()
+        self._advance_film(2, now)
+        if self.auto_stop and self._no_film_detected(now):
+            self._send(RSP_SCAN_ENDED)
+            self.state = STS_IDLE
+            return
+        if self.state == STS_SINGLE_STEP:
+            self.state = STS_IDLE
+            return
+        self.stats['scan_errors'] += 1
+        self._send(RSP_SCAN_ERROR, 2 * self.min_frame_steps + 1, 2 * self.min_frame_steps)
+        self.state = STS_IDLE
+
+    def _capstan_advance(self, steps):
+        def done():
+            self._advance_film(steps / self.min_frame_steps, time.monotonic())
+            if self.vfd_mode:
+                self._send(RSP_ADVANCE_FRAME_FRACTION, steps)
+        self._start_action(self._advance_time(steps), done, busy=True)
+
+    def _wind(self, cmd, now):
+        # Rewind/fast forward (start, or stop if already winding)
+        state, error, ended = ((STS_REWIND, RSP_REWIND_ERROR, RSP_REWIND_ENDED)
+                               if cmd in (CMD_REWIND, CMD_UNCONDITIONAL_REWIND) else
+                               (STS_FAST_FORWARD, RSP_FAST_FORWARD_ERROR, RSP_FAST_FORWARD_ENDED))
+        if self.state == state:
+            if cmd in (CMD_REWIND, CMD_FAST_FORWARD) and not self.stopping:
+                self.stopping = True
+                self._start_action(WIND_STOP_TIME, lambda: self._wind_ended(ended))
+        elif cmd in (CMD_REWIND, CMD_FAST_FORWARD) and self._film_present():   # Film in film gate
+            self._send(error)
+        else:
+            self.state = state
+            self.stopping = False
+
+    def _wind_ended(self, rsp):
+        self.state = STS_IDLE
+        self.stopping = False
+        self._send(rsp)
+
+    def _command(self, cmd, param, now):
+        # Stateless commands, then depending on state (as firmware loop)
+        if cmd == CMD_RESET_CONTROLLER:
+            self._reset()
+            self._send(RSP_FORCE_INIT)
+            return
+        elif cmd == CMD_ADJUST_MIN_FRAME_STEPS and 80 <= param <= 300:
+            self.min_frame_steps_s8 = min_frame_steps(S8_HEIGHT, param // 10)
+            self.min_frame_steps_r8 = min_frame_steps(R8_HEIGHT, param // 10)
+            self.min_frame_steps = self.min_frame_steps_s8 if self.is_s8 else self.min_frame_steps_r8
+        elif cmd == CMD_SET_PT_LEVEL and 0 <= param <= 900:
+            self.pt_level_auto = param == 0
+            if param != 0:
+                self.pt_level = param
+        elif cmd == CMD_SET_MIN_FRAME_STEPS and (param == 0 or 100 <= param <= 600):
+            self.frame_steps_auto = param == 0
+            if param == 0:
+                self.min_frame_steps = self.min_frame_steps_s8 if self.is_s8 else self.min_frame_steps_r8
+            else:
+                self.min_frame_steps = param
+        elif cmd == CMD_SET_STALL_TIME:
+            self.stall_time = max(1, min(12, param))
+        elif cmd == CMD_SET_SCAN_SPEED and 1 <= param <= 10:
+            self.scan_speed = param
+        elif cmd == CMD_REPORT_PLOTTER_INFO:
+            self.plotter = param != 0
+        elif cmd == CMD_SET_AUTO_STOP:
+            self.auto_stop = param != 0
+        elif cmd == CMD_STOP_SCAN:
+            self.scan_ongoing = False
+            self.state = STS_IDLE
+            self.deadline = None
+            return
+        if self.state == STS_IDLE:
+            if cmd == CMD_VERSION_ID:
+                capabilities = param & self.capabilities & (CAP_MULTI_RESPONSE | CAP_CHECKED_PROTOCOL)
+                self._send(RSP_VERSION_ID, self.version[0] * 256 + (self.controller_id | capabilities),
+                           self.version[1] * 256 + self.version[2])
+            elif cmd == CMD_START_SCAN:
+                self.vfd_mode = param != 0
+                self.scan_ongoing = True
+                self.end_scan_notified = False
+                if not self.vfd_mode:
+                    self.state = STS_SCAN
+                    self._search_frame(now)
+            elif cmd == CMD_GET_NEXT_FRAME:
+                self.state = STS_SCAN
+                self._search_frame(now)
+                if self.pt_level_auto or self.frame_steps_auto:
+                    self._send(RSP_REPORT_AUTO_LEVELS, self.pt_level, self.min_frame_steps)
+            elif cmd in (CMD_SET_REGULAR_8, CMD_SET_SUPER_8):
+                self.is_s8 = cmd == CMD_SET_SUPER_8
+                self.min_frame_steps = self.min_frame_steps_s8 if self.is_s8 else self.min_frame_steps_r8
+                if not self.pt_level_auto:
+                    self.pt_level = PT_LEVEL_S8 if self.is_s8 else PT_LEVEL_R8
+            elif cmd == CMD_SWITCH_REEL_LOCK_STATUS:
+                self.state = STS_UNLOCK_REELS
+            elif cmd == CMD_MANUAL_UV_LED:
+                self.state = STS_MANUAL_UV_LED
+            elif cmd == CMD_FILM_FORWARD:
+                self.state = STS_SLOW_FORWARD
+            elif cmd == CMD_FILM_BACKWARD:
+                self.state = STS_SLOW_BACKWARD
+            elif cmd == CMD_SINGLE_STEP:
+                self.state = STS_SINGLE_STEP
+                self._search_frame(now)
+            elif cmd in (CMD_REWIND, CMD_UNCONDITIONAL_REWIND, CMD_FAST_FORWARD, CMD_UNCONDITIONAL_FAST_FORWARD):
+                self._wind(cmd, now)
+            elif cmd == CMD_ADVANCE_FRAME:
+                self._capstan_advance(self.min_frame_steps)
+            elif cmd == CMD_ADVANCE_FRAME_FRACTION and 1 <= param <= 400:
+                self._capstan_advance(param)
+        elif (self.state, cmd) in ((STS_REWIND, CMD_REWIND), (STS_FAST_FORWARD, CMD_FAST_FORWARD)):
+            self._wind(cmd, now)
+        elif (self.state, cmd) in ((STS_UNLOCK_REELS, CMD_SWITCH_REEL_LOCK_STATUS),
+                                   (STS_MANUAL_UV_LED, CMD_MANUAL_UV_LED), (STS_SLOW_FORWARD, CMD_FILM_FORWARD),
+                                   (STS_SLOW_BACKWARD, CMD_FILM_BACKWARD)):
+            self.state = STS_IDLE
+        # Other commands while scanning a frame are ignored, as in firmware
+
+    def _tick(self, now):
+        # Regular updates: Film moved by slow forward, end of reel, plotter samples
+        elapsed = now - self.last_tick
+        self.last_tick = now
+        if self.state == STS_SLOW_FORWARD:
+            self._advance_film(elapsed / (SLOW_FORWARD_STEP_TIME * self.min_frame_steps), now)
+            if self.auto_stop and self._no_film_detected(now):
+                self.state = STS_IDLE
+                self._send(RSP_FILM_FORWARD_ENDED)
+        if (self.scan_ongoing and self.vfd_mode and self.auto_stop and not self.end_scan_notified and
+                self._no_film_detected(now)):
+            self.end_scan_notified = True
+            self._send(RSP_SCAN_ENDED)
+        if self.plotter and self.state in PT_READ_STATES:
+            self._send(RSP_REPORT_PLOTTER_INFO, self._pt_sample(), self.pt_level)
+
+    def _pt_sample(self):
+        # Phototransistor: Low with film, peak when perforation passes in front of it, flat without film
+        if not self._film_present():
+            return 30 + self.random.randrange(5)
+        phase = self.film_position % 1
+        if self.deadline is not None and self.state in (STS_SCAN, STS_SINGLE_STEP):
+            phase = max(0.0, 1 - (self.deadline - time.monotonic()) / max(0.001, self.action_duration))
+        level = 2.5 * self.pt_level if phase > 0.9 else 0.4 * self.pt_level
+        return int(level + self.random.randrange(-10, 10))
+
+    def _run(self):
+        with self.lock:
+            self._send(RSP_FORCE_INIT)  # Same as firmware on start
+            while not self.stopped:
+                now = time.monotonic()
+                if self.cmd_resend_requested:
+                    self.cmd_resend_requested = False
+                    self._send(RSP_CMD_RESEND, 255 if self.expected_cmd_seq is None else self.expected_cmd_seq)
+                if self.deadline is not None and now >= self.deadline:
+                    done = self.action_done
+                    self.deadline = None
+                    self.busy = False
+                    done()
+                while self.commands and not self.busy:
+                    cmd, param = self.commands.popleft()
+                    self._command(cmd, param, now)
+                if now >= self.next_tick:
+                    self._tick(now)
+                    self.next_tick = now + TICK_INTERVAL
+                wake_time = self.next_tick if self.deadline is None else min(self.next_tick, self.deadline)
+                self.lock.wait(max(0.0, wake_time - time.monotonic()))
+
+    def stats_report(self):
+        return ', '.join(f"{name}: {count}" for name, count in sorted(self.stats.items()))
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.lock.notify()
+        self.thread.join(1)
+        logging.debug(f"ControllerSimulator: {self.stats_report()}")
@@ -0,0 +1,138 @@
+"""
+****************************************************************************************************************
+Class FolderWatcher
+Reports files written to a folder, so that a tool can follow a folder being filled (e.g. FrameChecker following an
+ongoing ALT-Scann8 scan) without listing it again and again.
+- On Linux uses inotify (directly through libc, no extra module required): Files are reported when closed after
+  being written, or when moved into the folder
+- Elsewhere, or if inotify cannot be used, folder is polled: Files are reported when they appear or their
+  modification time changes. A file might be reported while still being written, callers should allow some time
+  for it to settle
+Only files with one of the requested extensions are reported.
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "FolderWatcher"
+__version__ = "1.0.0"
+__date__ = "2025-11-26"
+__version_highlight__ = "FolderWatcher - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify constants (from linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len (name follows)
+
+
+class FolderWatcher:
+    def __init__(self, folder, extensions, poll_interval=1.0):
+        self.folder = folder
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.poll_interval = poll_interval
+        self.inotify_fd = None
+        self.known_files = {}  # Polling only: name -> modification time
+        try:
+            self._init_inotify()
+        except OSError as e:
+            logging.info(f"FolderWatcher: inotify not available ({e}), polling {folder}")
+            self._init_polling()
+
+    @property
+    def uses_inotify(self):
+        return self.inotify_fd is not None
+
+    def _init_inotify(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("Not a Linux system")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(self.folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"inotify_add_watch failed for {self.folder}")
+        self.inotify_fd = fd
+
+    def _init_polling(self):
+        self.known_files = self._list_files()
+        self.last_poll_time = time.time()
+
+    def _list_files(self):
+        files = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(self.extensions):
+                    try:
+                        files[entry.name] = entry.stat().st_mtime_ns
+                    except OSError:     # Removed in the meantime
+                        pass
+        return files
+
+    def _read_events(self):
+        names = set()
+        while True:
+            try:
+                data = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, length = IN_EVENT_HEADER.unpack_from(data, pos)
+                pos += IN_EVENT_HEADER.size
+                name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+                pos += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events lost: Switch to polling, files written since last events will be reported by first poll
+                    logging.warning(f"FolderWatcher: inotify queue overflow, switching to polling {self.folder}")
+                    self.close()
+                    self.known_files = {}
+                    self.last_poll_time = 0
+                    return names
+                if name.lower().endswith(self.extensions):
+                    names.add(name)
+        return names
+
+    def _poll(self):
+        files = self._list_files()
+        names = {name for name, mtime in files.items() if self.known_files.get(name) != mtime}
+        self.known_files = files
+        self.last_poll_time = time.time()
+        return names
+
+    def wait(self, timeout=None):
+        """
+        Wait up to timeout seconds (None: forever) for files to be written. Returns their full paths, sorted (empty
+        list if none)
+        """
+        if self.inotify_fd is not None:
+            readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+            names = self._read_events() if readable else set()
+        else:
+            delay = max(0, self.last_poll_time + self.poll_interval - time.time())
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                return []
+            time.sleep(delay)
+            names = self._poll()
+        return [os.path.join(self.folder, name) for name in sorted(names)]
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
@@ -0,0 +1,298 @@
+"""
+****************************************************************************************************************
+Frame alignment detection, shared by ALT-Scann8 and FrameChecker
+Functions work on stacks of left-edge stripes (N x H x W, grayscale), so that callers checking several frames can
+amortize per-call overhead, with NumPy processing the whole batch at once.
+- frames_centered: Threshold sweep used by FrameChecker (several fixed thresholds tried until hole is centered)
+- frames_centered_otsu: Single Otsu threshold per frame
+Both return NumPy arrays with the centered flag, offset (pixels, -1 if no hole found) and threshold of each frame.
+Single frames go through frame_centered_otsu (one H x W stripe, same results), used by ALT-Scann8 while scanning:
+the batch setup cost makes a stack of one slower than the per-frame path.
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "FrameAlignment"
+__version__ = "1.0.0"
+__date__ = "2025-11-23"
+__version_highlight__ = "FrameAlignment - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import math
+
+import cv2
+import numpy as np
+
+# Thresholds tried by frames_centered, in order: 174 to 244 in steps of 5, then 249 to 254 one by one
+SWEEP_THRESHOLDS = list(range(174, 245, 5)) + list(range(249, 255))
+NO_MATCH_THRESHOLD = 255  # Threshold reported when no hole could be found with any of the sweep thresholds
+
+
+def hole_areas(white_rows, min_gap_size):
+    """
+    Run-length segmentation of the rows flagged as hole (N x H boolean array). Returns frame index, start and end
+    row of each area longer than min_gap_size, ordered by frame and start row. End row of all areas but the last
+    one of each frame is one row before the actual end of the run (as ALT-Scann8 has always computed it).
+    """
+    n, height = white_rows.shape
+    padded = np.zeros((n, height + 1), dtype=np.int8)  # One extra column is enough to separate frames
+    padded[:, 1:] = white_rows
+    edges = np.diff(padded.ravel(), append=0)
+    # Flat positions of starts (0 -> 1) and of last row of each run (1 -> 0), one for each start, frame by frame
+    start_pos = np.flatnonzero(edges == 1)
+    last_pos = np.flatnonzero(edges == -1)
+    if len(start_pos) == 0:     # No white rows at all (e.g. blank or saturated frames)
+        return start_pos, start_pos, start_pos
+    frames = start_pos // (height + 1)
+    starts = start_pos - frames * (height + 1)
+    last_rows = last_pos - frames * (height + 1) - 1
+    is_last = np.append(frames[1:] != frames[:-1], True)
+    ends = np.where(is_last, last_rows, last_rows - 1)
+    keep = last_rows - starts > min_gap_size
+    return frames[keep], starts[keep], ends[keep]
+
+
+def _first_per_frame(frames):
+    # Position of each element within its frame group (frames sorted)
+    if len(frames) == 0:
+        return frames
+    group_start = np.flatnonzero(np.append(True, frames[1:] != frames[:-1]))
+    group_sizes = np.diff(np.append(group_start, len(frames)))
+    return np.arange(len(frames)) - np.repeat(group_start, group_sizes)
+
+
+def stripe_hole_areas(white_rows, min_gap_size):
+    # Single stripe version of hole_areas (H boolean array): Start and end row of each area
+    edges = np.diff(np.concatenate(([0], white_rows.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    last_rows = np.flatnonzero(edges == -1) - 1
+    keep = last_rows - starts > min_gap_size
+    ends = last_rows.copy()
+    ends[:-1] -= 1
+    return starts[keep], ends[keep]
+
+
+def _offsets(result, height, threshold, v_shift=0):
+    middle = height // 2 + v_shift
+    margin = height * threshold // 100
+    found = result != 0
+    centered = found & (result >= middle - margin) & (result <= middle + margin)
+    offsets = np.where(found, result - middle, -1)
+    return centered, offsets
+
+
+def frames_centered_otsu(stripes, film_type='S8', threshold=10, v_shift=0):
+    """
+    Binarize each stripe with its own Otsu threshold, and take the biggest of the first two hole areas (rows with
+    any white pixel for S8, with no white pixel for R8). Hole center must be within threshold (% of frame height)
+    of the frame middle, displaced v_shift pixels.
+    """
+    n, height = stripes.shape[:2]
+    if n == 1:
+        centered, offset, otsu_threshold = frame_centered_otsu(stripes[0], film_type, threshold, v_shift)
+        return np.array([centered]), np.array([offset]), np.array([otsu_threshold], dtype=np.int32)
+    binary = np.empty(stripes.shape, dtype=np.uint8)
+    thresholds = np.empty(n, dtype=np.int32)
+    for i in range(n):  # Otsu threshold is specific to each stripe
+        thresholds[i], binary[i] = cv2.threshold(stripes[i], 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    white_rows = np.any(binary, axis=2)
+    if film_type != 'S8':
+        white_rows = ~white_rows
+
+    min_gap_size = int(height * 0.08)  # minimum hole height is around 8% of the frame height
+    frames, starts, ends = hole_areas(white_rows, min_gap_size)
+    if len(frames) == 0:    # No hole found in any stripe
+        centered, offsets = _offsets(np.zeros(n, dtype=np.int64), height, threshold, v_shift)
+        return centered, offsets, thresholds
+
+    # Biggest of the first two areas of each frame (first one if same size)
+    first = np.append(True, frames[1:] != frames[:-1])
+    second = np.append(False, ~first[1:] & first[:-1])
+    sizes = np.zeros((2, n), dtype=np.int64)
+    centers = np.zeros((2, n), dtype=np.int64)
+    for r, selected in enumerate((first, second)):
+        sizes[r, frames[selected]] = ends[selected] - starts[selected]
+        centers[r, frames[selected]] = (starts[selected] + ends[selected]) // 2
+    best = (sizes[1] > sizes[0]).astype(np.int64)
+    best_size = sizes[best, np.arange(n)]
+    result = np.where(best_size > 0, centers[best, np.arange(n)], 0)
+
+    centered, offsets = _offsets(result, height, threshold, v_shift)
+    return centered, offsets, thresholds
+
+
+def frame_centered_otsu(stripe, film_type='S8', threshold=10, v_shift=0):
+    """
+    Single stripe (H x W) version of frames_centered_otsu, same results. Returns centered flag, offset (-1 if no hole
+    found) and Otsu threshold
+    """
+    height = stripe.shape[0]
+    otsu_threshold, binary = cv2.threshold(stripe, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    white_rows = np.any(binary, axis=1)
+    if film_type != 'S8':
+        white_rows = ~white_rows
+    starts, ends = stripe_hole_areas(white_rows, int(height * 0.08))
+
+    # Biggest of the first two areas (first one if same size)
+    result = 0
+    if len(starts) > 0:
+        sizes = ends[:2] - starts[:2]
+        bigger = int(np.argmax(sizes))
+        if sizes[bigger] > 0:
+            result = int((starts[bigger] + ends[bigger]) // 2)
+    if result == 0:
+        return False, -1, int(otsu_threshold)
+    middle = height // 2 + v_shift
+    margin = height * threshold // 100
+    return middle - margin <= result <= middle + margin, result - middle, int(otsu_threshold)
+
+
+def _sweep_areas(white_rows, film_type):
+    """
+    Hole areas for threshold sweep: Rows flagged as hole separated by less than min_gap_size rows belong to the same
+    area (noise in the stripe). Returns, for each frame, center of the area with more rows (0 if none big enough)
+    and number of gaps found.
+    """
+    n, height = white_rows.shape
+    min_area_size = int(height * 0.1 if film_type == 'S8' else height * 0.4)
+    min_gap_size = min_area_size // 2
+    frames, rows = np.nonzero(white_rows)
+    result = np.zeros(n, dtype=np.int64)
+    if len(rows) == 0:
+        return result, np.zeros(n, dtype=np.int64)
+    same_frame = frames[1:] == frames[:-1]
+    gaps = same_frame & (np.diff(rows) > min_gap_size)
+    gap_count = np.bincount(frames[1:][gaps], minlength=n)
+    new_area = np.append(True, ~same_frame | gaps)
+    area_start = np.flatnonzero(new_area)
+    area_size = np.diff(np.append(area_start, len(rows)))
+    area_frame = frames[area_start]
+    area_first = rows[area_start]
+    area_last = rows[np.append(area_start[1:], len(rows)) - 1]
+    big = area_size > min_area_size
+    area_frame, area_size = area_frame[big], area_size[big]
+    area_center = (area_first[big] + area_last[big]) // 2
+    # Biggest area of each frame, first one if several with the same size
+    order = np.lexsort((np.arange(len(area_size)), -area_size, area_frame))
+    first = order[_first_per_frame(area_frame[order]) == 0]
+    result[area_frame[first]] = area_center[first]
+    return result, gap_count
+
+
+def _row_levels(stripes, film_type, slice_width):
+    """
+    Per-row intensity level computed once for all thresholds: A row is part of a hole for threshold t if its level
+    is > t (S8, more than 75% of slice_width pixels above t) or <= t (R8, less than 25% of pixels above t).
+    Level is the k-th highest pixel of the row, k being the number of pixels above t required.
+    """
+    n, height, width = stripes.shape
+    if film_type == 'S8':
+        required = math.floor(slice_width * 0.75) + 1
+    else:
+        required = math.ceil(slice_width * 0.25)
+    if required > width:    # Stripe narrower than slice_width: S8 rows never white, R8 rows always black
+        return np.full((n, height), -1, dtype=np.int16)
+    return np.partition(stripes, width - required, axis=2)[:, :, width - required].astype(np.int16)
+
+
+def _sweep_rows(levels, sweep, film_type):
+    # Hole rows for each threshold in sweep (threshold x frame x row)
+    if film_type == 'S8':
+        return levels[np.newaxis] > sweep[:, np.newaxis, np.newaxis]
+    return levels[np.newaxis] <= sweep[:, np.newaxis, np.newaxis]
+
+
+def _sweep_select(is_centered, result, gap_count, save_gaps):
+    """
+    Sweep decision from per threshold results (threshold x frame): Sweep stops at first threshold giving a centered
+    hole. Otherwise, candidate is the last threshold tried with the minimum number of gaps, if not more than the gaps
+    of the candidate saved so far (same result as trying thresholds one by one). Returns, for each frame, whether
+    a centered threshold was found, its position, whether candidate improved, its position and gaps.
+    """
+    count = is_centered.shape[0]
+    found = is_centered.any(axis=0)
+    first_centered = np.where(found, is_centered.argmax(axis=0), count)
+    tried = np.arange(count)[:, np.newaxis] < first_centered
+    candidate_gaps = np.where(tried & (result != 0), gap_count.astype(np.int64), np.iinfo(np.int64).max)
+    min_gaps = candidate_gaps.min(axis=0)
+    improved = ~found & (min_gaps <= save_gaps)
+    last_candidate = count - 1 - (candidate_gaps == min_gaps)[::-1].argmax(axis=0)
+    return found, first_centered, improved, last_candidate, min_gaps
+
+
+def sweep_profiles(stripes, film_type='S8', slice_width=None):
+    """
+    Detection profile of each stripe: Hole center (0 if none) and number of gaps for every threshold in
+    SWEEP_THRESHOLDS (threshold x frame arrays). Does not depend on tolerance, so it can be stored and evaluated
+    later for any tolerance with evaluate_sweep, without going back to the images.
+    """
+    n, height, width = stripes.shape
+    if slice_width is None:
+        slice_width = width
+    sweep = np.array(SWEEP_THRESHOLDS)
+    white_rows = _sweep_rows(_row_levels(stripes, film_type, slice_width), sweep, film_type)
+    result, gap_count = _sweep_areas(white_rows.reshape(len(sweep) * n, height), film_type)
+    return result.reshape(len(sweep), n), gap_count.reshape(len(sweep), n)
+
+
+def evaluate_sweep(result, gap_count, height, threshold=10):
+    """
+    Same output as frames_centered, from profiles returned by sweep_profiles. height can be a single value or an
+    array with the height of each frame.
+    """
+    n = result.shape[1]
+    sweep = np.array(SWEEP_THRESHOLDS)
+    is_centered, off_center = _offsets(result, np.asarray(height), threshold)
+    found, first_centered, improved, last_candidate, min_gaps = _sweep_select(is_centered, result, gap_count,
+                                                                              np.full(n, 10))
+    frame_idx = np.arange(n)
+    offsets = np.where(improved, off_center[last_candidate, frame_idx], -1)
+    offsets[found] = 0
+    thresholds = np.where(improved, sweep[last_candidate], NO_MATCH_THRESHOLD)
+    thresholds[found] = sweep[first_centered[found]]
+    return found, offsets, thresholds
+
+
+def frames_centered(stripes, film_type='S8', threshold=10, slice_width=None):
+    """
+    Threshold sweep: For each frame, thresholds in SWEEP_THRESHOLDS are tried until the hole (rows with more than
+    75% white pixels for S8, less than 25% for R8) is centered within threshold (% of frame height). If none
+    gives a centered hole, result for the threshold with less gaps in the hole area is returned (not centered).
+    slice_width (used to compute the % of white pixels) defaults to stripe width.
+    Stripes are read only once, thresholds are evaluated from per-row levels (see _row_levels): First threshold
+    alone (most frames are centered with it), then all remaining ones together for the frames still pending.
+    """
+    n, height, width = stripes.shape
+    if slice_width is None:
+        slice_width = width
+    levels = _row_levels(stripes, film_type, slice_width)
+    centered = np.zeros(n, dtype=bool)
+    offsets = np.full(n, -1, dtype=np.int64)
+    thresholds = np.full(n, NO_MATCH_THRESHOLD, dtype=np.int64)
+    save_gaps = np.full(n, 10, dtype=np.int64)  # Candidate (not centered) with less gaps wins, ideally zero
+    pending = np.arange(n)
+    for sweep in (SWEEP_THRESHOLDS[:1], SWEEP_THRESHOLDS[1:]):
+        if len(pending) == 0:
+            break
+        sweep = np.array(sweep)
+        white_rows = _sweep_rows(levels if len(pending) == n else levels[pending], sweep, film_type)
+        # Threshold x frame results, segmentation done for all of them in a single call
+        result, gap_count = _sweep_areas(white_rows.reshape(len(sweep) * len(pending), height), film_type)
+        result = result.reshape(len(sweep), len(pending))
+        gap_count = gap_count.reshape(len(sweep), len(pending))
+        is_centered, off_center = _offsets(result, height, threshold)
+        found, first_centered, improved, last_candidate, min_gaps = _sweep_select(is_centered, result, gap_count,
+                                                                                  save_gaps[pending])
+        centered[pending[found]] = True
+        offsets[pending[found]] = 0
+        thresholds[pending[found]] = sweep[first_centered[found]]
+        frames = pending[improved]
+        offsets[frames] = off_center[last_candidate[improved], improved.nonzero()[0]]
+        thresholds[frames] = sweep[last_candidate[improved]]
+        save_gaps[frames] = min_gaps[improved]
+        pending = pending[~found]
+    return centered, offsets, thresholds
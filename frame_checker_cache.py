@@ -0,0 +1,116 @@
+"""
+****************************************************************************************************************
+Class FrameCheckerCache
+Persistent cache of FrameChecker results, one per folder, so that checking again a reel already checked (e.g. with a
+different tolerance) does not need to load the images again.
+- Entries are keyed by file name, and validated against file size and modification time: A file modified since it
+  was checked (or a new file with the same name) is considered as not cached, and its entry is replaced
+- What is stored is the detection profile of each frame (hole center and gaps for every sweep threshold, see
+  frame_alignment.sweep_profiles), not the final decision, as it does not depend on the tolerance
+- Detection parameters (film type, stripe position, fast load, sweep thresholds) are stored with the cache. If they
+  change, the whole cache is discarded
+- Cache is saved as a hidden NumPy file in the folder itself. If the folder is not writable, cache is not saved
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "FrameCheckerCache"
+__version__ = "1.0.0"
+__date__ = "2025-11-24"
+__version_highlight__ = "FrameCheckerCache - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import json
+import logging
+import os
+
+import numpy as np
+
+CACHE_FILENAME = '.FrameChecker-cache.npz'
+CACHE_FORMAT = 1
+
+
+class FrameCheckerCache:
+    def __init__(self, folder, params):
+        self.folder = folder
+        self.cache_file = os.path.join(folder, CACHE_FILENAME)
+        # Detection parameters cache is valid for (dict, JSON serializable)
+        self.params = dict(params, format=CACHE_FORMAT)
+        self.entries = {}  # name -> (size, mtime_ns, height, scale, results, gaps)
+        self.modified = False
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as data:
+                if json.loads(str(data['params'])) != self.params:
+                    logging.info(f"FrameCheckerCache: Parameters changed, discarding {self.cache_file}")
+                    self.modified = True
+                    return
+                # Each access to data reads the array from file again: Read them once
+                columns = [data[key] for key in ('sizes', 'mtimes', 'heights', 'scales')]
+                columns = [column.tolist() for column in columns] + [data['results'], data['gaps']]
+                for name, *entry in zip(data['names'].tolist(), *columns):
+                    self.entries[name] = tuple(entry)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"FrameCheckerCache: Cannot load {self.cache_file}, ignored: {e}")
+            self.entries = {}
+            self.modified = True
+
+    @staticmethod
+    def _file_id(image_path):
+        st = os.stat(image_path)
+        return st.st_size, st.st_mtime_ns
+
+    def lookup(self, image_path):
+        """
+        Returns (height, scale, results, gaps) stored for image_path, or None if not cached or file changed since
+        """
+        entry = self.entries.get(os.path.basename(image_path))
+        if entry is None:
+            return None
+        try:
+            if self._file_id(image_path) != entry[:2]:
+                return None
+        except OSError:
+            return None
+        return entry[2:]
+
+    def store(self, image_path, height, scale, results, gaps):
+        try:
+            size, mtime_ns = self._file_id(image_path)
+        except OSError:
+            return
+        self.entries[os.path.basename(image_path)] = (size, mtime_ns, height, scale, np.asarray(results),
+                                                      np.asarray(gaps))
+        self.modified = True
+
+    def save(self):
+        # Entries of files no longer in folder are dropped. Written to temporary file first, then renamed
+        if not self.modified:
+            return
+        names = [name for name in self.entries if os.path.exists(os.path.join(self.folder, name))]
+        entries = [self.entries[name] for name in names]
+        temp_file = self.cache_file + '.tmp.npz'
+        try:
+            np.savez(temp_file, params=json.dumps(self.params), names=np.array(names, dtype=str),
+                     sizes=np.array([e[0] for e in entries], dtype=np.int64),
+                     mtimes=np.array([e[1] for e in entries], dtype=np.int64),
+                     heights=np.array([e[2] for e in entries], dtype=np.int32),
+                     scales=np.array([e[3] for e in entries], dtype=np.int32),
+                     results=np.array([e[4] for e in entries], dtype=np.int32).reshape(len(entries), -1)
+                     if entries else np.zeros((0, 0), dtype=np.int32),
+                     gaps=np.array([e[5] for e in entries], dtype=np.int32).reshape(len(entries), -1)
+                     if entries else np.zeros((0, 0), dtype=np.int32))
+            os.replace(temp_file, self.cache_file)
+            self.modified = False
+        except OSError as e:
+            logging.warning(f"FrameCheckerCache: Cannot save {self.cache_file}: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
@@ -0,0 +1,110 @@
+"""
+****************************************************************************************************************
+Class FrameTracer
+Records how long each stage of each frame takes (controller wait, AE/AWB waits, capture, queue waits, encode,
+write, alignment check, display...), as spans tagged with frame number and thread, so that where the time of a
+frame goes can be seen on a timeline.
+- Spans are kept in a ring buffer of fixed size (oldest ones overwritten), recording one costs a tuple and a list
+  store, no locks. When disabled, span/add do nothing
+- Spans can be recorded with 'with tracer.span(name, frame):', or with add(name, frame, start[, end]) when start
+  (and end) times, from time.perf_counter(), were taken anyway
+- Intervals starting in one thread and ending in another (e.g. waiting in a queue) use begin(key)/end(key, ...)
+- export() writes the spans as a Chrome trace file (JSON), to be opened with Perfetto (ui.perfetto.dev) or
+  chrome://tracing
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "FrameTracer"
+__version__ = "1.0.0"
+__date__ = "2025-12-04"
+__version_highlight__ = "FrameTracer - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'frame', 'start')
+
+    def __init__(self, tracer, name, frame):
+        self.tracer = tracer
+        self.name = name
+        self.frame = frame
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.tracer.add(self.name, self.frame, self.start)
+
+
+class FrameTracer:
+    def __init__(self, size=100000, enabled=False):
+        self.size = size
+        self.enabled = enabled
+        self.clear()
+
+    def clear(self):
+        self.events = [None] * self.size
+        self.counter = itertools.count()   # next() is atomic: Threads never get the same slot
+        self.thread_names = {}
+        self.pending = {}   # begin/end: key -> start time
+
+    def span(self, name, frame=None):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, frame)
+
+    def add(self, name, frame, start, end=None):
+        if not self.enabled:
+            return
+        if end is None:
+            end = time.perf_counter()
+        thread_id = threading.get_ident()
+        if thread_id not in self.thread_names:
+            self.thread_names[thread_id] = threading.current_thread().name
+        self.events[next(self.counter) % self.size] = (name, frame, thread_id, start, end)
+
+    def begin(self, key):
+        if self.enabled:
+            self.pending[key] = time.perf_counter()
+
+    def end(self, key, name, frame=None):
+        start = self.pending.pop(key, None)
+        if start is not None:
+            self.add(name, frame, start)
+
+    def spans(self):
+        # Spans recorded (those still in the buffer), oldest first
+        return sorted((event for event in self.events if event is not None), key=lambda event: event[3])
+
+    def export(self, filename):
+        """
+        Write spans recorded as a Chrome trace file. Returns number of spans written
+        """
+        spans = self.spans()
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id, 'args': {'name': name}}
+                 for thread_id, name in list(self.thread_names.items())]
+        for name, frame, thread_id, start, end in spans:
+            event = {'name': name, 'cat': 'frame', 'ph': 'X', 'pid': pid, 'tid': thread_id,
+                     'ts': round(start * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+            if frame is not None:
+                event['args'] = {'frame': frame}
+            trace.append(event)
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(spans)
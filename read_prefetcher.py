@@ -0,0 +1,98 @@
+"""
+****************************************************************************************************************
+Class ReadPrefetcher
+Readahead of files processed one by one (FrameChecker analysis, simulated scan): A background thread reads the
+content of upcoming files while the consumer decodes the current one, so that the consumer does not wait on I/O
+latency (network shares, USB disks) before each file.
+- Files are returned in the same order as given, as (path, bytes). Paths can be any iterable, even endless
+- Readahead is bounded by number of files (depth) and by memory used by buffered content (max_bytes). A file is
+  always read when the buffer is empty, so that a file larger than max_bytes cannot block forever
+- Files that cannot be read are returned with None as content, consumer decides how to handle them (e.g. reading
+  them directly to get the actual error)
+- Keeps some statistics: Number of times the consumer had to wait for a file, and total time waited
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "ReadPrefetcher"
+__version__ = "1.0.0"
+__date__ = "2025-11-25"
+__version_highlight__ = "ReadPrefetcher - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import collections
+import logging
+import threading
+import time
+
+
+class ReadPrefetcher:
+    def __init__(self, paths, depth=4, max_bytes=256 * 2**20):
+        self.paths = iter(paths)
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.buffer = collections.deque()  # (path, content)
+        self.bytes_buffered = 0
+        self.waits = 0
+        self.wait_time = 0
+        self.files_read = 0
+        self.exhausted = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
+        self.reader_thread.start()
+
+    def _is_full(self):
+        return len(self.buffer) >= self.depth or (self.bytes_buffered > 0 and self.bytes_buffered >= self.max_bytes)
+
+    def _reader_loop(self):
+        for path in self.paths:
+            with self.condition:
+                while not self.closed and self._is_full():
+                    self.condition.wait()
+                if self.closed:
+                    return
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+            except OSError as e:
+                logging.debug(f"ReadPrefetcher: Cannot read {path}: {e}")
+                content = None
+            with self.condition:
+                self.buffer.append((path, content))
+                self.bytes_buffered += len(content) if content is not None else 0
+                self.files_read += 1
+                self.condition.notify_all()
+        with self.condition:
+            self.exhausted = True
+            self.condition.notify_all()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.condition:
+            if not self.buffer and not self.exhausted and not self.closed:
+                start_time = time.time()
+                while not self.buffer and not self.exhausted and not self.closed:
+                    self.condition.wait()
+                self.waits += 1
+                self.wait_time += time.time() - start_time
+            if not self.buffer:
+                raise StopIteration
+            path, content = self.buffer.popleft()
+            self.bytes_buffered -= len(content) if content is not None else 0
+            self.condition.notify_all()
+        return path, content
+
+    def close(self):
+        # Stop reading ahead, buffered content is discarded
+        with self.condition:
+            self.closed = True
+            self.buffer.clear()
+            self.bytes_buffered = 0
+            self.condition.notify_all()
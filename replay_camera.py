@@ -0,0 +1,524 @@
+"""
+****************************************************************************************************************
+Class ReplayCamera
+Stand-in for Picamera2, serving frames from a folder of images (or generated ones), so that the capture path of
+ALT-Scann8 (capture, capture_hdr, save and display threads) can run, and be profiled, without a Raspberry Pi camera.
+Only the subset of Picamera2 used by ALT-Scann8 is implemented: create_still/preview_configuration, configure,
+start, stop, switch_mode, switch_mode_and_capture_file, set_controls, capture_image, capture_array,
+capture_metadata, capture_request (returning requests with make_image, make_array, save_dng, get_metadata and
+release), sensor_modes, options. Also provides replacements for the libcamera/picamera2 helpers used with it
+(controls, Transform, MappedArray).
+- Sensor runs at the frame rate of the selected sensor mode (or readout_time, if given), slowed down by exposure
+  time when longer. Captures return the next frame completed after the call, waiting for it as a real camera does
+- Auto exposure and auto white balance converge towards a target over several frames (ae_speed/awb_speed), target
+  depending on the brightness of each source frame. Controls set take effect some frames later (CONTROL_LATENCY).
+  Metadata reports the values of each frame, so waits for AE/AWB to settle behave as with a real camera
+- Requests hold one of the configured buffers (buffer_count) until released: When all are held, captures wait for
+  one to be released, as Picamera2 does. Buffer waits and request lifetimes are reported in statistics
+- Frames are decoded (or generated) once, at the configured size, and kept in a pool within a memory budget
+  (pool_budget_mb, per configuration), then served in a loop. Image brightness is scaled by exposure, so that
+  bracketed HDR captures differ
+- save_dng writes a DNG with PiDNG, as Picamera2 does (compressed if options['compress_level'] is set), so that DNG
+  save timings are those of a real camera. Some PiDNG builds fail to compress: DNGs are then written uncompressed.
+  If PiDNG is not installed, it writes the raw Bayer data as an uncompressed 16 bit TIFF instead (same size, not a
+  DNG): Save timings of DNG files are then not representative. dng_writer tells which one is used
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "ReplayCamera"
+__version__ = "1.0.0"
+__date__ = "2025-12-02"
+__version_highlight__ = "ReplayCamera - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import enum
+import logging
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from PIL import Image
+
+try:
+    from pidng.camdefs import Picamera2Camera
+    from pidng.core import PICAM2DNG
+    pidng_loaded = True
+except ImportError:
+    pidng_loaded = False
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+CONTROL_LATENCY = 2     # Frames until a control set takes effect
+STARTUP_FRAMES = 3      # Frames dropped when camera is started
+NOMINAL_EXPOSURE = 8000     # Exposure (us) for a source frame of average brightness
+NOMINAL_BRIGHTNESS = 110
+NOMINAL_GAINS = (2.4, 1.9)  # Red, blue
+BLACK_LEVEL = 4096          # Sensor black level, 16 bit scale (HQ camera: 256 at 12 bit)
+# Colour correction matrix reported with every frame (HQ camera, around 5000K)
+COLOUR_CORRECTION_MATRIX = (1.80, -0.56, -0.24, -0.33, 1.68, -0.35, -0.05, -0.62, 1.67)
+
+
+class SensorFormat(str):
+    # Picamera2 sensor mode format: Printed as a string, with the name also available as 'format'
+    @property
+    def format(self):
+        return str(self)
+
+
+# Raspberry Pi HQ camera
+HQ_SENSOR_MODES = [
+    {'bit_depth': 10, 'crop_limits': (696, 528, 2664, 1980), 'exposure_limits': (31, 667234896, None),
+     'format': SensorFormat('SRGGB10_CSI2P'), 'fps': 120.05, 'size': (1332, 990), 'unpacked': 'SRGGB10'},
+    {'bit_depth': 12, 'crop_limits': (0, 440, 4056, 2160), 'exposure_limits': (60, 674181621, None),
+     'format': SensorFormat('SRGGB12_CSI2P'), 'fps': 50.03, 'size': (2028, 1080), 'unpacked': 'SRGGB12'},
+    {'bit_depth': 12, 'crop_limits': (0, 0, 4056, 3040), 'exposure_limits': (60, 674181621, None),
+     'format': SensorFormat('SRGGB12_CSI2P'), 'fps': 40.01, 'size': (2028, 1520), 'unpacked': 'SRGGB12'},
+    {'bit_depth': 12, 'crop_limits': (0, 0, 4056, 3040), 'exposure_limits': (114, 694422939, None),
+     'format': SensorFormat('SRGGB12_CSI2P'), 'fps': 10.0, 'size': (4056, 3040), 'unpacked': 'SRGGB12'}]
+
+# Same names as libcamera controls enums (values are not relevant here)
+controls = SimpleNamespace(
+    AeConstraintModeEnum=enum.IntEnum('AeConstraintModeEnum', 'Normal Highlight Shadows Custom', start=0),
+    AeMeteringModeEnum=enum.IntEnum('AeMeteringModeEnum', 'CentreWeighted Spot Matrix Custom', start=0),
+    AeExposureModeEnum=enum.IntEnum('AeExposureModeEnum', 'Normal Short Long Custom', start=0),
+    AwbModeEnum=enum.IntEnum('AwbModeEnum', 'Auto Incandescent Tungsten Fluorescent Indoor Daylight Cloudy Custom',
+                             start=0))
+
+
+class Transform:
+    def __init__(self, hflip=False, vflip=False):
+        self.hflip = hflip
+        self.vflip = vflip
+
+
+class MappedArray:
+    # Access to a request buffer without copying it
+    def __init__(self, request, stream, write=False):
+        self.request = request
+        self.stream = stream
+
+    def __enter__(self):
+        self.array = self.request._buffer(self.stream)
+        return self
+
+    def __exit__(self, *args):
+        self.array = None
+
+
+class ReplayRequest:
+    def __init__(self, camera, frame, metadata):
+        self.camera = camera
+        self.frame = frame  # Index in camera pool
+        self.metadata = metadata
+        self.config = camera.config
+        self.acquired_time = time.perf_counter()
+        self.released = False
+        self.buffers = {}
+
+    def _buffer(self, name):
+        # Stream content, built on first use
+        if name not in self.buffers:
+            self.buffers[name] = self.camera._stream_array(name, self.frame, self.metadata)
+        return self.buffers[name]
+
+    def make_array(self, name):
+        return self._buffer(name).copy()
+
+    def make_image(self, name):
+        return Image.fromarray(self._buffer(name))
+
+    def get_metadata(self):
+        return dict(self.metadata)
+
+    def save_dng(self, filename, name="raw"):
+        raw = self._buffer('raw')
+        if pidng_loaded:
+            # Same as Picamera2: Raw unpacked to 16 bit words, format tells the bit depth
+            height, width = raw.shape
+            fmt = {'size': (width, height), 'stride': width * 2, 'format': self.camera.mode['unpacked']}
+            dng = PICAM2DNG(Picamera2Camera(fmt, self.metadata))
+            compress = self.camera.options.get('compress_level', 0) and self.camera.dng_writer != 'PiDNG uncompressed'
+            dng.options(compress=compress)
+            try:
+                dng.convert(raw.view(np.uint8), filename)    # Bytes, as in a Picamera2 buffer
+            except SystemError as e:    # Lossless JPEG encoder (C extension) of some PiDNG builds
+                if not compress:
+                    raise
+                logging.warning(f"ReplayCamera: PiDNG cannot compress ({e}), DNG files written uncompressed")
+                self.camera.dng_writer = 'PiDNG uncompressed'
+                dng.options(compress=False)
+                dng.convert(raw.view(np.uint8), filename)
+            return
+        ok, data = cv2.imencode('.tiff', raw, [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+        if not ok:
+            raise OSError(f"Cannot encode raw data for {filename}")
+        with open(filename, 'wb') as f:
+            f.write(data)
+
+    def release(self):
+        if self.released:
+            logging.warning("ReplayCamera: Request released twice")
+            return
+        self.released = True
+        self.buffers = {}
+        self.camera._release_buffer(time.perf_counter() - self.acquired_time)
+
+
+class ReplayCamera:
+    def __init__(self, folder=None, sensor_modes=None, readout_time=None, ae_speed=0.25, awb_speed=0.2,
+                 pool_budget_mb=512, seed=None):
+        self.folder = folder    # None: Generated frames
+        self.sensor_modes = sensor_modes if sensor_modes is not None else HQ_SENSOR_MODES
+        self.readout_time = readout_time
+        self.ae_speed = ae_speed
+        self.awb_speed = awb_speed
+        self.pool_budget = pool_budget_mb * 2**20
+        self.random = np.random.default_rng(seed)
+        self.camera_properties = {'Model': 'replay', 'PixelArraySize': max(m['size'] for m in self.sensor_modes)}
+        self.options = {'quality': 90, 'compress_level': 1}
+        self.dng_writer = 'PiDNG' if pidng_loaded else 'TIFF'  # What save_dng writes (see module description)
+        self._preview = None
+        self.lock = threading.Condition()
+        self.config = None
+        self.started = False
+        self.mode = None
+        self.pool = []      # Source frames at main size (RGB)
+        self.pool_brightness = []
+        self.raw_pool = {}  # Frame index -> Bayer raw array, built on demand
+        self.pools = {}     # Last pools loaded (two at most, so that switching mode back and forth is cheap)
+        self.source_files = []
+        if folder is not None:
+            self.source_files = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                                       if name.lower().endswith(IMAGE_EXTENSIONS))
+            if not self.source_files:
+                raise OSError(f"No images to replay in {folder}")
+        # Sensor and control state
+        self.controls_set = {}
+        self.pending_controls = []  # (frame index, controls)
+        self.frame_index = 0
+        self.next_frame_time = 0
+        self.exposure = NOMINAL_EXPOSURE
+        self.analogue_gain = 1.0
+        self.gains = NOMINAL_GAINS
+        self.ae_enable = True
+        self.awb_enable = True
+        self.free_buffers = 0
+        self.held_buffers = 0
+        self.stats = {'frames': 0, 'captures': 0, 'buffer_waits': 0, 'buffer_wait_time': 0.0, 'frame_wait_time': 0.0,
+                      'requests': 0, 'max_held': 0, 'request_time': 0.0, 'max_request_time': 0.0}
+
+    # ----- Configuration -----
+
+    def _create_configuration(self, main, lores, raw, transform, buffer_count, controls):
+        config = {'main': {'size': (1280, 960), 'format': 'BGR888'}, 'lores': None, 'raw': None,
+                  'transform': transform or Transform(), 'buffer_count': buffer_count,
+                  'controls': dict(controls or {})}
+        config['main'].update(main or {})
+        if lores is not None:
+            config['lores'] = {'size': (320, 240), 'format': 'YUV420'}
+            config['lores'].update(lores)
+        if raw is not None:
+            config['raw'] = {'size': config['main']['size']}
+            config['raw'].update(raw)
+        return config
+
+    def create_still_configuration(self, main=None, lores=None, raw=None, transform=None, buffer_count=1,
+                                   controls=None, **kwargs):
+        return self._create_configuration(main, lores, raw, transform, buffer_count, controls)
+
+    def create_preview_configuration(self, main=None, lores=None, raw=None, transform=None, buffer_count=4,
+                                     controls=None, **kwargs):
+        return self._create_configuration(main, lores, raw, transform, buffer_count, controls)
+
+    def configure(self, config):
+        if self.started:
+            raise RuntimeError("Camera must be stopped before configuring")
+        with self.lock:
+            if self.held_buffers > 0:
+                logging.warning(f"ReplayCamera: Reconfigured with {self.held_buffers} requests not released")
+            self.config = config
+            self.mode = self._select_mode(config)
+            self.free_buffers = max(1, config.get('buffer_count', 1))
+            self.held_buffers = 0
+            self.controls_set.update(config.get('controls', {}))
+            self._load_pool(tuple(config['main']['size']))
+
+    def _select_mode(self, config):
+        # Smallest sensor mode covering requested size (raw if given, main otherwise), as libcamera does
+        size = (config['raw'] or config['main'])['size']
+        modes = sorted(self.sensor_modes, key=lambda m: m['size'][0] * m['size'][1])
+        for mode in modes:
+            if mode['size'][0] >= size[0] and mode['size'][1] >= size[1]:
+                return mode
+        return modes[-1]
+
+    def _load_pool(self, size):
+        key = (size, self.mode['size'])
+        if key in self.pools:
+            self.pool, self.pool_brightness, self.raw_pool = self.pools[key]
+            return
+        width, height = size
+        frame_bytes = width * height * 3
+        raw_width, raw_height = self.mode['size']
+        count = max(1, min(16, self.pool_budget // (frame_bytes + raw_width * raw_height * 2)))
+        start = time.perf_counter()
+        self.pool = []
+        self.raw_pool = {}
+        if self.source_files:
+            step = max(1, len(self.source_files) // count)
+            for path in self.source_files[::step][:count]:
+                image = cv2.imread(path, cv2.IMREAD_COLOR)
+                if image is None:
+                    logging.warning(f"ReplayCamera: Cannot read {path}, skipped")
+                    continue
+                if image.shape[1::-1] != size:
+                    image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+                self.pool.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            if not self.pool:
+                raise OSError(f"No readable images to replay in {self.folder}")
+        else:
+            noise = self.random.normal(0, 8, (height, width)).astype(np.float32)
+            self.pool = [self._generate_frame(width, height, i, noise) for i in range(min(count, 8))]
+        self.pool_brightness = [max(10.0, float(frame[::8, ::8].mean())) for frame in self.pool]
+        if len(self.pools) >= 2:
+            del self.pools[next(iter(self.pools))]
+        self.pools[key] = (self.pool, self.pool_brightness, self.raw_pool)
+        logging.debug(f"ReplayCamera: {len(self.pool)} frames of {width}x{height} loaded in "
+                      f"{time.perf_counter() - start:.2f} s")
+
+    def _generate_frame(self, width, height, index, noise):
+        # Film frame: Some content (gradient plus noise, so that it does not compress too well), framed by dark film
+        # base, with a sprocket hole on the left, around the middle (a few pixels off, changing with each frame)
+        x = np.linspace(0, 1, width, dtype=np.float32)
+        y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+        base = 60 + 120 * x * (0.5 + 0.5 * np.sin(6 * y + index))
+        noise = np.roll(noise, index * 97, axis=1)
+        image = np.empty((height, width, 3), np.uint8)
+        for channel, factor in enumerate((1.0, 0.85, 0.7)):
+            image[:, :, channel] = np.clip(base * factor + noise, 0, 255)
+        image[:, :width // 8] = 25
+        hole_height = height // 4
+        hole_top = height // 2 - hole_height // 2 + int(self.random.integers(-height // 40, height // 40 + 1))
+        image[hole_top:hole_top + hole_height, width // 50:width // 10] = 240
+        return image
+
+    # ----- Start/stop -----
+
+    def start(self, config=None, show_preview=False):
+        if config is not None:
+            self.configure(config)
+        elif self.config is None:
+            self.configure(self.create_preview_configuration())
+        with self.lock:
+            self.started = True
+            self.next_frame_time = time.monotonic() + STARTUP_FRAMES * self._frame_duration()
+
+    def stop(self):
+        with self.lock:
+            self.started = False
+
+    def close(self):
+        self.stop()
+        if self.held_buffers > 0:
+            logging.warning(f"ReplayCamera: Closed with {self.held_buffers} requests not released")
+        logging.debug(f"ReplayCamera: {self.stats_report()}")
+
+    def switch_mode(self, config):
+        self.stop()
+        self.configure(config)
+        self.start()
+
+    def switch_mode_and_capture_file(self, config, name, format=None, wait=None, signal_function=None):
+        previous = self.config
+        self.switch_mode(config)
+        image = self.capture_image('main')
+        image.save(name, quality=self.options.get('quality', 90))
+        self.switch_mode(previous)
+
+    def start_preview(self, *args, **kwargs):
+        pass
+
+    def stop_preview(self):
+        pass
+
+    # ----- Controls and sensor -----
+
+    def set_controls(self, new_controls):
+        with self.lock:
+            self.pending_controls.append((self.frame_index + CONTROL_LATENCY, dict(new_controls)))
+
+    @property
+    def controls(self):
+        camera = self
+
+        class Controls:
+            def __setattr__(self, name, value):
+                camera.set_controls({name: value})
+        return Controls()
+
+    def _frame_duration(self):
+        period = self.readout_time if self.readout_time is not None else 1 / self.mode['fps']
+        return max(period, self.exposure / 1e6)
+
+    def _apply_controls(self):
+        while self.pending_controls and self.pending_controls[0][0] <= self.frame_index:
+            self.controls_set.update(self.pending_controls.pop(0)[1])
+        self.ae_enable = self.controls_set.get('AeEnable', True)
+        self.awb_enable = self.controls_set.get('AwbEnable', True)
+        self.analogue_gain = self.controls_set.get('AnalogueGain', self.analogue_gain)
+        if not self.ae_enable and 'ExposureTime' in self.controls_set:
+            self.exposure = self.controls_set['ExposureTime']
+        if not self.awb_enable and 'ColourGains' in self.controls_set:
+            self.gains = tuple(self.controls_set['ColourGains'])
+
+    def _sensor_frame(self):
+        # Next frame out of the sensor: Controls applied, AE/AWB one step closer to target. Returns pool index and
+        # metadata
+        self._apply_controls()
+        frame = self.frame_index % len(self.pool)
+        brightness = self.pool_brightness[frame]
+        ae_target = NOMINAL_EXPOSURE * NOMINAL_BRIGHTNESS / brightness / self.analogue_gain
+        if self.ae_enable:
+            self.exposure += (ae_target - self.exposure) * self.ae_speed
+        if self.awb_enable:
+            # Target gains drift a little with scene content
+            shift = (brightness - NOMINAL_BRIGHTNESS) / 1000
+            target = (NOMINAL_GAINS[0] + shift, NOMINAL_GAINS[1] - shift)
+            self.gains = tuple(g + (t - g) * self.awb_speed for g, t in zip(self.gains, target))
+        duration = self._frame_duration()
+        self.next_frame_time += duration
+        self.frame_index += 1
+        self.stats['frames'] += 1
+        width, height = self.mode['size']
+        crop = self.mode.get('crop_limits', (0, 0, width, height))
+        metadata = {'SensorTimestamp': int(self.next_frame_time * 1e9), 'FrameDuration': int(duration * 1e6),
+                    'ExposureTime': int(self.exposure), 'AnalogueGain': self.analogue_gain, 'DigitalGain': 1.0,
+                    'ColourGains': self.gains, 'ColourTemperature': int(5000 + 1000 * (self.gains[1] - 1.9)),
+                    'Lux': brightness * 4, 'AeLocked': not self.ae_enable or abs(ae_target - self.exposure) < 50,
+                    'ScalerCrop': crop, 'SensorTemperature': 40.0, 'SensorBlackLevels': (BLACK_LEVEL,) * 4,
+                    'ColourCorrectionMatrix': COLOUR_CORRECTION_MATRIX,
+                    'ExposureGain': self.exposure * self.analogue_gain * brightness /
+                    (NOMINAL_EXPOSURE * NOMINAL_BRIGHTNESS)}
+        return frame, metadata
+
+    def _next_frame(self):
+        # Waits for the next frame completed after now
+        if not self.started:
+            raise RuntimeError("Camera not started")
+        with self.lock:
+            now = time.monotonic()
+            if now - self.next_frame_time > 1:     # Idle for a while: Not worth simulating every frame
+                for _ in range(10):
+                    self._sensor_frame()
+                self.next_frame_time = now
+            while self.next_frame_time <= now:
+                self._sensor_frame()
+            frame, metadata = self._sensor_frame()
+            ready_time = self.next_frame_time
+        delay = ready_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            self.stats['frame_wait_time'] += delay
+        self.stats['captures'] += 1
+        return frame, metadata
+
+    # ----- Buffers -----
+
+    def _acquire_buffer(self):
+        with self.lock:
+            if self.free_buffers == 0:
+                start = time.perf_counter()
+                self.stats['buffer_waits'] += 1
+                while self.free_buffers == 0:
+                    self.lock.wait()
+                self.stats['buffer_wait_time'] += time.perf_counter() - start
+            self.free_buffers -= 1
+            self.held_buffers += 1
+            self.stats['max_held'] = max(self.stats['max_held'], self.held_buffers)
+
+    def _release_buffer(self, lifetime=None):
+        with self.lock:
+            self.free_buffers += 1
+            self.held_buffers -= 1
+            if lifetime is not None:
+                self.stats['requests'] += 1
+                self.stats['request_time'] += lifetime
+                self.stats['max_request_time'] = max(self.stats['max_request_time'], lifetime)
+            self.lock.notify()
+
+    def _stream_array(self, name, frame, metadata):
+        image = self.pool[frame]
+        gain = metadata['ExposureGain']
+        if abs(gain - 1) > 0.03:
+            image = cv2.convertScaleAbs(image, alpha=gain)
+        if name == 'main':
+            return image
+        if name == 'lores':
+            if self.config['lores'] is None:
+                raise RuntimeError("Lores stream not configured")
+            width, height = self.config['lores']['size']
+            return cv2.cvtColor(cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA),
+                                cv2.COLOR_RGB2YUV_I420)
+        if name == 'raw':
+            if frame not in self.raw_pool:
+                self.raw_pool[frame] = self._make_raw(self.pool[frame])
+            raw = self.raw_pool[frame]
+            return raw if abs(gain - 1) <= 0.03 else np.clip(raw * gain, 0, 4095).astype(np.uint16)
+        raise ValueError(f"Unknown stream {name}")
+
+    def _make_raw(self, image):
+        # RGGB Bayer mosaic at sensor mode size, 12 bit values in 16 bit words
+        width, height = self.mode['size']
+        rgb = cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR).astype(np.uint16) << 4
+        raw = np.empty((height, width), np.uint16)
+        raw[0::2, 0::2] = rgb[0::2, 0::2, 0]
+        raw[0::2, 1::2] = rgb[0::2, 1::2, 1]
+        raw[1::2, 0::2] = rgb[1::2, 0::2, 1]
+        raw[1::2, 1::2] = rgb[1::2, 1::2, 2]
+        return raw
+
+    # ----- Captures -----
+
+    def capture_request(self):
+        self._acquire_buffer()
+        try:
+            frame, metadata = self._next_frame()
+        except Exception:
+            self._release_buffer()
+            raise
+        return ReplayRequest(self, frame, metadata)
+
+    def capture_metadata(self):
+        self._acquire_buffer()
+        try:
+            frame, metadata = self._next_frame()
+        finally:
+            self._release_buffer()
+        return metadata
+
+    def capture_array(self, name="main"):
+        self._acquire_buffer()
+        try:
+            frame, metadata = self._next_frame()
+            return self._stream_array(name, frame, metadata).copy()
+        finally:
+            self._release_buffer()
+
+    def capture_image(self, name="main"):
+        return Image.fromarray(self.capture_array(name))
+
+    def stats_report(self):
+        stats = self.stats
+        requests = max(1, stats['requests'])
+        return (f"{stats['frames']} sensor frames, {stats['captures']} captures (waited "
+                f"{stats['frame_wait_time']:.2f} s for frames), {stats['buffer_waits']} waits for a free buffer "
+                f"({stats['buffer_wait_time']:.2f} s), {stats['requests']} requests released, held "
+                f"{stats['request_time'] / requests * 1000:.1f} ms avg, {stats['max_request_time'] * 1000:.1f} ms "
+                f"max, up to {stats['max_held']} at once")
@@ -0,0 +1,141 @@
+"""
+****************************************************************************************************************
+Class SaveWorkerPool
+Pool of threads consuming a queue (capture save queue in ALT-Scann8), whose size adapts to the current load:
+- Grows when items accumulate in the queue, or when measured save latency is longer than the time between frames
+  multiplied by the number of workers
+- Shrinks (one worker at a time) after the queue has been idle for a few consecutive checks, to free resources
+Pool size always stays between the configured minimum and maximum number of workers.
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "SaveWorkerPool"
+__version__ = "1.0.0"
+__date__ = "2025-11-20"
+__version_highlight__ = "SaveWorkerPool - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import logging
+import math
+import queue
+import threading
+
+
+class SaveWorkerPool:
+    def __init__(self, work_queue, handler, min_workers=1, max_workers=4, end_token=None, shrink_checks=5):
+        self.work_queue = work_queue
+        self.handler = handler  # handler(item, worker_id), invoked for each item retrieved from the queue
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.end_token = end_token
+        self.shrink_checks = shrink_checks  # Number of consecutive idle checks required to retire a worker
+        self.lock = threading.Lock()
+        self.workers = {}
+        self.next_worker_id = 1
+        self.workers_to_retire = 0
+        self.idle_checks = 0
+        self.stopping = False
+
+    @property
+    def size(self):
+        with self.lock:
+            return len(self.workers) - self.workers_to_retire
+
+    def start(self):
+        for i in range(self.min_workers):
+            self._add_worker()
+
+    def _add_worker(self):
+        with self.lock:
+            worker_id = self.next_worker_id
+            self.next_worker_id += 1
+            worker = threading.Thread(target=self._worker_loop, args=(worker_id,), daemon=True)
+            self.workers[worker_id] = worker
+        worker.start()
+        logging.debug("SaveWorkerPool: Started worker n.%i", worker_id)
+
+    def _retire_requested(self):
+        with self.lock:
+            if self.workers_to_retire > 0:
+                self.workers_to_retire -= 1
+                return True
+        return False
+
+    def _worker_loop(self, worker_id):
+        try:
+            while True:
+                if not self.stopping and self._retire_requested():
+                    break
+                try:
+                    item = self.work_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item == self.end_token:
+                    break
+                try:
+                    self.handler(item, worker_id)
+                except Exception as e:
+                    # Item lost, but worker kept: Otherwise pool would dwindle, and capture eventually block on a
+                    # full queue
+                    logging.exception(f"SaveWorkerPool: Worker n.{worker_id}, error processing item: {e}")
+        finally:
+            # Worker removed even if ended by an unexpected error, so that size only counts live workers (and
+            # adjust can replace it)
+            with self.lock:
+                del self.workers[worker_id]
+        logging.debug("SaveWorkerPool: Worker n.%i exiting", worker_id)
+
+    def adjust(self, save_latency=None, item_interval=None):
+        """
+        Resize pool according to queue depth and, if available, average save latency and average interval between
+        items queued (both in seconds). Expected to be called periodically (e.g. once per second)
+        """
+        if self.stopping:
+            return self.size
+        current = self.size
+        backlog = self.work_queue.qsize()
+        target = current
+        if save_latency is not None and item_interval is not None and item_interval > 0:
+            # Number of workers needed so that each one has time to save its item before it gets the next one
+            target = math.ceil(save_latency / item_interval)
+        if backlog > current:
+            target = max(target, current + 1)
+        target = min(max(target, self.min_workers), self.max_workers)
+
+        if target > current:
+            self.idle_checks = 0
+            for i in range(target - current):
+                with self.lock:
+                    # Cancel pending retirements before starting new workers
+                    if self.workers_to_retire > 0:
+                        self.workers_to_retire -= 1
+                        continue
+                self._add_worker()
+            logging.debug("SaveWorkerPool: Growing pool to %i workers (queue: %i)", target, backlog)
+        elif target < current and backlog == 0:
+            # Shrink slowly, and only when idle, to avoid oscillation
+            self.idle_checks += 1
+            if self.idle_checks >= self.shrink_checks:
+                self.idle_checks = 0
+                with self.lock:
+                    self.workers_to_retire += 1
+                logging.debug("SaveWorkerPool: Shrinking pool to %i workers", current - 1)
+        else:
+            self.idle_checks = 0
+        return self.size
+
+    def stop(self, timeout=None):
+        # End tokens are queued after pending items, so that queued frames are still processed
+        with self.lock:
+            self.stopping = True
+            self.workers_to_retire = 0
+            workers = list(self.workers.values())
+        for i in range(len(workers)):
+            self.work_queue.put(self.end_token)
+        for worker in workers:
+            worker.join(timeout)
@@ -0,0 +1,135 @@
+"""
+****************************************************************************************************************
+Class SharedMemoryEncoder
+Encodes captured frames (JPG/PNG) in a pool of worker processes, to get around the GIL limiting the save threads
+to roughly one core. Pixel data is not pickled: Each frame is copied into a shared memory block (NumPy arrays
+directly, PIL images from their raw bytes), and only the name of the block plus shape/type of the frame are sent to
+the worker process, which saves it to disk with PIL.
+Frames can be encoded asynchronously (encode_async), so that the calling thread can go on with other work (e.g. the
+frame alignment check) while the frame is being saved.
+Shared memory blocks are recycled between frames to avoid allocating a new one for each capture.
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "SharedMemoryEncoder"
+__version__ = "1.0.0"
+__date__ = "2025-11-20"
+__version_highlight__ = "SharedMemoryEncoder - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+# PIL modes copied to shared memory as raw bytes: Number of bands, all 8 bit
+RAW_MODES = {'L': 1, 'RGB': 3, 'RGBA': 4}
+
+
+def _attach_shared_memory(name):
+    # Worker processes only attach to blocks owned by the main process, they must not unlink them on exit.
+    # Before Python 3.13 ('track' parameter not available) workers share the resource tracker of the main process,
+    # so registering the block again is harmless
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _encode_worker(shm_name, shape, dtype, filename, quality):
+    # Runs in worker process: Returns time spent encoding and writing the frame
+    start_time = time.time()
+    shm = _attach_shared_memory(shm_name)
+    try:
+        frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        image = Image.fromarray(frame)
+        image.save(filename, quality=quality)
+        # Drop all references to the buffer before closing the block
+        del image
+        del frame
+    finally:
+        shm.close()
+    return time.time() - start_time
+
+
+class SharedMemoryEncoder:
+    def __init__(self, processes=None):
+        self.processes = processes if processes is not None else os.cpu_count()
+        # Use forkserver when available: Forking a process that already has camera and Tk threads running is unsafe
+        try:
+            context = multiprocessing.get_context('forkserver')
+        except ValueError:
+            context = multiprocessing.get_context()
+        self.pool = context.Pool(processes=self.processes)
+        self.free_blocks = []
+        self.all_blocks = []
+        self.lock = threading.Lock()
+
+    def _acquire_block(self, size):
+        with self.lock:
+            for shm in self.free_blocks:
+                if shm.size >= size:
+                    self.free_blocks.remove(shm)
+                    return shm
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        with self.lock:
+            self.all_blocks.append(shm)
+        return shm
+
+    def _release_block(self, shm):
+        with self.lock:
+            self.free_blocks.append(shm)
+
+    def _copy_to_block(self, frame):
+        # Copy frame to a shared memory block, returns block, shape and type of frame
+        if isinstance(frame, Image.Image) and frame.mode in RAW_MODES:
+            # Raw bytes copied as they are (np.asarray() would wrap the same bytes, with one more conversion step)
+            bands = RAW_MODES[frame.mode]
+            shape = (frame.height, frame.width, bands) if bands > 1 else (frame.height, frame.width)
+            data = frame.tobytes()
+            shm = self._acquire_block(len(data))
+            shm.buf[:len(data)] = data
+            return shm, shape, '|u1'
+        frame = np.asarray(frame)
+        shm = self._acquire_block(frame.nbytes)
+        shared_frame = np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)
+        np.copyto(shared_frame, frame)
+        del shared_frame
+        return shm, frame.shape, frame.dtype.str
+
+    def encode_async(self, frame, filename, quality=95):
+        """
+        Start saving frame (NumPy array, or PIL image) to filename using a worker process. Returns once the frame is
+        in shared memory (frame can then be reused by caller): get() on the returned AsyncResult waits for the frame
+        to be written, and returns time spent in the worker process.
+        """
+        shm, shape, dtype = self._copy_to_block(frame)
+        release_block = lambda result: self._release_block(shm)
+        return self.pool.apply_async(_encode_worker, (shm.name, shape, dtype, os.path.abspath(filename), quality),
+                                     callback=release_block, error_callback=release_block)
+
+    def encode(self, frame, filename, quality=95):
+        """
+        Save frame (NumPy array, or PIL image) to filename using a worker process. Blocks until the frame has been
+        written. Returns time spent in the worker process.
+        """
+        return self.encode_async(frame, filename, quality).get()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        with self.lock:
+            for shm in self.all_blocks:
+                shm.close()
+                shm.unlink()
+            self.all_blocks.clear()
+            self.free_blocks.clear()
@@ -0,0 +1,165 @@
+"""
+****************************************************************************************************************
+Class SpillBuffer
+Overflow area for the capture save queue, used when the target storage (USB disk, NAS) stalls for a few seconds:
+Instead of blocking the capture loop, frames are written to a fast local staging folder (tmpfs, SD card), in raw
+form (uncompressed NumPy array, or DNG file already generated by PiCamera2), and drained later to the target folder
+by a background thread.
+- Frames are drained in the same order they were spilled, each one to the filename it would have had if saved
+  directly (frame number preserved)
+- Drain only happens while the caller allows it (e.g. when save queue is empty), to not compete with regular saves
+- Staging area has a size limit: When reached, spill is refused and caller falls back to waiting
+- A frame that cannot be saved for any other reason than target not available is left in the staging folder, with
+  '.failed' added to its name, and drain goes on
+****************************************************************************************************************
+"""
+__author__ = 'Juan Remirez de Esparza'
+__copyright__ = "Copyright 2022/25, Juan Remirez de Esparza"
+__credits__ = ["Juan Remirez de Esparza"]
+__license__ = "MIT"
+__module__ = "SpillBuffer"
+__version__ = "1.0.0"
+__date__ = "2025-11-22"
+__version_highlight__ = "SpillBuffer - First version"
+__maintainer__ = "Juan Remirez de Esparza"
+__email__ = "jremirez@hotmail.com"
+__status__ = "Development"
+
+import collections
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+
+class SpillBuffer:
+    def __init__(self, staging_dir, writer, max_bytes, can_drain=None):
+        self.staging_dir = staging_dir
+        self.writer = writer  # writer(array, filename): Saves a spilled array to its final destination
+        self.max_bytes = max_bytes
+        self.can_drain = can_drain  # can_drain(): Returns True when drain can proceed (None: Always)
+        self.entries = collections.deque()  # (staging file, target file, is_array, size)
+        self.bytes_spilled = 0
+        self.total_spilled = 0
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.pending_event = threading.Event()
+        self.closing = False
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.drain_thread = threading.Thread(target=self._drain_loop, daemon=True)
+        self.drain_thread.start()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def _reserve(self, size):
+        # Returns staging filename to use, or None if staging area is full
+        with self.lock:
+            if self.closing or (self.bytes_spilled > 0 and self.bytes_spilled + size > self.max_bytes):
+                return None
+            self.bytes_spilled += size
+            self.next_id += 1
+            return os.path.join(self.staging_dir, f"spill-{self.next_id:08d}")
+
+    def _commit(self, staging_file, target_file, is_array, size):
+        with self.lock:
+            self.entries.append((staging_file, target_file, is_array, size))
+            self.total_spilled += 1
+        self.pending_event.set()
+
+    def _cancel(self, size):
+        with self.lock:
+            self.bytes_spilled -= size
+
+    def spill_array(self, array, target_file):
+        """
+        Store array (frame pixels) in staging area, to be saved later as target_file.
+        Returns False if there is no room left in staging area.
+        """
+        staging_file = self._reserve(array.nbytes)
+        if staging_file is None:
+            return False
+        staging_file += '.npy'
+        try:
+            np.save(staging_file, array, allow_pickle=False)
+        except OSError as e:
+            logging.error(f"SpillBuffer: Cannot write {staging_file}: {e}")
+            self._cancel(array.nbytes)
+            return False
+        self._commit(staging_file, target_file, True, array.nbytes)
+        return True
+
+    def spill_file(self, save_function, size, target_file):
+        """
+        Let save_function(staging_file) write the file in the staging area (e.g. request.save_dng), to be moved
+        later to target_file. size is an estimate used for accounting. Returns False if there is no room left.
+        """
+        staging_file = self._reserve(size)
+        if staging_file is None:
+            return False
+        staging_file += os.path.splitext(target_file)[1]
+        try:
+            save_function(staging_file)
+        except OSError as e:
+            logging.error(f"SpillBuffer: Cannot write {staging_file}: {e}")
+            self._cancel(size)
+            return False
+        self._commit(staging_file, target_file, False, size)
+        return True
+
+    def _drain_loop(self):
+        while True:
+            self.pending_event.wait(0.5)
+            with self.lock:
+                if not self.entries:
+                    self.pending_event.clear()
+                    if self.closing:
+                        break
+                    continue
+            if not self.closing and self.can_drain is not None and not self.can_drain():
+                # Check again later (or when closing): Event stays set while entries are pending, waiting on it
+                # again right away would spin
+                self.pending_event.clear()
+                continue
+            with self.lock:
+                staging_file, target_file, is_array, size = self.entries[0]
+            try:
+                if is_array:
+                    self.writer(np.load(staging_file, allow_pickle=False), target_file)
+                    os.remove(staging_file)
+                else:
+                    shutil.move(staging_file, target_file)
+            except OSError as e:
+                # Target still not available: Keep entry and retry later
+                logging.warning(f"SpillBuffer: Cannot drain {staging_file} to {target_file}: {e}")
+                if self.closing:
+                    break
+                self.pending_event.clear()
+                continue
+            except Exception as e:
+                # Frame itself cannot be saved (e.g. bad file, encoder error): Retrying would block all frames after
+                # it, so it is set aside in the staging folder and drain goes on with the next one
+                failed_file = staging_file + '.failed'
+                logging.error(f"SpillBuffer: Cannot save {staging_file} to {target_file}, kept as {failed_file}: "
+                              f"{e}")
+                try:
+                    os.replace(staging_file, failed_file)
+                except OSError:
+                    pass
+            with self.lock:
+                self.entries.popleft()
+                self.bytes_spilled -= size
+            logging.debug(f"SpillBuffer: Drained {target_file} ({len(self)} pending)")
+
+    def close(self, timeout=None):
+        # Drain all pending entries (without waiting for can_drain) before returning
+        with self.lock:
+            self.closing = True
+        self.pending_event.set()
+        self.drain_thread.join(timeout)
+        pending = len(self)
+        if pending > 0:
+            logging.error(f"SpillBuffer: {pending} frames could not be drained, still in {self.staging_dir}")